@@ -64,3 +64,81 @@ pipeline_def = [{'package': 'spacytextblob',
                  'module': 'contentSegmentation',
                  'component': 'contentsegmentation',
                  'language': ['en']}]
+
+# Named profiles: the components of the pipeline that each one leaves
+# out. A client that only needs lexical indicators can ask for
+# lexical-only (e.g. ['PARSEONE', label, text, {'profile':
+# 'lexical-only'}]) and not pay for coreference, discourse, viewpoint,
+# clustering and content segmentation. The pipeline is loaded once
+# with every component, and the ones a profile leaves out are
+# disabled while its documents are parsed; the indicators they would
+# have added are not available on those documents. A component that
+# needs another one's results (see component_requires) is left out
+# along with it: without coreferee, for instance, there is no holmes
+# analysis, so the parser server leaves documents parsed with those
+# profiles out of Holmes matching (MATCH_DOCUMENTS, TOPIC_MATCHES).
+pipeline_profiles = {'full': [],
+                     'no-coref': ['coreferee'],
+                     'lexical-only': ['coreferee',
+                                      'spacytextblob',
+                                      'syntaxdiscoursefeatures',
+                                      'viewpointfeatures',
+                                      'lexicalclusters',
+                                      'contentsegmentation']}
+default_profile = 'full'
+
+
+# Components that only add document-level results (the word
+# clusters, and the main ideas and supporting details built from
+# them), which the parser server can leave out when it parses and run
+# on a document the first time a request needs them
+# (parserServer(defer_components=True))
+deferred_components = ['lexicalclusters', 'contentsegmentation']
+
+# The AWE_Info indicators that the deferred components add, and the
+# components needed for each (content segmentation works from the
+# word clusters), so that an AWE_INFO request only waits for them if
+# it asks for one of these, or filters on one
+indicator_components = {
+    'clusterID': ['lexicalclusters'],
+    'devword': ['lexicalclusters'],
+    'clusterInfo': ['lexicalclusters'],
+    'prompt_language': ['lexicalclusters'],
+    'prompt_related': ['lexicalclusters'],
+    'nominalReferences': ['lexicalclusters', 'contentsegmentation'],
+    'main_cluster_spans': ['lexicalclusters', 'contentsegmentation'],
+    'main_ideas': ['lexicalclusters', 'contentsegmentation'],
+    'supporting_ideas': ['lexicalclusters', 'contentsegmentation'],
+    'supporting_details': ['lexicalclusters', 'contentsegmentation']}
+
+# The spacy model's own components, which work sentence by sentence,
+# so that PARSEDELTA can reuse their analyses of the paragraphs an
+# edit does not touch (an approximation; see web/textDelta.py).
+# Everything else in the pipeline is run on the whole document.
+paragraph_components = ['tok2vec',
+                        'tagger',
+                        'parser',
+                        'senter',
+                        'attribute_ruler',
+                        'lemmatizer',
+                        'ner']
+
+
+# Components that read what other components add, and cannot be run
+# without them (holmes uses coreferee's coreference chains)
+component_requires = {'holmes': ['coreferee']}
+
+
+def disabled_components(profile, pipe_names):
+    # The components of a pipeline (given by its pipe_names) that
+    # profile leaves out, including those that require one of them
+    if profile not in pipeline_profiles:
+        raise ValueError('Unknown pipeline profile: ' + str(profile))
+    disabled = [name for name in pipeline_profiles[profile]
+                if name in pipe_names]
+    for name in pipe_names:
+        if name not in disabled \
+           and any(required in disabled
+                   for required in component_requires.get(name, [])):
+            disabled.append(name)
+    return disabled
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import asyncio
+import json
+import weakref
+import websockets
+from websockets.protocol import State
+from awe_workbench.web.wireCodec import subprotocols, pack, \
+    decode_message, JSON, MSGPACK
+
+
+class asyncWebsocketClient:
+
+    # An asyncio counterpart of websocketClient, for callers that are
+    # themselves asyncio programs and want to keep several servers
+    # busy at once without a thread per request. As in websocketClient,
+    # connections are kept open in a pool (at most max_connections of
+    # them), and a message whose pooled connection fails before it is
+    # sent is tried once more on a new one. A message the server may
+    # have got is never sent again. gather and fan_out send many messages at
+    # the same time; max_concurrency bounds how many are outstanding
+    # at once, and defaults to max_connections. codec='msgpack' asks
+    # the server for msgpack messages, as in websocketClient.
+
+    uri = None
+    idle = None
+
+    # The connections opened to the current uri, so that a connection
+    # in use when the uri changes is not put back in the pool, and
+    # those that a message has been sent on since they were acquired
+    connections = None
+    sent = None
+
+    # The semaphore that limits the connections, made in the event
+    # loop the client is used in (a semaphore belongs to one loop)
+    slots = None
+    slots_loop = None
+
+    def __init__(self,
+                 uri="ws://localhost:8765",
+                 max_connections=4,
+                 max_concurrency=None,
+                 codec='json'):
+        self.uri = uri
+        self.max_connections = max_connections
+        if max_concurrency is None:
+            max_concurrency = max_connections
+        self.max_concurrency = max_concurrency
+        self.idle = []
+        self.connections = weakref.WeakSet()
+        self.sent = weakref.WeakSet()
+        if codec == 'msgpack' and MSGPACK not in subprotocols():
+            raise ImportError('The msgpack codec needs msgpack-numpy')
+        self.subprotocols = [MSGPACK, JSON] if codec == 'msgpack' else None
+
+    def set_uri(self, uri):
+        # Connections to the old uri are closed rather than reused.
+        # Closing them has to be awaited, so it is left to the event
+        # loop; without a running loop, the loop they were opened on
+        # has finished, and there is nothing left to close.
+        self.uri = uri
+        idle = self.idle
+        self.idle = []
+        self.connections = weakref.WeakSet()
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        for ws in idle:
+            loop.create_task(close_quietly(ws))
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        idle = self.idle
+        self.idle = []
+        for ws in idle:
+            await close_quietly(ws)
+
+    def semaphore(self):
+        loop = asyncio.get_running_loop()
+        if self.slots_loop is not loop:
+            # (connections opened in another loop cannot be used here)
+            self.slots = asyncio.Semaphore(self.max_connections)
+            self.slots_loop = loop
+            self.idle = []
+        return self.slots
+
+    async def acquire(self, fresh=False):
+        # A connection, and whether it came from the pool
+        await self.semaphore().acquire()
+        while not fresh and len(self.idle) > 0:
+            # (the server may have closed it while it was idle)
+            ws = self.idle.pop()
+            if is_open(ws):
+                self.sent.discard(ws)
+                return ws, True
+            await close_quietly(ws)
+        try:
+            # Replies such as SERIALIZED can be large, so we do not
+            # limit the size of incoming messages
+            ws = await websockets.connect(self.uri,
+                                          max_size=None,
+                                          subprotocols=self.subprotocols)
+        except BaseException:
+            self.slots.release()
+            raise
+        self.connections.add(ws)
+        return ws, False
+
+    async def release(self, ws, reuse=True):
+        if reuse and ws in self.connections and is_open(ws):
+            self.idle.append(ws)
+        else:
+            await close_quietly(ws)
+        self.semaphore().release()
+
+    async def call(self, exchange):
+        # Await exchange(ws) on a pooled connection, retrying once on
+        # a new connection if the pooled one turns out to be broken
+        # before anything was sent on it (see send_on)
+        for attempt in range(2):
+            ws, reused = await self.acquire(fresh=attempt > 0)
+            try:
+                result = await exchange(ws)
+            except (websockets.exceptions.ConnectionClosed, OSError):
+                await self.release(ws, reuse=False)
+                if not reused or ws in self.sent:
+                    raise
+                continue
+            except BaseException:
+                await self.release(ws, reuse=False)
+                raise
+            await self.release(ws)
+            return result
+
+    async def request(self, texts):
+        # Send one message and return the raw reply, and the encoding
+        # used on the connection
+
+        async def exchange(ws):
+            protocol = ws.subprotocol
+            if protocol == MSGPACK:
+                await self.send_on(ws, pack(texts))
+            else:
+                await self.send_on(ws, json.dumps(texts))
+            return await ws.recv(), protocol
+
+        return await self.call(exchange)
+
+    async def send_on(self, ws, message):
+        # Send a message, noting that the server may have it now
+        await ws.send(message)
+        self.sent.add(ws)
+
+    async def send(self, texts: list):
+        if texts is None:
+            print('no texts!')
+            return None
+        try:
+            result, protocol = await self.request(texts)
+            return decode_message(result, protocol)
+        except Exception as e:
+            print(e)
+            return None
+
+    async def sendraw(self, texts: list):
+        if texts is None:
+            return None
+        try:
+            result, protocol = await self.request(texts)
+            return result
+        except Exception as e:
+            print(e)
+            return None
+
+    async def gather(self, messages: list):
+        # Send all of the messages, up to max_concurrency at a time,
+        # and return the replies in the same order
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def send(message):
+            async with semaphore:
+                return await self.send(message)
+
+        return await asyncio.gather(*[send(message) for message in messages])
+
+    async def fan_out(self, commands: list, labels: list):
+        # Send every command for every document label, e.g.
+        # fan_out(['DOCTOKENS', 'LEMMAS'], ['essay1', 'essay2']), and
+        # return the replies as a dictionary keyed by (command, label)
+        pairs = [(command, label) for label in labels for command in commands]
+        results = await self.gather([[command, label]
+                                     for (command, label) in pairs])
+        return dict(zip(pairs, results))
+
+
+def is_open(ws):
+    # (the legacy websockets connections have open, the newer ones
+    # state)
+    if hasattr(ws, 'open'):
+        return ws.open
+    return ws.state == State.OPEN
+
+
+async def close_quietly(ws):
+    try:
+        await ws.close()
+    except Exception:
+        pass
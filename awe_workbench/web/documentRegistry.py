@@ -0,0 +1,276 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from collections import OrderedDict
+
+# Keeps track of the documents registered with the Holmes manager of
+# the parser server, and keeps their number and size within limits.
+#
+# Holmes holds every registered document in memory until it is
+# removed, so a server that stays up for a long time grows until it
+# runs out of memory. When there are more than max_documents
+# documents, or their serialized size adds up to more than max_bytes,
+# the least recently used documents are spilled: each one is written
+# to spill_dir in the serialize_document format and removed from
+# Holmes. Documents that have not been used for ttl seconds are
+# spilled as well, when documents are registered or used, and when
+# the server calls expire (which it does every so often, so that an
+# idle server lets go of them too). The label stays registered, and the first request
+# that needs the document again registers it with Holmes again from
+# the file.
+#
+# Sizes are the length of the serialized documents. A deserialized
+# document takes up several times as much memory, but in proportion
+# to its serialized size, so this is what the limits are set in.
+#
+# The server can also attach memory of its own to a resident document
+# (its column store; see tokenColumns), which counts towards max_bytes
+# and goes when the document is spilled or removed.
+#
+# Search phrase matching (MATCH_DOCUMENTS, TOPIC_MATCHES) only sees
+# the documents that are currently held by Holmes.
+#
+# Documents restored from a snapshot start out in the same state as
+# spilled ones, except that they are records in the snapshot's shard
+# file rather than files of their own, and that file is never removed.
+
+
+class documentRegistry:
+
+    parser = None
+    resident = None
+    spilled = None
+
+    def __init__(self,
+                 parser,
+                 max_bytes=None,
+                 max_documents=None,
+                 ttl=None,
+                 spill_dir=None,
+                 on_spill=None):
+
+        # parser is the Holmes manager. on_spill, if given, is called
+        # with the label of every document that is spilled, so that
+        # the server can drop whatever else it holds for it.
+        self.parser = parser
+        self.max_bytes = max_bytes
+        self.max_documents = max_documents
+        self.ttl = ttl
+        self.spill_dir = spill_dir
+        self.made_spill_dir = False
+        self.on_spill = on_spill
+
+        # Documents held by Holmes, as label -> serialized size, in
+        # order of last use, and the documents that have been spilled,
+        # as label -> (file, serialized size, offset). The offset is
+        # None for our own spill files, which hold one document each,
+        # and the position of the document in the file otherwise.
+        self.resident = OrderedDict()
+        self.resident_bytes = 0
+        self.spilled = {}
+        self.last_used = {}
+
+        # Bytes the server holds for resident documents besides
+        # Holmes's copy, by label
+        self.attached = {}
+        self.attached_bytes = 0
+        self.spills = 0
+        self.rehydrations = 0
+
+    def __contains__(self, label):
+        return label in self.resident or label in self.spilled
+
+    def __len__(self):
+        return len(self.resident) + len(self.spilled)
+
+    def labels(self):
+        return sorted(list(self.resident) + list(self.spilled))
+
+    def register(self, documents):
+        # Register a dictionary of serialized documents by label,
+        # replacing any documents registered under the same labels
+        for label in documents:
+            self.discard(label)
+        self.parser.register_serialized_documents(documents)
+        now = time.time()
+        for label, serialized in documents.items():
+            self.resident[label] = len(serialized)
+            self.resident_bytes += len(serialized)
+            self.last_used[label] = now
+        self.enforce_limits(keep=documents)
+
+    def touch(self, label):
+        # Note that a document is being used, registering it with
+        # Holmes again if it has been spilled. Returns False if there
+        # is no document with this label.
+        if label in self.spilled:
+            self.rehydrate(label)
+        elif label in self.resident:
+            self.resident.move_to_end(label)
+        else:
+            return False
+        self.last_used[label] = time.time()
+        self.enforce_limits(keep=[label])
+        return True
+
+    def attach(self, label, size):
+        # Count size bytes held by the server for a resident document
+        # (replacing what was counted for it before) against the limits
+        if label not in self.resident:
+            return
+        self.detach(label)
+        self.attached[label] = size
+        self.attached_bytes += size
+        self.enforce_limits(keep=[label])
+
+    def detach(self, label):
+        self.attached_bytes -= self.attached.pop(label, 0)
+
+    def serialized(self, label):
+        # The serialized form of a document, read back from its spill
+        # file if it has been spilled, so that exporting many
+        # documents does not register them all with Holmes again
+        if label in self.spilled:
+            return self.read_spilled(label)
+        elif label in self.resident:
+            return self.parser.serialize_document(label)
+        return None
+
+    def remove(self, label):
+        self.discard(label)
+
+    def clear(self):
+        self.parser.remove_all_documents()
+        for label in list(self.spilled):
+            self.discard(label)
+        self.resident.clear()
+        self.resident_bytes = 0
+        self.last_used.clear()
+        self.attached.clear()
+        self.attached_bytes = 0
+
+    def discard(self, label):
+        self.detach(label)
+        if label in self.resident:
+            self.parser.remove_document(label)
+            self.resident_bytes -= self.resident.pop(label)
+        elif label in self.spilled:
+            (path, size, offset) = self.spilled.pop(label)
+            if offset is None and os.path.exists(path):
+                os.remove(path)
+        self.last_used.pop(label, None)
+
+    def restore(self, entries):
+        # Add documents that are stored in a shard file without
+        # loading them: entries maps labels to the (file, size,
+        # offset) of each document. Each one is registered with
+        # Holmes the first time it is used.
+        now = time.time()
+        for label, entry in entries.items():
+            self.discard(label)
+            self.spilled[label] = tuple(entry)
+            self.last_used[label] = now
+
+    def enforce_limits(self, keep=[]):
+        # Spill documents until we are within the limits, oldest
+        # first, but never the ones in keep
+        now = time.time()
+        for label in list(self.resident):
+            if label in keep:
+                continue
+            expired = self.ttl is not None \
+                and now - self.last_used[label] > self.ttl
+            if not expired and not self.over_limits():
+                break
+            self.spill(label)
+
+    def expire(self):
+        # Spill the documents that have gone unused for ttl seconds
+        # (and any over the limits). Returns how many were spilled.
+        spills = self.spills
+        self.enforce_limits()
+        return self.spills - spills
+
+    def over_limits(self):
+        if self.max_documents is not None \
+           and len(self.resident) > self.max_documents:
+            return True
+        if self.max_bytes is not None \
+           and self.resident_bytes + self.attached_bytes > self.max_bytes:
+            return True
+        return False
+
+    def spill_path(self, label):
+        if self.spill_dir is None:
+            self.spill_dir = tempfile.mkdtemp(prefix='awe_spill_')
+            self.made_spill_dir = True
+        os.makedirs(self.spill_dir, exist_ok=True)
+        name = hashlib.sha256(label.encode('utf-8')).hexdigest()
+        return os.path.join(self.spill_dir, name + '.holmes')
+
+    def spill(self, label):
+        path = self.spill_path(label)
+        with open(path, 'wb') as fp:
+            fp.write(self.parser.serialize_document(label))
+        self.parser.remove_document(label)
+        self.detach(label)
+        size = self.resident.pop(label)
+        self.resident_bytes -= size
+        self.spilled[label] = (path, size, None)
+        self.spills += 1
+        if self.on_spill is not None:
+            self.on_spill(label)
+
+    def read_spilled(self, label):
+        (path, size, offset) = self.spilled[label]
+        with open(path, 'rb') as fp:
+            if offset is not None:
+                fp.seek(offset)
+            return fp.read(size)
+
+    def rehydrate(self, label):
+        serialized = self.read_spilled(label)
+        (path, size, offset) = self.spilled.pop(label)
+        self.parser.register_serialized_documents({label: serialized})
+        if offset is None:
+            os.remove(path)
+        self.resident[label] = size
+        self.resident_bytes += size
+        self.rehydrations += 1
+
+    def close(self):
+        if self.made_spill_dir:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+    def memory(self):
+        # How much memory each document takes up, and whether it is
+        # held by Holmes or has been spilled to disk
+        now = time.time()
+        documents = {}
+        for label, size in self.resident.items():
+            documents[label] = {'state': 'resident',
+                                'bytes': size,
+                                'attached_bytes':
+                                    self.attached.get(label, 0),
+                                'idle': now - self.last_used[label]}
+        for label, (path, size, offset) in self.spilled.items():
+            documents[label] = {'state': 'spilled',
+                                'bytes': size,
+                                'idle': now - self.last_used[label]}
+        return {'documents': documents,
+                'resident_documents': len(self.resident),
+                'resident_bytes': self.resident_bytes,
+                'attached_bytes': self.attached_bytes,
+                'spilled_documents': len(self.spilled),
+                'spilled_bytes': sum(size for (path, size, offset)
+                                     in self.spilled.values()),
+                'spills': self.spills,
+                'rehydrations': self.rehydrations,
+                'max_documents': self.max_documents,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl}
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import json
+import os
+import struct
+
+# The binary format used to move parsed documents around in bulk: the
+# EXPORT command streams it, IMPORT reads it, and parsed corpora are
+# stored on disk in it.
+#
+# A shard starts with a header:
+#
+#     b'AWEDOC01'
+#     4-byte big-endian length, then that many bytes of JSON metadata
+#         describing the pipeline the documents were parsed with
+#
+# followed by any number of records, one per document:
+#
+#     4-byte big-endian length, then the label in UTF-8
+#     8-byte big-endian length, then the serialized document (the
+#         bytes Holmes' serialize_document returns)
+#
+# Since every length comes first, a reader can walk the records
+# without decoding the documents, and can hand out slices of the
+# buffer rather than copies.
+#
+# A snapshot of the parser server is a directory holding one shard
+# and snapshot.json, an index giving the position and size of each
+# document in the shard, so that documents can be read one at a time
+# when they are needed.
+
+MAGIC = b'AWEDOC01'
+shardSuffix = '.shard'
+snapshotIndex = 'snapshot.json'
+labelLength = struct.Struct('>I')
+documentLength = struct.Struct('>Q')
+
+
+def pipeline_metadata(nlp):
+    # What a parsed document depends on: the spacy version, the model
+    # and its version, and the components in the pipeline
+    import spacy
+    return {'spacy': spacy.__version__,
+            'model': nlp.meta.get('lang', '') + '_' + nlp.meta.get('name', ''),
+            'model_version': nlp.meta.get('version'),
+            'pipeline': list(nlp.pipe_names)}
+
+
+def compatible(metadata, expected):
+    # Whether documents described by metadata can be loaded into the
+    # pipeline described by expected. The patch level of spacy and
+    # the model does not matter.
+    def minor(version):
+        return '.'.join(str(version).split('.')[:2])
+
+    problems = []
+    if minor(metadata.get('spacy')) != minor(expected.get('spacy')):
+        problems.append('spacy ' + str(metadata.get('spacy'))
+                        + ' != ' + str(expected.get('spacy')))
+    if metadata.get('model') != expected.get('model') \
+       or minor(metadata.get('model_version')) \
+            != minor(expected.get('model_version')):
+        problems.append('model ' + str(metadata.get('model')) + ' '
+                        + str(metadata.get('model_version')) + ' != '
+                        + str(expected.get('model')) + ' '
+                        + str(expected.get('model_version')))
+    if metadata.get('pipeline') != expected.get('pipeline'):
+        problems.append('pipeline ' + str(metadata.get('pipeline'))
+                        + ' != ' + str(expected.get('pipeline')))
+    return problems
+
+
+def encode_header(metadata={}):
+    metadata = json.dumps(metadata).encode('utf-8')
+    return MAGIC + labelLength.pack(len(metadata)) + metadata
+
+
+def encode_record(label, serialized):
+    label = label.encode('utf-8')
+    return labelLength.pack(len(label)) + label \
+        + documentLength.pack(len(serialized)) + serialized
+
+
+def decode_header(data, offset=0):
+    # The metadata of the shard in data, and the offset of its
+    # first record
+    if bytes(data[offset:offset + len(MAGIC)]) != MAGIC:
+        raise ValueError('Not an AWE document shard')
+    offset += len(MAGIC)
+    (size,) = labelLength.unpack_from(data, offset)
+    offset += labelLength.size
+    metadata = json.loads(bytes(data[offset:offset + size]).decode('utf-8'))
+    return metadata, offset + size
+
+
+def decode_records(data, offset=0):
+    # Yield (label, document) for each record in data from offset
+    # on. The documents are memoryview slices of data.
+    data = memoryview(data)
+    while offset < len(data):
+        (size,) = labelLength.unpack_from(data, offset)
+        offset += labelLength.size
+        label = bytes(data[offset:offset + size]).decode('utf-8')
+        offset += size
+        (size,) = documentLength.unpack_from(data, offset)
+        offset += documentLength.size
+        if offset + size > len(data):
+            raise ValueError('Truncated document record for ' + label)
+        yield label, data[offset:offset + size]
+        offset += size
+
+
+def decode_shard(data):
+    # The metadata and a dictionary of the documents in a shard
+    metadata, offset = decode_header(data)
+    return metadata, {label: bytes(document)
+                      for label, document in decode_records(data, offset)}
+
+
+class shardWriter:
+
+    # Writes a shard file one document at a time
+
+    fp = None
+
+    def __init__(self, path, metadata={}):
+        self.path = path
+        self.count = 0
+        self.fp = open(path, 'wb')
+        header = encode_header(metadata)
+        self.fp.write(header)
+        self.position = len(header)
+
+    def write(self, label, serialized):
+        # Returns the position of the document in the file
+        record = encode_record(label, serialized)
+        self.fp.write(record)
+        self.position += len(record)
+        self.count += 1
+        return self.position - len(serialized)
+
+    def write_all(self, documents):
+        # Write a list of (label, serialized) and return the position
+        # and size of each document, by label
+        return {label: (self.write(label, serialized), len(serialized))
+                for label, serialized in documents}
+
+    def close(self):
+        self.fp.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def shard_files(path):
+    # The shard files in a directory, in order, or path itself if it
+    # is a file
+    if not os.path.isdir(path):
+        return [path]
+    return [os.path.join(path, name) for name in sorted(os.listdir(path))
+            if name.endswith(shardSuffix)]
+
+
+def read_bytes(path):
+    with open(path, 'rb') as fp:
+        return fp.read()
+
+
+def read_shard(path):
+    return decode_shard(read_bytes(path))
+
+
+def write_index(directory, index):
+    # Write the index of a snapshot (see parserServer.snapshot). It is
+    # written to a temporary file and renamed into place, so that
+    # readers see either the old index or the whole of the new one.
+    path = os.path.join(directory, snapshotIndex)
+    with open(path + '.tmp', 'w') as fp:
+        json.dump(index, fp)
+    os.replace(path + '.tmp', path)
+
+
+def read_index(directory):
+    with open(os.path.join(directory, snapshotIndex)) as fp:
+        return json.load(fp)
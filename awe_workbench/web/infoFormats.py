@@ -0,0 +1,196 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+# Other ways of laying out token-level AWE_Info results.
+#
+# AWE_Info returns token-level results as a dictionary keyed by token
+# index, with an object for each token holding its value, offset,
+# length and text. For a long essay that repeats the same field names
+# hundreds of times. A client can ask for the columns format instead,
+# which has one list per field (plus an index list giving the token
+# index of each position):
+#
+#     {"index": [0, 1, ...], "value": [...], "offset": [...], ...}
+#
+# or for the sparse format, which is the same but leaves out the
+# tokens that have no value (None or False), so that flag indicators
+# only list the tokens that are flagged.
+#
+# Results that are not in the token dictionary form (lists, single
+# numbers, document-level results) are passed on unchanged.
+#
+# Flag indicators (QUOTEDTEXT, IN_DIRECT_SPEECH, PASTTENSESCOPE, ...)
+# come in long runs of the same value, and span results
+# (PERSPECTIVESPANS) are long lists of consecutive token indices.
+# Two more formats make these compact:
+#
+# intervals: the tokens that are flagged (have a true value) as a
+#     sorted list of [start, end) token index intervals, plus the
+#     [start, end) character offsets of each interval:
+#
+#         {"intervals": [[3, 9], ...], "offsets": [[12, 40], ...]}
+#
+#     A list of token indices becomes a list of intervals, and a list
+#     of true/false flags the intervals of the true ones. Lists and
+#     dictionaries of these (as in PERSPECTIVESPANS) keep their
+#     structure, with each list of indices replaced by its intervals.
+#
+# rle: the value of every token, run-length encoded as a list of
+#     [value, count] pairs, {"runs": [[false, 12], [true, 5], ...]}.
+#     Tokens that are missing from the result count as null.
+#
+# expand_intervals, interval_positions and expand_runs turn these
+# back into flags, indices and values on the client.
+
+infoFormats = ['columns', 'sparse', 'intervals', 'rle']
+
+
+def is_token_info(info):
+    if not isinstance(info, dict) or len(info) == 0:
+        return False
+    for key, entry in info.items():
+        if not isinstance(entry, dict):
+            return False
+        try:
+            int(key)
+        except ValueError:
+            return False
+    return True
+
+
+def has_value(value):
+    return value is not None and value is not False
+
+
+def to_columns(info, sparse=False):
+    if not is_token_info(info):
+        return info
+    keys = sorted(info, key=int)
+    if sparse:
+        keys = [key for key in keys if has_value(info[key].get('value'))]
+    fields = []
+    for key in keys:
+        for field in info[key]:
+            if field not in fields:
+                fields.append(field)
+    columns = {'index': [int(key) for key in keys]}
+    for field in fields:
+        columns[field] = [info[key].get(field) for key in keys]
+    return columns
+
+
+def from_columns(columns):
+    # Turn a columns or sparse result back into the dictionary that
+    # AWE_Info returns (without the tokens a sparse result left out)
+    if not isinstance(columns, dict) or 'index' not in columns:
+        return columns
+    fields = [field for field in columns if field != 'index']
+    return {str(index): {field: columns[field][i] for field in fields}
+            for i, index in enumerate(columns['index'])}
+
+
+def to_intervals(positions):
+    intervals = []
+    for i in sorted(set(positions)):
+        if len(intervals) > 0 and intervals[-1][1] == i:
+            intervals[-1][1] = i + 1
+        else:
+            intervals.append([i, i + 1])
+    return intervals
+
+
+def is_index(value):
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def to_info_intervals(info):
+    if is_token_info(info):
+        keys = sorted(info, key=int)
+        flagged = [int(key) for key in keys if info[key].get('value')]
+        intervals = to_intervals(flagged)
+        result = {'intervals': intervals}
+        if all('offset' in info[str(i)] and 'length' in info[str(i)]
+               for i in flagged):
+            result['offsets'] = \
+                [[info[str(start)]['offset'],
+                  info[str(end - 1)]['offset']
+                  + info[str(end - 1)]['length']]
+                 for [start, end] in intervals]
+        return result
+    elif isinstance(info, list):
+        if all(isinstance(value, bool) for value in info):
+            return to_intervals([i for i, value in enumerate(info) if value])
+        elif all(is_index(value) for value in info):
+            return to_intervals(info)
+        return [to_info_intervals(value) for value in info]
+    elif isinstance(info, dict):
+        return {key: to_info_intervals(value) for key, value in info.items()}
+    return info
+
+
+def to_runs(values):
+    runs = []
+    for value in values:
+        # (True == 1 in Python, but they are not the same value here)
+        if len(runs) > 0 \
+           and runs[-1][0] == value \
+           and type(runs[-1][0]) is type(value):
+            runs[-1][1] += 1
+        else:
+            runs.append([value, 1])
+    return runs
+
+
+def to_info_runs(info):
+    if is_token_info(info):
+        values = [None] * (max(int(key) for key in info) + 1)
+        for key, entry in info.items():
+            values[int(key)] = entry.get('value')
+        return {'runs': to_runs(values)}
+    elif isinstance(info, list) \
+            and not any(isinstance(value, (list, dict)) for value in info):
+        return {'runs': to_runs(info)}
+    return info
+
+
+def expand_intervals(intervals, length=None):
+    # A list of flags, one per token, from intervals (or from the
+    # result of the intervals format). length defaults to the end
+    # of the last interval.
+    if isinstance(intervals, dict):
+        intervals = intervals['intervals']
+    if length is None:
+        length = max([end for [start, end] in intervals], default=0)
+    flags = [False] * length
+    for [start, end] in intervals:
+        flags[start:end] = [True] * (end - start)
+    return flags
+
+
+def interval_positions(intervals):
+    # The token indices covered by a list of intervals
+    if isinstance(intervals, dict):
+        intervals = intervals['intervals']
+    return [i for [start, end] in intervals for i in range(start, end)]
+
+
+def expand_runs(runs):
+    # The list of values from the result of the rle format
+    if isinstance(runs, dict):
+        runs = runs['runs']
+    values = []
+    for [value, count] in runs:
+        values.extend([value] * count)
+    return values
+
+
+def format_info(info, infoFormat):
+    if infoFormat == 'columns':
+        return to_columns(info)
+    elif infoFormat == 'sparse':
+        return to_columns(info, sparse=True)
+    elif infoFormat == 'intervals':
+        return to_info_intervals(info)
+    elif infoFormat == 'rle':
+        return to_info_runs(info)
+    return info
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import hashlib
+from collections import OrderedDict
+from awe_workbench.pipeline import default_profile
+
+# Parsed documents by the content of the text that was parsed.
+# Students resubmit unchanged essays, the same text is often sent
+# under more than one label, and scripts such as
+# multiple_essay_report.py send every document again when they are
+# rerun. Running the whole pipeline on a text we have already parsed
+# gives the same document, so we keep the serialized document for
+# each text and register that instead.
+#
+# Texts are only treated as identical if they are the same string:
+# the offsets the server sends back refer to the text the client
+# submitted, so normalizing whitespace or unicode before parsing
+# would change them. The cache holds at most max_bytes of serialized
+# documents, evicting the least recently used ones first.
+
+
+def text_key(text, profile=default_profile):
+    # A text parsed with a different pipeline profile (see
+    # pipeline.py) gives a different document, so the profile is
+    # part of the key. It goes in with its length, so that no text
+    # parsed with one profile can have the same key as another text
+    # parsed with another.
+    prefix = str(len(profile)) + ':' + profile + ':'
+    return hashlib.sha256((prefix + text).encode('utf-8')).hexdigest()
+
+
+def paragraph_key(text, profile=default_profile):
+    # The key for a document put together from paragraphs parsed on
+    # their own (see textDelta). tok2vec and the parser see a little
+    # less context at the paragraph edges than they would parsing
+    # the whole text, so such a document is close to, but not always
+    # the same as, what text_key stands for. A different key means a
+    # later PARSEONE of the same text parses it properly rather than
+    # finding it unchanged, and these documents never go in the
+    # parse cache.
+    return text_key(text, profile + '+paragraphs')
+
+
+class parseCache:
+
+    entries = None
+
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        # The serialized document parsed from the text with this key,
+        # or None
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key]
+        self.misses += 1
+        return None
+
+    def put(self, key, serialized):
+        if len(serialized) > self.max_bytes:
+            return
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = serialized
+        self.size += len(serialized)
+        while self.size > self.max_bytes:
+            (oldest, evicted) = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+            self.evictions += 1
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes}
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from awe_workbench.web.documentShards import pipeline_metadata
+from awe_workbench.web.parseCache import paragraph_key
+from awe_workbench.web.textDelta import edited_paragraphs
+from awe_workbench.pipeline import disabled_components, default_profile, \
+    paragraph_components
+
+# Parsing a document with the full AWE pipeline (spacy + coreferee +
+# the AWE components) takes seconds for a long essay. If that happens
+# inside the asyncio handler of the parser server, every other
+# connection waits. So we do the parsing in a pool of worker processes.
+# Each worker builds its own Holmes manager from pipeline_def when it
+# starts and keeps it for the life of the process. Only the serialized
+# document is sent back; the server registers it with its own manager.
+
+# The Holmes manager owned by this worker process, and the barrier
+# that the workers meet at when the pool is warmed up
+worker_manager = None
+worker_barrier = None
+
+
+def init_worker(pipeline_def, barrier=None):
+    global worker_manager, worker_barrier
+    worker_barrier = barrier
+    import holmes_extractor.manager
+    # We only use this manager for its spacy pipeline, so there is no
+    # point in starting more than one Holmes document worker for it.
+    worker_manager = holmes_extractor.manager.Manager(
+        model='en_core_web_lg',
+        perform_coreference_resolution=True,
+        number_of_workers=1,
+        extra_components=pipeline_def)
+
+
+def worker_ready(timeout=None):
+    # Held until every worker has taken one of these jobs, so that
+    # one fast worker cannot take them all (see parsePool.warm_up)
+    if worker_barrier is not None:
+        try:
+            worker_barrier.wait(timeout)
+        except threading.BrokenBarrierError:
+            return False
+    return worker_manager is not None
+
+
+def skipped_components(profile, defer):
+    # The components that profile leaves out (see pipeline.py), and
+    # the ones in defer that will be run later if they are needed
+    nlp = worker_manager.nlp
+    skipped = disabled_components(profile, nlp.pipe_names)
+    return skipped + [name for name in defer
+                      if name in nlp.pipe_names and name not in skipped]
+
+
+def parse_document(text, profile=default_profile, defer=[]):
+    return worker_manager.nlp(
+        text, disable=skipped_components(profile, defer)).to_bytes()
+
+
+def parse_documents(texts, profile=default_profile, defer=[]):
+    # nlp.pipe lets spacy share batch work across the documents
+    return [doc.to_bytes()
+            for doc in worker_manager.nlp.pipe(
+                texts, disable=skipped_components(profile, defer))]
+
+
+def complete_document(serialized, components):
+    # Run components that were left out when a document was parsed,
+    # in pipeline order, and return the serialized result
+    from spacy.tokens import Doc
+    nlp = worker_manager.nlp
+    doc = Doc(nlp.vocab).from_bytes(serialized)
+    for name in nlp.pipe_names:
+        if name in components:
+            doc = nlp.get_pipe(name)(doc)
+    return doc.to_bytes()
+
+
+def parse_base(paragraphs):
+    # Parse paragraphs with the spacy model's own components only
+    # (see pipeline.paragraph_components)
+    nlp = worker_manager.nlp
+    return list(nlp.pipe(paragraphs,
+                         disable=[name for name in nlp.pipe_names
+                                  if name not in paragraph_components]))
+
+
+def join_paragraphs(docs, profile=default_profile, defer=[]):
+    # Join paragraphs parsed by parse_base into one document, and run
+    # the rest of the pipeline on it
+    from spacy.tokens import Doc
+    doc = Doc.from_docs(docs, ensure_whitespace=False)
+    skipped = skipped_components(profile, defer)
+    for name, component in worker_manager.nlp.pipeline:
+        if name not in paragraph_components and name not in skipped:
+            doc = component(doc)
+    return doc
+
+
+def parse_paragraphs(paragraphs):
+    # The serialized parse_base documents for paragraphs of a text
+    # that is still arriving (see textUpload)
+    return [doc.to_bytes() for doc in parse_base(paragraphs)]
+
+
+def assemble_document(parsed, remainder, profile=default_profile, defer=[]):
+    # The serialized document for an uploaded text, from the
+    # paragraphs parse_paragraphs has done and the text after them
+    from spacy.tokens import Doc
+    vocab = worker_manager.nlp.vocab
+    docs = [Doc(vocab).from_bytes(serialized) for serialized in parsed]
+    if len(remainder) > 0:
+        docs.extend(parse_base([remainder]))
+    return join_paragraphs(docs, profile, defer).to_bytes()
+
+
+def splice_document(previous, offset, deleted, inserted,
+                    profile=default_profile, defer=[]):
+    # Build the document for an edit to the text of a previous one
+    # (see textDelta). Paragraphs the edit does not touch keep the
+    # analyses the spacy model's components gave them, the changed
+    # ones are parsed with those components only, and the rest of
+    # the pipeline is run on the joined document. Returns the
+    # serialized document, its key (see parseCache.paragraph_key),
+    # and the number of paragraphs in it and that had to be parsed.
+    from spacy.tokens import Doc
+    old = Doc(worker_manager.nlp.vocab).from_bytes(previous)
+    text, paragraphs = edited_paragraphs(old.text, offset, deleted, inserted)
+    if len(paragraphs) == 0:
+        raise ValueError('Edit leaves the document empty')
+    docs = []
+    changed = []
+    for i, (paragraph, start) in enumerate(paragraphs):
+        span = None
+        if start is not None:
+            span = old.char_span(start, start + len(paragraph))
+        if span is None:
+            docs.append(None)
+            changed.append(i)
+        else:
+            docs.append(span.as_doc())
+    for i, doc in zip(changed,
+                      parse_base([paragraphs[i][0] for i in changed])):
+        docs[i] = doc
+    return (join_paragraphs(docs, profile, defer).to_bytes(),
+            paragraph_key(text, profile),
+            {'paragraphs': len(paragraphs), 'reparsed': len(changed)})
+
+
+def worker_metadata():
+    # The pipeline this worker parses with (see documentShards)
+    return pipeline_metadata(worker_manager.nlp)
+
+
+class parsePool:
+
+    executor = None
+    workers = None
+
+    def __init__(self, pipeline_def=[], workers=2, defer=[]):
+
+        # Components to leave out of every parse (see
+        # pipeline.deferred_components)
+        self.defer = defer
+
+        # Use spawn rather than fork: the server process already has
+        # Holmes worker processes and threads running when we start.
+        self.workers = workers
+        context = multiprocessing.get_context('spawn')
+        self.executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=init_worker,
+            initargs=(pipeline_def, context.Barrier(workers)))
+
+    def warm_up(self, timeout=600):
+        # Make every worker load its pipeline now, rather than
+        # on the first request it happens to receive. Each job waits
+        # at a barrier until all of them have started, which needs
+        # one worker for each, so every worker has loaded when they
+        # return. Returns False if they did not all get there within
+        # timeout seconds.
+        futures = [self.executor.submit(worker_ready, timeout)
+                   for i in range(self.workers)]
+        return all(future.result() for future in futures)
+
+    async def run(self, function, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, function, *args)
+
+    async def parse(self, text, profile=default_profile):
+        return await self.run(parse_document, text, profile, self.defer)
+
+    async def parse_batch(self, texts, profile=default_profile):
+        return await self.run(parse_documents, texts, profile, self.defer)
+
+    async def splice(self, previous, offset, deleted, inserted,
+                     profile=default_profile):
+        return await self.run(splice_document, previous, offset, deleted,
+                              inserted, profile, self.defer)
+
+    async def assemble(self, parsed, remainder, profile=default_profile):
+        return await self.run(assemble_document, parsed, remainder,
+                              profile, self.defer)
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class parseBatcher:
+
+    # Collects parse requests that arrive within max_wait seconds of
+    # each other (or until max_batch_size of them are waiting) and
+    # sends them to the pool as a single batch, so that concurrent
+    # submissions go through nlp.pipe together. Each caller gets back
+    # the serialized document for its own text. Texts for different
+    # pipeline profiles go to the pool as separate batches.
+
+    pool = None
+    pending = None
+    timer = None
+
+    def __init__(self, pool, max_batch_size=16, max_wait=0.01):
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.pending = []
+
+    async def parse(self, text, profile=default_profile):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((text, profile, future))
+        if len(self.pending) >= self.max_batch_size:
+            self.flush()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.max_wait, self.flush)
+        return await future
+
+    def flush(self):
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batches = {}
+        for text, profile, future in self.pending:
+            batches.setdefault(profile, []).append((text, future))
+        self.pending = []
+        for profile, batch in batches.items():
+            asyncio.ensure_future(self.run_batch(batch, profile))
+
+    async def run_batch(self, batch, profile=default_profile):
+        texts = [text for text, future in batch]
+        try:
+            results = await self.pool.parse_batch(texts, profile)
+        except Exception as e:
+            for text, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (text, future), serialized in zip(batch, results):
+            if not future.done():
+                future.set_result(serialized)
@@ -3,6 +3,9 @@
 
 import asyncio
 import base64
+import os
+import time
+from collections import OrderedDict
 import websockets
 import json
 import awe_workbench
@@ -11,35 +14,685 @@ import holmes_extractor.manager
 import holmes_extractor.ontology
 from holmes_extractor.manager import Manager
 from holmes_extractor.ontology import Ontology
-from awe_components.components.utility_functions import content_pos
+from awe_workbench.web.parsePool import parsePool, parseBatcher, \
+    complete_document, parse_paragraphs
+from awe_workbench.web.textUpload import textUpload
+from awe_workbench.web.summaryEngine import summaryEngine
+from awe_workbench.web.tokenColumns import tokenColumns
+from awe_workbench.web.responseCache import responseCache
+from awe_workbench.web.parseCache import parseCache, text_key, \
+    paragraph_key
+from awe_workbench.web.documentRegistry import documentRegistry
+from awe_workbench.web.wireCodec import subprotocols, decode_message, \
+    encode_response, encode_value, to_json, to_object, text_reply, \
+    quoted_text, MSGPACK
+from awe_workbench.web.infoFormats import format_info, infoFormats
+from awe_workbench.web.serverStatus import process_memory, write_status
+from awe_workbench.pipeline import pipeline_profiles, default_profile, \
+    deferred_components, disabled_components, indicator_components
+from awe_workbench.web.documentShards import encode_header, \
+    encode_record, decode_header, decode_records, pipeline_metadata, \
+    compatible, shard_files, read_bytes, shardWriter, shardSuffix, \
+    write_index, read_index, MAGIC
 
 class parserServer:
 
     # Initialize
     parser = None
+    parse_pool = None
+    parse_batcher = None
 
-    def __init__(self, pipeline_def=[]):
+    # The registered documents (see documentRegistry), which spills
+    # the least recently used ones to disk when there are too many
+    registry = None
+
+    # Column stores (see tokenColumns) for the documents that have been
+    # queried, by label, in order of last use. The store also holds on
+    # to the deserialized document, so we only fetch it from Holmes
+    # once. That is a second copy of the document, so we keep at most
+    # max_column_stores of them, and the registry counts their size
+    # against its byte limit.
+    column_stores = None
+
+    # Replies to read-only commands (see responseCache), and the
+    # number of times a document has been registered under each
+    # label, which is part of the cache key
+    response_cache = None
+    versions = None
+
+    # Serialized documents by the text they were parsed from (see
+    # parseCache), the key of the text registered under each label,
+    # and the parses that are currently running, by text key
+    parse_cache = None
+    text_keys = None
+    parsing = None
+
+    # Load state for STATUS: the state of each component, and how
+    # long each took to load
+    components = None
+    load_seconds = None
+
+    # Locks that keep the edits to each document (see PARSEDELTA) in
+    # the order they arrived, by label
+    edit_locks = None
+
+    # With defer_components, the components that documents are parsed
+    # without, the ones that have still not been run on each document,
+    # by label, and the runs in progress, by label
+    defer = None
+    pending_components = None
+    completing = None
+
+    # The pipeline profile (see pipeline.py) each document was parsed
+    # with, by label, for those not parsed with the default profile
+    profiles = None
+
+    def __init__(self,
+                 pipeline_def=[],
+                 parse_workers=2,
+                 batch_size=16,
+                 batch_wait=0.01,
+                 holmes_workers=None,
+                 cache_bytes=64 * 2 ** 20,
+                 parse_cache_bytes=256 * 2 ** 20,
+                 max_documents=None,
+                 max_document_bytes=None,
+                 document_ttl=None,
+                 spill_dir=None,
+                 max_requests_per_connection=64,
+                 import_from=None,
+                 restore_from=None,
+                 ready_file=None,
+                 defer_components=False,
+                 max_upload_bytes=2 ** 26,
+                 max_column_stores=32):
+
+        # What STATUS reports. If ready_file is given, the status is
+        # also written there as we load (see serverStatus), so that
+        # whoever started us can tell when we are ready.
+        self.started = time.time()
+        self.ready = False
+        self.ready_file = ready_file
+        self.components = {'holmes': 'loading', 'parse_pool': 'loading'}
+        self.load_seconds = {}
+        self.connections = 0
+        self.active_requests = 0
+        self.report_status()
 
         # set up and initializing Holmes
         # Start the Holmes manager with the English model
         # You can try setting overall_similarity_threshold
         # to 0.85 and/or perform_coreference_resolution to False
+        # holmes_workers is the number of Holmes worker processes
+        # that documents are distributed across (None means one
+        # per core)
+        start = time.time()
         self.parser = holmes_extractor.manager.Manager(
             model='en_core_web_lg',
             perform_coreference_resolution=True,
+            number_of_workers=holmes_workers,
             extra_components=pipeline_def)
+        self.loaded('holmes', start)
+        for name in self.parser.nlp.pipe_names:
+            self.components[name] = 'loaded'
+        self.report_status()
+        self.registry = documentRegistry(self.parser,
+                                         max_bytes=max_document_bytes,
+                                         max_documents=max_documents,
+                                         ttl=document_ttl,
+                                         spill_dir=spill_dir,
+                                         on_spill=self.forget)
+        self.column_stores = OrderedDict()
+        self.max_column_stores = max_column_stores
+        self.response_cache = responseCache(max_bytes=cache_bytes)
+        self.versions = {}
+        self.max_requests_per_connection = max_requests_per_connection
+
+        # The most text a connection can have buffered in chunked
+        # uploads (PARTIALTEXT, and BEGINTEXT ... COMMITTEXT) at once
+        self.max_upload_bytes = max_upload_bytes
+        self.parse_cache = parseCache(max_bytes=parse_cache_bytes)
+        self.text_keys = {}
+        self.parsing = {}
+
+        # The document-level components (see
+        # pipeline.deferred_components) can be left out when we parse
+        # and run on a document the first time a command needs what
+        # they compute (see complete), so that a document that is
+        # only asked for its tokens and token features never pays
+        # for them
+        self.defer = [name for name in deferred_components
+                      if name in self.parser.nlp.pipe_names] \
+            if defer_components else []
+        self.pending_components = {}
+        self.completing = {}
+        self.profiles = {}
+        self.edit_locks = {}
+
+        # The texts of the registered search phrases, so that they can
+        # be saved in a snapshot, and a lock so that only one snapshot
+        # is written at a time
+        self.search_phrases = []
+        self.snapshot_lock = asyncio.Lock()
+
+        # The actual parsing is done in a pool of worker processes,
+        # each with its own copy of the pipeline, so that a long
+        # essay does not block the event loop for everyone else.
+        start = time.time()
+        self.parse_pool = parsePool(pipeline_def,
+                                    workers=parse_workers,
+                                    defer=self.defer)
+        self.parse_pool.warm_up()
+        self.loaded('parse_pool', start)
+
+        # PARSEONE requests that arrive within batch_wait seconds of
+        # each other are parsed together as one nlp.pipe batch
+        self.parse_batcher = parseBatcher(self.parse_pool,
+                                          max_batch_size=batch_size,
+                                          max_wait=batch_wait)
+
+        # Documents parsed offline (or exported from another server)
+        # can be loaded at startup from a shard file or a directory
+        # of them, instead of parsing the texts again
+        if import_from is not None:
+            start = time.time()
+            print('imported',
+                  asyncio.get_event_loop().run_until_complete(
+                      self.import_path(import_from)))
+            self.loaded('import', start)
+
+        # or from a snapshot (see snapshot), in which case each
+        # document is only loaded when it is first used
+        if restore_from is not None:
+            start = time.time()
+            print('restored',
+                  asyncio.get_event_loop().run_until_complete(
+                      self.restore(restore_from)))
+            self.loaded('restore', start)
 
         asyncio.get_event_loop().run_until_complete(
-            websockets.serve(self.run_parser, 'localhost', 8766, max_size=2 ** 24))
+            websockets.serve(self.run_parser,
+                             'localhost',
+                             8766,
+                             max_size=2 ** 24,
+                             subprotocols=subprotocols()))
+        self.ready = True
+        self.load_seconds['total'] = time.time() - self.started
+        self.report_status()
+        if document_ttl is not None:
+            asyncio.get_event_loop().create_task(
+                self.expire_documents(document_ttl))
         print('parser running')
         asyncio.get_event_loop().run_forever()
         print('died')
 
+    async def expire_documents(self, ttl):
+        # The registry only applies the TTL when a document is
+        # registered or used, so an idle server would hold on to
+        # every document. Check every so often, which spills documents
+        # at most about half a TTL (or a minute) late.
+        interval = min(max(ttl / 2, 1), 60)
+        while True:
+            await asyncio.sleep(interval)
+            self.registry.expire()
+
+    def loaded(self, component, start):
+        self.components[component] = 'loaded'
+        self.load_seconds[component] = time.time() - start
+        self.report_status()
+
+    def status(self):
+        # Whether we are ready, how long loading took, and how busy we
+        # are. queue counts the requests being answered (including
+        # this one, for STATUS), the texts waiting to go to the parse
+        # pool and the texts being parsed.
+        status = {'state': 'ready' if self.ready else 'loading',
+                  'pid': os.getpid(),
+                  'uptime': time.time() - self.started,
+                  'components': dict(self.components),
+                  'load_seconds': dict(self.load_seconds),
+                  'connections': self.connections,
+                  'memory': process_memory()}
+        if self.ready:
+            status['documents'] = len(self.registry)
+            status['resident_documents'] = len(self.registry.resident)
+            status['queue'] = {
+                'requests': self.active_requests,
+                'waiting_to_parse': len(self.parse_batcher.pending),
+                'parsing': len(self.parsing)}
+            status['memory']['documents'] = self.registry.resident_bytes
+            status['memory']['column_stores'] = \
+                self.registry.attached_bytes
+            status['memory']['response_cache'] = self.response_cache.size
+            status['memory']['parse_cache'] = self.parse_cache.size
+            status['deferred_components'] = list(self.defer)
+            status['pending_documents'] = len(self.pending_components)
+        return status
+
+    def report_status(self):
+        if self.ready_file is not None:
+            write_status(self.ready_file, self.status())
+
     async def kill(self, websocket):
+        self.parse_pool.close()
+        self.registry.close()
         self.parser.close()
         await websocket.close()
         exit()
 
+    def register_document(self, label, serialized, key=None, pending=[],
+                          profile=default_profile):
+        self.register_documents({label: serialized}, {label: key}, pending,
+                                profile)
+
+    def register_documents(self, documents, keys={}, pending=[],
+                           profile=default_profile):
+        # Register documents parsed by the pool (a dictionary from
+        # labels to serialized documents), replacing any documents
+        # previously registered under the same labels. Holmes spreads
+        # the documents across its worker processes. keys gives the
+        # text key of each document, if known, pending the deferred
+        # components they were parsed without, and profile the
+        # pipeline profile they were parsed with (pending and profile
+        # can also be dictionaries by label).
+        self.replace_documents(documents, keys, pending, profile)
+        self.registry.register(documents)
+
+    def replace_documents(self, labels, keys={}, pending=[],
+                          profile=default_profile):
+        # Drop what we hold for documents that are about to be replaced
+        for label in labels:
+            profile_here = profile.get(label, default_profile) \
+                if isinstance(profile, dict) else profile
+            if profile_here != default_profile:
+                self.profiles[label] = profile_here
+            else:
+                self.profiles.pop(label, None)
+            self.text_keys[label] = keys.get(label)
+            self.drop_columns(label)
+            self.response_cache.invalidate(label)
+            self.versions[label] = self.versions.get(label, 0) + 1
+            pending_here = pending.get(label, []) \
+                if isinstance(pending, dict) else pending
+            if len(pending_here) > 0:
+                self.pending_components[label] = list(pending_here)
+            else:
+                self.pending_components.pop(label, None)
+
+    def unmatchable(self):
+        # The documents parsed with a profile that leaves out holmes
+        # (see pipeline.pipeline_profiles). Holmes holds them like the
+        # others, but has no analysis of them, so they are left out
+        # of the results of MATCH_DOCUMENTS and TOPIC_MATCHES.
+        pipe_names = self.parser.nlp.pipe_names
+        return set(label for label, profile in self.profiles.items()
+                   if 'holmes' in disabled_components(profile, pipe_names))
+
+    def pending_for(self, profile):
+        # The deferred components that a document parsed with profile
+        # still needs (the ones the profile leaves out are never run)
+        skipped = disabled_components(profile, self.parser.nlp.pipe_names)
+        return [name for name in self.defer if name not in skipped]
+
+    def remove_document(self, label):
+        # (a new version, so that work still running on the document,
+        # such as deferred components, does not bring it back)
+        self.versions[label] = self.versions.get(label, 0) + 1
+        self.stop_completing(label)
+        self.registry.remove(label)
+        self.text_keys.pop(label, None)
+        self.drop_columns(label)
+        self.response_cache.invalidate(label)
+        self.pending_components.pop(label, None)
+        self.profiles.pop(label, None)
+        # (an edit that holds the lock drops it when it is done)
+        lock = self.edit_locks.get(label)
+        if lock is not None and not lock.locked():
+            del self.edit_locks[label]
+
+    def remove_all_documents(self):
+        for label in self.versions:
+            self.versions[label] += 1
+        for label in list(self.completing):
+            self.stop_completing(label)
+        self.registry.clear()
+        self.text_keys.clear()
+        self.column_stores.clear()
+        self.response_cache.clear()
+        self.pending_components.clear()
+        self.profiles.clear()
+        for label, lock in list(self.edit_locks.items()):
+            if not lock.locked():
+                del self.edit_locks[label]
+
+    async def complete(self, label, components):
+        # Make sure that those of components that were deferred when
+        # the document under label was parsed have been run on it. If
+        # they are already being run for another request, we wait for
+        # that run instead of starting another.
+        while True:
+            needed = [name for name
+                      in self.pending_components.get(label, [])
+                      if name in components]
+            if len(needed) == 0:
+                return
+            if label in self.completing:
+                running = self.completing[label]
+                try:
+                    await asyncio.shield(running)
+                except asyncio.CancelledError:
+                    if not running.cancelled():
+                        raise
+                continue
+            self.completing[label] = running = asyncio.ensure_future(
+                self.run_components(label, needed))
+            try:
+                await asyncio.shield(running)
+            except asyncio.CancelledError:
+                # The document was removed (see stop_completing),
+                # unless it is this request that was cancelled
+                if not running.cancelled():
+                    raise
+            finally:
+                if self.completing.get(label) is running:
+                    self.completing.pop(label, None)
+
+    def stop_completing(self, label):
+        # Give up on the deferred components being run on a document
+        # that is going away. (The pool process finishes its work, but
+        # the result is thrown away.)
+        running = self.completing.pop(label, None)
+        if running is not None:
+            running.cancel()
+
+    async def run_components(self, label, components):
+        # Run components on the document in a pool process, and
+        # register the result under the same label and text key, so
+        # that they are only ever run once on it. If the document is
+        # replaced while they run, the result is thrown away.
+        version = self.versions.get(label)
+        serialized = self.registry.serialized(label)
+        if serialized is None:
+            return
+        completed = await self.parse_pool.run(complete_document,
+                                              serialized,
+                                              components)
+        if self.versions.get(label) != version:
+            return
+        self.register_document(
+            label,
+            completed,
+            self.text_keys.get(label),
+            [name for name in self.pending_components.get(label, [])
+             if name not in components],
+            self.profiles.get(label, default_profile))
+
+    def forget(self, label):
+        # Called when the registry spills a document: the column
+        # store holds the deserialized document, so it has to go too.
+        # Cached replies are still good, since the document has not
+        # changed.
+        self.column_stores.pop(label, None)
+
+    def drop_columns(self, label):
+        self.column_stores.pop(label, None)
+        self.registry.detach(label)
+
+    def token_columns(self, label):
+        # The column store for a registered document, built the
+        # first time it is asked for. Its size (the document, counted
+        # at its serialized size as the registry does, and the columns
+        # built so far) is given to the registry each time it is used.
+        if not self.registry.touch(label):
+            return None
+        if label in self.column_stores:
+            self.column_stores.move_to_end(label)
+        else:
+            doc = self.parser.get_document(label)
+            if doc is None:
+                return None
+            self.column_stores[label] = tokenColumns(doc)
+            while len(self.column_stores) > self.max_column_stores:
+                self.drop_columns(next(iter(self.column_stores)))
+        columns = self.column_stores[label]
+        self.registry.attach(label,
+                             self.registry.resident.get(label, 0)
+                             + columns.nbytes())
+        return columns
+
+    def get_document(self, label):
+        columns = self.token_columns(label)
+        if columns is None:
+            return None
+        return columns.doc
+
+    def awe_info(self, label, **kwargs):
+        # Token-level summaries are computed from the document's
+        # column store; everything else goes to AWE_Info
+        columns = self.token_columns(label)
+        if columns.can_summarize(**kwargs):
+            return columns.summarize(**kwargs)
+        return columns.doc._.AWE_Info(**kwargs)
+
+    def unchanged(self, label, key):
+        # Whether exactly this text is already registered under label
+        return label in self.registry and self.text_keys.get(label) == key
+
+    async def parse_text(self, key, text, profile=default_profile):
+        try:
+            serialized = await self.parse_batcher.parse(text, profile)
+            self.parse_cache.put(key, serialized)
+            return serialized
+        finally:
+            del self.parsing[key]
+
+    async def parse_one(self, label, text, profile=default_profile):
+        # Parse text with the given pipeline profile and register it
+        # under label, unless we have already parsed the same text.
+        # Returns 'unchanged' if the label already holds this text,
+        # 'hit' if the parse cache had it, and 'miss' if it had to be
+        # parsed.
+        key = text_key(text, profile)
+        if self.unchanged(label, key):
+            return 'unchanged'
+        serialized = self.parse_cache.get(key)
+        status = 'hit'
+        if serialized is None:
+            status = 'miss'
+            # If the same text is already being parsed for another
+            # request, wait for that parse rather than starting one
+            if key not in self.parsing:
+                self.parsing[key] = asyncio.ensure_future(
+                    self.parse_text(key, text, profile))
+            serialized = await asyncio.shield(self.parsing[key])
+        self.register_document(label, serialized, key,
+                               self.pending_for(profile), profile)
+        return status
+
+    async def parse_delta(self,
+                          label,
+                          offset,
+                          deleted,
+                          inserted,
+                          profile=None):
+        # Apply an edit (replace deleted characters from offset with
+        # inserted) to the text of the document under label, and
+        # register the new document, parsing only the paragraphs the
+        # edit touched (see textDelta). Edits to the same document are
+        # applied one at a time, in the order they arrived. The new
+        # document is parsed with profile, or by default with the
+        # profile the document was parsed with. Returns the number of
+        # paragraphs in the new text and the number that were parsed.
+        if label not in self.registry:
+            raise ValueError('No document with label ' + str(label))
+        lock = self.edit_locks.setdefault(label, asyncio.Lock())
+        try:
+            async with lock:
+                # (the document may have been removed while we waited)
+                if label not in self.registry:
+                    raise ValueError('No document with label '
+                                     + str(label))
+                if profile is None:
+                    profile = self.profiles.get(label, default_profile)
+                version = self.versions.get(label)
+                previous = self.registry.serialized(label)
+                serialized, key, counts = await self.parse_pool.splice(
+                    previous, offset, deleted, inserted, profile)
+                # (or replaced or removed while we worked)
+                if self.versions.get(label) != version:
+                    raise RuntimeError('Document ' + str(label)
+                                       + ' changed during the edit')
+                self.register_document(label, serialized, key,
+                                       self.pending_for(profile), profile)
+                return counts
+        finally:
+            if label not in self.registry and not lock.locked() \
+               and self.edit_locks.get(label) is lock:
+                del self.edit_locks[label]
+
+    def buffer_upload(self, session, size):
+        # Count size more bytes of uploaded text against the
+        # connection's limit
+        if session['upload_bytes'] + size > self.max_upload_bytes:
+            raise ValueError('Upload exceeds the limit of '
+                             + str(self.max_upload_bytes)
+                             + ' bytes per connection')
+        session['upload_bytes'] += size
+
+    def end_upload(self, session, label):
+        # Drop an upload and release its buffer
+        upload = session['uploads'].pop(label, None)
+        if upload is not None:
+            upload.cancel()
+            session['upload_bytes'] -= upload.size
+        return upload
+
+    def append_upload(self, session, label, index, chunk):
+        # Add the chunk with this index to an upload, and start
+        # parsing any paragraphs that it completes. If the connection
+        # is over its limit, the upload is dropped.
+        upload = session['uploads'].get(label)
+        if upload is None:
+            raise ValueError('No upload for label ' + str(label))
+        size = len(chunk.encode('utf-8'))
+        try:
+            self.buffer_upload(session, size)
+        except ValueError:
+            self.end_upload(session, label)
+            raise
+        try:
+            paragraphs = upload.append(index, chunk)
+        except ValueError:
+            session['upload_bytes'] -= size
+            raise
+        if len(paragraphs) > 0:
+            upload.parsed.append(asyncio.ensure_future(
+                self.parse_pool.run(parse_paragraphs, paragraphs)))
+
+    async def commit_upload(self,
+                            session,
+                            label,
+                            profile=default_profile,
+                            count=None):
+        # Register the text of an upload under label, as for
+        # parse_one, finishing the parse that was started as the
+        # chunks arrived. If count is given, the upload must have
+        # exactly that many chunks. A text we have parsed whole
+        # before comes from the parse cache; otherwise the document
+        # is put together from its paragraphs, which is registered
+        # under its own key and not cached (see
+        # parseCache.paragraph_key).
+        upload = session['uploads'].get(label)
+        if upload is None:
+            raise ValueError('No upload for label ' + str(label))
+        try:
+            text = upload.text(count)
+            if len(text) == 0:
+                raise ValueError('Nothing was uploaded for label '
+                                 + str(label))
+            key = text_key(text, profile)
+            assembled = paragraph_key(text, profile)
+            if self.unchanged(label, key) \
+               or self.unchanged(label, assembled):
+                return 'unchanged'
+            serialized = self.parse_cache.get(key)
+            if serialized is not None:
+                self.register_document(label, serialized, key,
+                                       self.pending_for(profile), profile)
+                return 'hit'
+            parsed = []
+            for future in upload.parsed:
+                parsed.extend(await future)
+            serialized = await self.parse_pool.assemble(parsed,
+                                                        upload.remainder,
+                                                        profile)
+            self.register_document(label, serialized, assembled,
+                                   self.pending_for(profile), profile)
+            return 'miss'
+        finally:
+            if session['uploads'].get(label) is upload:
+                self.end_upload(session, label)
+
+    async def parse_set(self,
+                        labels,
+                        texts,
+                        workers=None,
+                        batch_size=16,
+                        profile=default_profile):
+        # Parse a set of documents in batches of batch_size, with up to
+        # workers batches (by default, one per pool process) being
+        # parsed at the same time. Each batch is registered as soon as
+        # it comes back. Texts found in the parse cache are registered
+        # straight away, and a text that occurs more than once in the
+        # set is only parsed once. Returns the number of documents
+        # that were unchanged, found in the cache, and parsed.
+        if workers is None:
+            workers = self.parse_pool.workers
+        semaphore = asyncio.Semaphore(max(1, workers))
+        batch_size = max(1, batch_size)
+        items = [(labels[i], text) for i, text in enumerate(texts)
+                 if text is not None and len(text) > 0]
+        keys = {label: text_key(text, profile) for label, text in items}
+        counts = {'unchanged': 0, 'hit': 0, 'miss': 0}
+        deferred = self.pending_for(profile)
+
+        cached = {}
+        pending = {}
+        for label, text in items:
+            key = keys[label]
+            if self.unchanged(label, key):
+                counts['unchanged'] += 1
+                continue
+            serialized = self.parse_cache.get(key)
+            if serialized is not None:
+                cached[label] = serialized
+                counts['hit'] += 1
+            else:
+                pending.setdefault(key, (text, []))[1].append(label)
+                counts['miss'] += 1
+        if len(cached) > 0:
+            self.register_documents(cached, keys, deferred, profile)
+
+        unique = list(pending.items())
+        progress = [0]
+
+        async def parse_batch(batch):
+            async with semaphore:
+                serialized = await self.parse_pool.parse_batch(
+                    [text for key, (text, _) in batch], profile)
+            documents = {}
+            for (key, (text, batch_labels)), doc in zip(batch, serialized):
+                self.parse_cache.put(key, doc)
+                for label in batch_labels:
+                    documents[label] = doc
+            self.register_documents(documents, keys, deferred, profile)
+            progress[0] += len(batch)
+            print('parsed', progress[0], 'of', len(unique), 'documents')
+
+        await asyncio.gather(*[parse_batch(unique[i:i + batch_size])
+                               for i in range(0, len(unique), batch_size)])
+        return counts
+
     summaryLabels = [
         'mean_nSyll',
         'med_nSyll',
@@ -226,1101 +879,1619 @@ class parserServer:
     ]
 
     async def run_parser(self, websocket, path):
-        current_doc = ''
+        self.connections += 1
+        try:
+            await self.serve_connection(websocket)
+        finally:
+            self.connections -= 1
+
+    async def serve_connection(self, websocket):
+        # State kept for the life of one connection: text sent with
+        # PARTIALTEXT, the chunked uploads in progress by label (see
+        # textUpload), and the bytes of text they hold
+        session = {'current_doc': '', 'uploads': {}, 'upload_bytes': 0}
+        try:
+            await self.serve_messages(websocket, session)
+        finally:
+            for label in list(session['uploads']):
+                self.end_upload(session, label)
+
+    async def serve_messages(self, websocket, session):
+        # The encoding the client asked for when it connected
+        # (see wireCodec); JSON if it did not ask
+        protocol = websocket.subprotocol
+
+        # Requests sent in an envelope, {"id": ..., "message": [...]},
+        # are handled concurrently, up to max_requests_per_connection
+        # at a time, and each reply goes back as soon as it is ready
+        # as {"id": ..., "response": ...}. Plain messages are still
+        # answered one at a time, in order.
+        in_flight = asyncio.Semaphore(self.max_requests_per_connection)
         async for message in websocket:
 
-            messagelist = json.loads(message)
+            # A binary frame that is a document shard is imported
+            if isinstance(message, bytes) and message.startswith(MAGIC):
+                try:
+                    reply = {'imported': self.import_shard(message)}
+                except ValueError as e:
+                    reply = {'imported': 0, 'error': str(e)}
+                await websocket.send(encode_value(reply, protocol))
+                continue
+
+            messagelist = decode_message(message, protocol)
             print(messagelist)
-            command = ''
+            if isinstance(messagelist, dict):
+                await in_flight.acquire()
+                asyncio.ensure_future(self.respond_to_request(
+                    websocket, messagelist, session, in_flight, protocol))
+                continue
             if messagelist[0] == 'KILL':
-                command = 'KILL'
-                await websocket.send(json.dumps(True))
+                await websocket.send(encode_value(True, protocol))
                 await self.kill(websocket)
-            elif messagelist[0] == 'CLEARPARSED':
-                command = 'CLEARPARSED'
-                self.parser.remove_all_documents()
-                await websocket.send(json.dumps(True))
-            elif messagelist[0] == 'REMOVE':
-                command = 'REMOVE'
-                label = messagelist[1]
-                self.parser.remove_document(label)
-                await websocket.send(json.dumps(True))
-            elif messagelist[0] == 'PARSEONE':
-                command = 'PARSEONE'
-                label = messagelist[1]
-                text = current_doc + messagelist[2]
-                current_doc = ''
-                if label in self.parser.list_document_labels():
-                    self.parser.remove_document(label)
-                self.parser.parse_and_register_document(text, label)
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(True))
-            elif messagelist[0] == 'PARTIALTEXT':
-                current_document += messagelist[2]
-            elif messagelist[0] == 'PARSESET':
-                command = 'PARSESET'
-                results = []
-                [labels, texts] = messagelist[1]
-                for i, text in enumerate(texts):
-                    text = texts[i]
-                    print('parsed document', str(i+1), 'of', len(texts))
-                    if text is not None and len(text) > 0:
-                        if labels[i] in self.parser.list_document_labels():
-                            self.parser.remove_document(labels[i])
-                        self.parser.parse_and_register_document(
-                            text, labels[i])
-                await websocket.send(json.dumps(True))
-            elif messagelist[0] == 'LABELS':
-                command = 'LABELS'
-                labels = self.parser.list_document_labels()
-                await websocket.send(json.dumps(labels))
-            elif messagelist[0] == 'SERIALIZED':
-                command = 'SERIALIZED'
-                label = messagelist[1]
-                serialized = base64.b64encode(
-                    self.parser.serialize_document(label))
-                await websocket.send(serialized)
-            elif messagelist[0] == 'NEWSEARCHPHRASE':
-                command = 'NEWSEARCHPHRASE'
-                search_phrase_text = messagelist[1]
-                label = messagelist[2]
-                ok = self.parser.register_search_phrase(search_phrase_text)
-                await websocket.send(ok)
-            elif messagelist[0] == 'REMOVELABELEDSEARCH':
-                command = 'REMOVELABELEDSEARCH'
-                label = messagelist[1]
-                self.parser.remove_all_search_phrases_with_label(label)
-                await websocket.send(json.dumps(True))
-            elif messagelist[0] == 'CLEARSEARCHES':
-                command = 'CLEARSEARCHES'
-                self.parser.remove_all_search_phrases()
-                await websocket.send(json.dumps(True))
-            elif messagelist[0] == 'SHOWSEARCHLABELS':
-                command = 'SHOWSEARCHLABELS'
-                labels = self.parser.list_search_phrase_labels()
-                await websocket.send(json.dumps(labels))
-            elif messagelist[0] == 'MATCH_DOCUMENTS':
-                command = 'MATCH_DOCUMENTS'
-                matches = self.parser.match()
-                await websocket.send(json.dumps(matches))
-            elif messagelist[0] == 'FREQUENCIES':
-                command = 'FREQUENCIES'
-                freqinfo = self.parser.get_corpus_frequency_information()
-                await websocket.send(json.dumps(freqinfo))
-            elif messagelist[0] == 'TOPIC_MATCHES':
-                command = 'TOPIC_MATCHES'
-                text_to_match = messagelist[1]
-                # This search takes a long list of keyword parameters,
-                # all of them with preset default thresholds. TBD:
-                # expose all of these parameters in more complex topic
-                # match functionality. Holmes extractor documentation
-                # describes what each of these parameters involves.
-                matches = self.parser.topic_match_documents_against(
-                    text_to_match,
-                    word_embedding_match_threshold=.42,
-                    relation_score=20,
-                    reverse_only_relation_score=15,
-                    single_word_score=10,
-                    single_word_any_tag_score=5,
-                    different_match_cutoff_score=10,
-                    relation_matching_frequency_threshold=0.0,
-                    embedding_matching_frequency_threshold=0.0,
-                    use_frequency_factor=True)
-                await websocket.send(json.dumps(matches))
-            # Holmes Extractor also has supervised topic model
-            # building facilities using the functions
-            # get_supervised_topic_training_basis(),
-            # and deserialize_supervised_topic_classifier().
-            # TBD: Add support for Holmes supervised topic model
-            #      building.
-            elif messagelist[0] == 'AWE_INFO':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                indic = None
-                itype = None
-                summ = None
-                filt = None
-                if len(messagelist) == 3:
-                    indic = messagelist[2]
-                    await websocket.send(
-                        doc._.AWE_Info(indicator=indic))
-                elif len(messagelist) == 4:
-                    indic = messagelist[2]
-                    itype = messagelist[3]
-                    await websocket.send(
-                        doc._.AWE_Info(indicator=indic,infoType=itype))
-                elif len(messagelist) == 5:
-                    indic = messagelist[2]
-                    itype = messagelist[3]
-                    summ = messagelist[4]
-                    result = \
-                        doc._.AWE_Info(indicator=indic,infoType=itype,summaryType=summ)
-                    if type(result) in [int, float, bool]:
-                        await websocket.send(str(result))
-                    else:
-                        await websocket.send(result)
-                                      
-                elif len(messagelist) == 6:
-                    indic = messagelist[2]
-                    itype = messagelist[3]
-                    summ = messagelist[4]
-                    filt = json.loads(messagelist[5])
-                    result = \
-                        doc._.AWE_Info(indicator=indic,infoType=itype,summaryType=summ,filters=filt)
-                    if type(result) in [int, float]:
-                        await websocket.send(str(result))
-                    else:
-                        await websocket.send(result)
-                elif len(messagelist) == 7:
-                    indic = messagelist[2]
-                    itype = messagelist[3]
-                    summ = messagelist[4]
-                    filt = json.loads(messagelist[5])
-                    trans = json.loads(messagelist[6])
-                    result = \
-                        doc._.AWE_Info(indicator=indic,infoType=itype,summaryType=summ,filters=filt,transformations=trans)
-                    if type(result) in [int, float]:
-                        await websocket.send(str(result))
+            if messagelist[0] == 'EXPORT':
+                await self.export(websocket,
+                                  messagelist[1] if len(messagelist) > 1
+                                  else None)
+                continue
+            response = await self.respond(messagelist, session)
+            await websocket.send(encode_response(response, protocol))
+
+    async def export(self, websocket, labels=None, chunk_bytes=2**20):
+        # Stream the serialized documents for labels (all of them by
+        # default) in the documentShards format: binary frames of
+        # about chunk_bytes each, the first starting with the shard
+        # header, and every one holding whole records, so that a
+        # client can decode each frame as it arrives or write them all
+        # to a shard file. Labels with no document are skipped. The
+        # end of the stream is a text frame {"exported": <count>}.
+        if labels is None:
+            labels = self.registry.labels()
+        metadata = self.document_metadata()
+        profiles = {label: self.profiles[label] for label in labels
+                    if label in self.profiles}
+        if len(profiles) > 0:
+            metadata['profiles'] = profiles
+        buffer = bytearray(encode_header(metadata))
+        count = 0
+        for label in labels:
+            # (a shard has nowhere to say what has not been run yet)
+            await self.complete(label,
+                                self.pending_components.get(label, []))
+            serialized = self.registry.serialized(label)
+            if serialized is None:
+                continue
+            buffer += encode_record(label, serialized)
+            count += 1
+            if len(buffer) >= chunk_bytes:
+                await websocket.send(bytes(buffer))
+                buffer = bytearray()
+        if len(buffer) > 0:
+            await websocket.send(bytes(buffer))
+        await websocket.send(json.dumps({'exported': count}))
+
+    def document_metadata(self):
+        return pipeline_metadata(self.parser.nlp)
+
+    def import_shard(self, data):
+        # Register the documents in a shard (see documentShards),
+        # provided that they were parsed with the same spacy version,
+        # model and pipeline as ours. Returns how many there were.
+        # The header can give the pipeline profile the documents were
+        # parsed with (corpus_parse.py writes one), and an EXPORT
+        # stream gives the profile of any document not parsed with
+        # the default one.
+        metadata, offset = decode_header(data)
+        problems = compatible(metadata, self.document_metadata())
+        if len(problems) > 0:
+            raise ValueError('Documents were parsed with a different '
+                             'pipeline: ' + '; '.join(problems))
+        documents = {label: bytes(document)
+                     for label, document in decode_records(data, offset)}
+        profile = metadata.get('profile', default_profile)
+        profiles = {label: metadata.get('profiles', {}).get(label, profile)
+                    for label in documents}
+        for name in set(profiles.values()):
+            if name not in pipeline_profiles:
+                raise ValueError('Unknown pipeline profile: ' + str(name))
+        self.register_documents(documents, {}, [], profiles)
+        return len(documents)
+
+    async def import_path(self, path):
+        # Import a shard file, or every shard file in a directory.
+        # The files are read in a thread so that the event loop is
+        # not held up by the disk; a file that cannot be imported is
+        # reported and skipped.
+        loop = asyncio.get_running_loop()
+        imported = 0
+        errors = {}
+        for shard in shard_files(path):
+            try:
+                data = await loop.run_in_executor(None, read_bytes, shard)
+                imported += self.import_shard(data)
+            except (OSError, ValueError) as e:
+                errors[shard] = str(e)
+        return {'imported': imported, 'errors': errors}
+
+    async def snapshot(self, directory):
+        # Save the registered documents, the search phrases and the
+        # text key of each document to directory, so that a server can
+        # be brought back to this state by restore without parsing
+        # anything. The documents go in a new shard file, and the
+        # index (see documentShards) is written last, so a snapshot is
+        # only ever replaced by a complete one. Documents are
+        # serialized a few at a time and written to disk in a thread,
+        # so that other requests are answered while a large snapshot
+        # is written.
+        async with self.snapshot_lock:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, os.makedirs, directory, 0o777,
+                                       True)
+            metadata = self.document_metadata()
+            name = 'documents-' + str(int(time.time() * 1000)) \
+                + shardSuffix
+            path = os.path.abspath(os.path.join(directory, name))
+            writer = await loop.run_in_executor(None, shardWriter, path,
+                                                metadata)
+            positions = {}
+            try:
+                batch = []
+                batch_bytes = 0
+                for label in self.registry.labels():
+                    # (a document may have been removed while we were
+                    # writing the others)
+                    if label not in self.registry:
+                        continue
+                    serialized = self.registry.serialized(label)
+                    batch.append((label, serialized))
+                    batch_bytes += len(serialized)
+                    if batch_bytes >= 2 ** 23:
+                        positions.update(await loop.run_in_executor(
+                            None, writer.write_all, batch))
+                        batch = []
+                        batch_bytes = 0
                     else:
-                        await websocket.send(result)
-                                      
-                else:
-                    await websocket.send(json.dumps([]))
-            elif messagelist[0] == 'DOCTOKENS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                if doc is not None:
-                    await websocket.send(
-                        doc._.AWE_Info(indicator='text'))
-                else:
-                    await websocket.send(json.dumps([]))
-            elif messagelist[0] == 'DOCTOKENS_WITH_WS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                if doc is not None:
-                    await websocket.send(
-                        doc._.AWE_Info(indicator='text_with_ws'))
-                else:
-                    await websocket.send(json.dumps([]))
-            elif messagelist[0] == 'DOCHEADS':
-                command = 'DOCHEADS'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                heads = [token.head.i for token in doc]
-                await websocket.send(json.dumps(heads))
-            elif messagelist[0] == 'POS':
-                command = 'POS'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                heads = [token.pos_ for token in doc]
-                await websocket.send(json.dumps(heads))
-            elif messagelist[0] == 'DOCDEPENDENCIES':
-                command = 'DOCDEPENDENCIES'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                deps = [token.dep_ for token in doc]
-                await websocket.send(json.dumps(deps))
-            elif messagelist[0] == 'DOCENTITIES':
-                command = 'DOCENTITIES'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                ents = [[ent.text,
-                         ent.start_char,
-                         ent.end_char,
-                         ent.label_] for ent in doc.ents]
-                await websocket.send(json.dumps(ents))
-            elif messagelist[0] == 'TOKVECS':
-                command = 'TOKVECS'
-                # List returned contains lists pairing token
-                # offset with token vectors cast as strings
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.token_vectors))
-            elif messagelist[0] == 'LEMMAS':
-                command = 'LEMMAS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(
-                    doc._.AWE_Info(indicator='lemma_')
-                )
-            elif messagelist[0] == 'STOPWORDS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(
-                    doc._.AWE_Info(indicator='is_stop')
-                )
-            elif messagelist[0] == 'WORDTYPES':
-                command = 'WORDTYPES'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='lower_',filters=[('is_alpha', ['True']),('is_stop', ['False'])],summaryType = 'uniq')
-                ))
-            elif messagelist[0] == 'ROOTS':
-                command = 'ROOTS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='root')
-                ))
-            elif messagelist[0] == 'SYLLABLES':
-                command = 'SYLLABLES'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='nSyll')))
-            elif messagelist[0] == 'WORDLENGTH':
-                command = 'WORDLENGTH'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='text', filters=[('is_alpha', ['True'])], transformations=['len', 'sqrt'])
-                ))
-            elif messagelist[0] == 'LATINATES':
-                command = 'LATINATES'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='is_latinate',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'ACADEMICS':
-                command = 'ACADEMICS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='is_academic',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'SENSENUMS':
-                command = 'SENSENUMS'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='nSenses',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'LOGSENSENUMS':
-                command = 'LOGSENSENUMS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='nSenses',filters=[('is_alpha', ['True'])],transformations=['log'])
-                ))
-            elif messagelist[0] == 'MORPHOLOGY':
-                command = 'MORPHOLOGY'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='morphology')
-                ))
-            elif messagelist[0] == 'MORPHNUMS':
-                command = 'MORPHNUMS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='nMorph',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'HALROOTFREQS':
-                command = 'HALROOTFREQS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'HALLOGROOTFREQS':
-                command = 'HALLOGROOTFREQS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])],transformations=['log'])
-                ))
-            elif messagelist[0] == 'ROOTFAMSIZES':
-                command = 'ROOTFAMSIZES'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='root_famSize',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'ROOTPFMFS':
-                command = 'ROOTPFMFS'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='root_pfmf',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'FAMILYSIZES':
-                command = 'FAMILYSIZES'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='family_size',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'TOKFREQS':
-                command = 'TOKFREQS'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='token_freq',filters=[('is_alpha', ['True'])])
-                ))
-            elif messagelist[0] == 'LEMMAFREQS':
-                command = 'LEMMAfREQS'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='lemma_freq')))
-            elif messagelist[0] == 'ROOTFREQS':
-                command = 'ROOTFREQS'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='root_Freq')))
-            elif messagelist[0] == 'MAXFREQS':
-                command = 'MAXFREQS'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='max_freq')))
-            elif messagelist[0] == 'CONCRETES':
-                command = 'CONCRETES'
-                # Position in the list returned equals position
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='concreteness')))
-            elif messagelist[0] == 'ABSTRACTTRAITS':
-                command = 'ABSTRACTTRAITS'
-                # Position in the list returned equals position
-                # in the document. Flag 1 if the word names an
-                # abstract trait, 0 otherwise
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='abstract_trait')))
-            elif messagelist[0] == 'ANIMATES':
-                command = 'ANIMATES'
-                # Position in the list returned equals position
-                # in the document. Flag 1 if the word names an animate
-                # entity, 0 otherwise
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='animate')))
-            elif messagelist[0] == 'LOCATIONS':
-                command = 'LOCATIONS'
-                # Position in the list returned equals position
-                # in the document. Flag 1 if the word names an
-                # animate entity, 0 otherwise
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='location')))
-            elif messagelist[0] == 'DEICTICS':
-                command = 'DEICTICS'
-                # Position in the list returned equals position in
-                # the document. Flag 1 if the word names a deictic
-                # element, 0 otherwise
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='deictic')))
-            elif messagelist[0] == 'PARAGRAPHS':
-                command = 'PARAGRAPHS'
-                # Items in the list indicate word offsets in the document
-                # at which paragraph breaks appear
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                                    
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType="Doc",indicator='delimiter_n')
-                ))
-                    # doc._.paragraph_breaks))
-            elif messagelist[0] == 'SENTENCES':
-                command = 'SENTENCES'
-                # Items in the list indicate word offsets in the document
-                # at which paragraph breaks appear
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType="Doc",indicator='sents')
-                ))
-                #await websocket.send(json.dumps(
-                #    [(sent.start, sent.end) for sent in doc.sents]))
-            elif messagelist[0] == 'PARAGRAPHLENS':
-                command = 'PARAGRAPHLENS'
-                # Items in the list indicate lengths of paragraphs listed
-                # by offset in GETPARAGRAPHS
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['tokenlen'])
-                ))
-            elif messagelist[0] == 'TRANSITIONPROFILE':
-                command = 'TRANSITIONPROFILE'
-                # Returns a rich data structure in a list containing
-                # (1) total number of transition words in the document
-                # (2) a dictionary that lists the frequency of a predefined
-                #     set of transition word categories.
-                # (3) a dictionary that lists the frequency of individual
-                #     transition words
-                # (4) a list of lists that provides for each transition
-                #     word the word string, its start and stop offsets,
-                #     and its transition word category.
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.transition_word_profile))
-            elif messagelist[0] == 'TRANSITIONS':
-                command = 'TRANSITIONS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType='Doc',indicator='transitions')
-                ))
-            elif messagelist[0] == 'TRANSITIONDISTANCES':
-                command = 'TRANSITIONDISTANCES'
-                # List of cosine distances between ten-word windows
-                # before and after a transition
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType='Doc',indicator='transition_distances')
-                ))
-            elif messagelist[0] == 'SENTENCECOHESIONS':
-                command = 'SENTENCECOHESIONS'
-                # List of cosine distances between ten-word windows
-                # before and after a sentence boundary
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType='Doc',indicator='intersentence_cohesions')
-                ))
-            elif messagelist[0] == 'SLIDERCOHESIONS':
-                command = 'SLIDERCOHESIONS'
-                # List of cosine distances between ten-word windows
-                # before and after a sliding window through the text
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType='Doc',indicator='sliding_window_cohesions')
-                ))
-            elif messagelist[0] == 'COREFCHAINS':
-                command = 'COREFCHAINS'
-                # List of coreference chains found in document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.coref_chains))
-            elif messagelist[0] == 'RHEMEDEPTHS':
-                command = 'RHEMEDEPTHS'
-                # Syntactic depth of the sentence rheme -- part of
-                # sentence after the main verb where new information
-                # is usually placed
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType='Doc',indicator='syntacticDepthsOfRhemes')
-                ))
-            elif messagelist[0] == 'THEMEDEPTHS':
-                command = 'THEMEDEPTHS'
-                # Syntactic depth of the sentence theme -- part
-                # of sentence before the main verb where given
-                # information is usually placed
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='syntacticDepthsOfThemes')
-                ))
-            elif messagelist[0] == 'WEIGHTEDDEPTHS':
-                command = 'WEIGHTEDDEPTHS'
-                # Syntactic depth weighted to penalize
-                # left-embedded structures
-                # that tend to be harder to process
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='weightedSyntacticDepths')
-                ))
-            elif messagelist[0] == 'WEIGHTEDBREADTHS':
-                command = 'WEIGHTEDBREADTHS'
-                # Syntactic breadth -- measure of extent to which sentence
-                # structure is additive, consisting of coordinated
-                # structures and loosely appended modifiers typical of
-                # spoken, often unplanned sentence production
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='weightedSyntacticBreadths')
-                ))
-            elif messagelist[0] == 'SENTENCETYPES':
-                # tuple giving number and location of sentence types
-                # format:
-                # (1,1,1,1,[1,2,3,4]) would be the record for a text that
-                # had four sentences -- simple sentence, compound sentence,
-                # complex sentence, and compound/complex sentence, in
-                # that order.
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType='Doc',indicator='sentence_types')
-                ))
-            elif messagelist[0] == 'SYNTACTICPROFILE':
-                command = 'SYNTACTICPROFILE'
-                # Returns a dictionary containing frequency information
-                # about the syntactic relations and categories in the text.
-                # This includes information about the frequency of parts
-                # of speech, morphological categories, and syntactic
-                # dependencies between specific parts of speech.
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.syntacticProfile))
-            elif messagelist[0] == 'NORMEDSYNTACTICPROFILE':
-                command = 'NORMEDSYNTACTICPROFILE'
-                # Returns a dictionary containing normalized
-                # frequency information (proportionas) for the
-                # syntactic relations and categories in the text.
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.syntacticProfileNormed))
-            elif messagelist[0] == 'QUOTEDTEXT':
-                command = 'QUOTEDTEXT'
-                # 1 for tokens within quotation marks, 0 for other text
-                # Position in the list corresponds to offset of token
-                # in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_quoted')
-                ))
-            elif messagelist[0] == 'DIRECTSPEECHSPANS':
-                command = 'DIRECTSPEECHSPANS'
-                # Data about subset of quoted text -- specifically,
-                # quoted text that is attributed to a specific
-                # speaker.
-                #
-                # Returns a list of lists with three top level
-                # elements:
-                #
-                # 1. Speaker: a list of offsets to tokens
-                #    referring to the speaker(s)
-                # 2. Addressee: a list of offsets to tokens
-                #    referring to the person(s) spoken to.
-                # 3. Span start offset
-                # 4. Span end offset.
-                #
-                # Note that first and second person pronouns
-                # inside direct speech may reference a person
-                # explicitly identified in the direct speech
-                # framing text. Coreferee reference resolution
-                # may apply, so that the speaker and addressee
-                # references may be to a proper noun at the head
-                # of a pronominal reference chain that includes
-                # the direct speech frame.
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_direct_speech')
-                ))
-            elif messagelist[0] == 'IN_DIRECT_SPEECH':
-                # 1 for tokens within quoted stretches of direct speech,
-                # 0 for other text. Position in the list corresponds to
-                # offset of token in the document
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_in_direct_speech')
-                ))
-            elif messagelist[0] == 'TENSECHANGES':
-                # list of positions where tense changed in the main
-                # document flow (not in direct speech/quotations,
-                # with flag to indicate whether shift was to past
-                # tense or to present tense.
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.vwp_tense_changes))
-            elif messagelist[0] == 'PERSPECTIVES':
-                # list of positions where perspective is indicated
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_perspective')
-                ))
-            elif messagelist[0] == 'ATTRIBUTIONS':
-                # list of positions where attribution is indicated
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_attribution')
-                ))
-            elif messagelist[0] == 'SOURCES':
-                # list of positions where source is indicated
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_source')
-                ))
-            elif messagelist[0] == 'CITES':
-                # list of positions where source is indicated
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_cite')
-                ))
-            elif messagelist[0] == 'STATEMENTSOFFACT':
-                # list of positions where source is indicated
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_statements_of_fact')
-                ))
-            elif messagelist[0] == 'STATEMENTSOFOPINION':
-                # list of positions where source is indicated
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_statements_of_opinion')
-                ))
-            elif messagelist[0] == 'PERSPECTIVESPANS':
-                command = 'PERSPECTIVESPANS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.vwp_perspective_spans))
-                await websocket.send(
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_perspective_spans')
-                )
-            elif messagelist[0] == 'STANCEMARKERS':
-                command = 'STANCEMARKERS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(doc._.vwp_stance_markers))
-                await websocket.send(
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_stance_markers')
-                )
-
-            elif messagelist[0] == 'CLAIMTEXTS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_claim')
-                ))
-
-            elif messagelist[0] == 'DISCUSSIONTEXTS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_discussion')
-                ))
-
-            elif messagelist[0] == 'EMOTIONWORDS':
-                command = 'EMOTIONWORDS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_emotionword')
-                ))
-
-            elif messagelist[0] == 'CHARACTERWORDS':
-                command = 'CHARACTERWORDS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_character_traits')
-                ))
-
-            elif messagelist[0] == 'EMOTIONALSTATES':
-                command = 'EMOTIONALSTATES'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_emotion_states')
-                )
-            elif messagelist[0] == 'CHARACTERTRAITS':
-                command = 'CHARACTERTRAITS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.vwp_character_traits))
-            elif messagelist[0] == 'PROPOSITIONALATTITUDES':
-                command = 'PROPOSITIONALATTITUDES'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_propositional_attitudes')
-                ))
-            elif messagelist[0] == 'SOCIAL_AWARENESS':
-                command = 'SOCIAL_AWARENESS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_social_awareness')
-                ))
-            elif messagelist[0] == 'CONCRETEDETAILS':
-                command = 'CONCRETEDETAILS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(
-                    doc._.AWE_Info(indicator='concrete_detail')
-                )
-            elif messagelist[0] == 'INTERACTIVELANGUAGE':
-                command = 'INTERACTIVELANGUAGE'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_interactive')
-                ))
-            elif messagelist[0] == 'ARGUMENTWORDS':
-                command = 'ARGUMENTWORDS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_argumentword')
-                ))
-            elif messagelist[0] == 'ARGUMENTLANGUAGE':
-                command = 'ARGUMENTLANGUAGE'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_argumentation')
-                ))
-            elif messagelist[0] == 'EXPLICITARGUMENTWORDS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='vwp_explicit_argument')
-                ))
-            elif messagelist[0] == 'SUBJECTIVITYRATINGS':
-                command = 'SUBJECTIVITYRATINGS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(                    
-                    doc._.AWE_Info(indicator='subjectivity')
-                ))
-            elif messagelist[0] == 'SENTIMENTRATINGS':
-                command = 'SENTIMENTRATINGS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(                    
-                    doc._.AWE_Info(indicator='vwp_sentiment')
-                ))
-            elif messagelist[0] == 'TONERATINGS':
-                command = 'TONERATINGS2'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(                    
-                    doc._.AWE_Info(indicator='vwp_tone')
-                ))
-            elif messagelist[0] == 'POLARITYRATINGS':
-                command = 'POLARITYRATINGS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(                    
-                    doc._.AWE_Info(indicator='polarity')
-                ))
-            elif messagelist[0] == 'ASSESSMENTS':
-                command = 'ASSESSMENTS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(doc._.assessments))
-            elif messagelist[0] == 'PASTTENSESCOPE':
-                command = 'PASTTENSESCOPE'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='in_past_tense_scope')
-                ))
-            elif messagelist[0] == 'GOVERNINGSUBJECTS':
-                command = 'GOVERNINGSUBJECTS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='governing_subject')
-                ))
-            elif messagelist[0] == 'CLUSTERS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='clusterID')
-                ))
-            elif messagelist[0] == 'PROMPTLANGUAGE':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(doc._.prompt_language))
-            elif messagelist[0] == 'PROMPTRELATED':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(doc._.prompt_related))
-            elif messagelist[0] == 'MAINIDEAS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(
-                    doc._.AWE_Info(infoType="Doc",indicator='main_ideas')
-                )
-            elif messagelist[0] == 'SUPPORTINGIDEAS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(
-                    doc._.AWE_Info(infoType="Doc",indicator='supporting_ideas')
-                )
-            elif messagelist[0] == 'SUPPORTINGDETAILS':
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(
-                    doc._.AWE_Info(infoType="Doc",indicator='supporting_details')
-                )
-            elif messagelist[0] == 'CLUSTERINFO':
-                command = 'CLUSTERINFO'
-                # Get the local word clusters our algorithm has
-                # clustered the words of the student document into
-                #
-                # The data is a list of records in this format:
-                # 1.  The clusterID.
-                # 2.  The cluster rating, which is roughly a measure
-                #     of how important the cluster seems to be in the
-                #     docyument as measured by the number of words in it
-                #     and their relative infrequency
-                # 3.  A list of the actual word strings in each cluster
-                # 4.  The offsets of the words assigned to each cluster
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(doc._.clusterInfo))
-            elif messagelist[0] == 'DEVWORDS':
-                command = 'DEVWORDS'
-                # offset of the logical subject that governs
-                # the domain this token belongs to
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(
-                    doc._.AWE_Info(indicator='devword')
-                ))
-            elif messagelist[0] == 'NOMINALREFERENCES':
-                command = 'NOMINALREFERENCES'
-                # offset of the logical subject that governs
-                # the domain this token belongs to
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                await websocket.send(json.dumps(doc._.nominalReferences))
-            elif messagelist[0] == 'DOCSUMMARYLABELS':
-                command = 'DOCSUMMARYLABELS'
-                await websocket.send(json.dumps(self.summaryLabels))
-            elif messagelist[0] == 'DOCSUMMARYFEATS':
-                command = 'DOCSUMMARYFEATS'
-                label = messagelist[1]
-                doc = self.parser.get_document(label)
-                summaryFeats = [
-                    doc._.AWE_Info(indicator='nSyll',summaryType="mean"),
-                    doc._.AWE_Info(indicator='nSyll',summaryType="median"),
-                    doc._.AWE_Info(indicator='nSyll',summaryType="max"),
-                    doc._.AWE_Info(indicator='nSyll',summaryType="min"),
-                    doc._.AWE_Info(indicator='nSyll',summaryType="stdev"),
-                    doc._.AWE_Info(indicator='text', filters=[('is_alpha', ['True'])], transformations=['len', 'sqrt'], summaryType='mean'),
-                    doc._.AWE_Info(indicator='text', filters=[('is_alpha', ['True'])], transformations=['len', 'sqrt'], summaryType='median'),
-                    doc._.AWE_Info(indicator='text', filters=[('is_alpha', ['True'])], transformations=['len', 'sqrt'], summaryType='max'),
-                    doc._.AWE_Info(indicator='text', filters=[('is_alpha', ['True'])], transformations=['len', 'sqrt'], summaryType='min'),
-                    doc._.AWE_Info(indicator='text', filters=[('is_alpha', ['True'])], transformations=['len', 'sqrt'], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='is_latinate',filters=[('is_alpha', ['True'])], summaryType="proportion"),
-                    doc._.AWE_Info(indicator='is_academic',filters=[('is_alpha', ['True'])], summaryType="proportion"),
-                    doc._.AWE_Info(indicator='family_size', filters=[('is_alpha', ['True'])], summaryType='mean'),
-                    doc._.AWE_Info(indicator='family_size', filters=[('is_alpha', ['True'])], summaryType='median'),
-                    doc._.AWE_Info(indicator='family_size', filters=[('is_alpha', ['True'])], summaryType='max'),
-                    doc._.AWE_Info(indicator='family_size', filters=[('is_alpha', ['True'])], summaryType='min'),
-                    doc._.AWE_Info(indicator='family_size', filters=[('is_alpha', ['True'])], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True'])], summaryType='mean'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True'])], summaryType='median'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True'])], summaryType='max'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True'])], summaryType='min'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True'])], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True'])], transformations=['log'], summaryType='mean'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True'])], transformations=['log'], summaryType='median'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True'])], transformations=['log'], summaryType='max'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True'])], transformations=['log'], summaryType='min'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True'])], transformations=['log'], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True'])], summaryType='mean'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True'])], summaryType='median'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True'])], summaryType='max'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True'])], summaryType='min'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True'])], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])],transformations=['log'],summaryType='mean'),
-                    doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])],transformations=['log'],summaryType='median'),
-                    doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])],transformations=['log'],summaryType='max'),
-                    doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])],transformations=['log'],summaryType='min'),
-                    doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])],transformations=['log'],summaryType='stdev'),
-                    doc._.AWE_Info(indicator='root_famSize',filters=[('is_alpha', ['True'])],summaryType='mean'),
-                    doc._.AWE_Info(indicator='root_famSize',filters=[('is_alpha', ['True'])],summaryType='median'),
-                    doc._.AWE_Info(indicator='root_famSize',filters=[('is_alpha', ['True'])],summaryType='max'),
-                    doc._.AWE_Info(indicator='root_famSize',filters=[('is_alpha', ['True'])],summaryType='min'),
-                    doc._.AWE_Info(indicator='root_famSize',filters=[('is_alpha', ['True'])],summaryType='stdev'),
-                    doc._.AWE_Info(indicator='root_pfmf',filters=[('is_alpha', ['True'])],summaryType='mean'),
-                    doc._.AWE_Info(indicator='root_pfmf',filters=[('is_alpha', ['True'])],summaryType='median'),
-                    doc._.AWE_Info(indicator='root_pfmf',filters=[('is_alpha', ['True'])],summaryType='max'),
-                    doc._.AWE_Info(indicator='root_pfmf',filters=[('is_alpha', ['True'])],summaryType='min'),
-                    doc._.AWE_Info(indicator='root_pfmf',filters=[('is_alpha', ['True'])],summaryType='stdev'),
-                    doc._.AWE_Info(indicator='token_freq',filters=[('is_alpha', ['True'])],summaryType='mean'),
-                    doc._.AWE_Info(indicator='token_freq',filters=[('is_alpha', ['True'])],summaryType='median'),
-                    doc._.AWE_Info(indicator='token_freq',filters=[('is_alpha', ['True'])],summaryType='max'),
-                    doc._.AWE_Info(indicator='token_freq',filters=[('is_alpha', ['True'])],summaryType='min'),
-                    doc._.AWE_Info(indicator='token_freq',filters=[('is_alpha', ['True'])],summaryType='stdev'),
-                    doc._.AWE_Info(indicator='lemma_freq',filters=[('is_alpha', ['True'])],summaryType='mean'),
-                    doc._.AWE_Info(indicator='lemma_freq',filters=[('is_alpha', ['True'])],summaryType='median'),
-                    doc._.AWE_Info(indicator='lemma_freq',filters=[('is_alpha', ['True'])],summaryType='max'),
-                    doc._.AWE_Info(indicator='lemma_freq',filters=[('is_alpha', ['True'])],summaryType='min'),
-                    doc._.AWE_Info(indicator='lemma_freq',filters=[('is_alpha', ['True'])],summaryType='stdev'),
-                    doc._.AWE_Info(indicator='max_freq',summaryType='mean'),
-                    doc._.AWE_Info(indicator='max_freq',summaryType='median'),
-                    doc._.AWE_Info(indicator='max_freq',summaryType='max'),
-                    doc._.AWE_Info(indicator='max_freq',summaryType='min'),
-                    doc._.AWE_Info(indicator='max_freq',summaryType='stdev'),
-                    doc._.AWE_Info(indicator='abstract_trait',filters=[('is_alpha', ['True'])], summaryType="proportion"),
-                    doc._.AWE_Info(indicator='animate',filters=[('is_alpha', ['True'])], summaryType="proportion"),
-                    doc._.AWE_Info(indicator='deictic',filters=[('is_alpha', ['True'])], summaryType="proportion"),
-                    doc._.AWE_Info(indicator='root', filters=[('is_alpha', ['True']),('is_stop', ['False']),('pos_', content_pos)], summaryType = 'total'),
-                    doc._.AWE_Info(indicator='lemma_', filters=[('is_alpha', ['True']),('is_stop', ['False']),('pos_', content_pos)], summaryType = 'total'),
-                    doc._.AWE_Info(indicator='lower_', filters=[('is_alpha', ['True']),('is_stop', ['False']),('pos_', content_pos)], summaryType = 'total'),
-                    doc._.AWE_Info(indicator='text', filters=[('is_alpha', ['True']),('is_stop', ['False']),('pos_', content_pos)], summaryType = 'total'),
-                    doc._.AWE_Info(infoType="Doc",indicator='delimiter_n',summaryType='total'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['tokenlen'],summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['tokenlen'],summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['tokenlen'],summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['tokenlen'],summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['tokenlen'],summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='transitions',summaryType='proportion'),
-                    doc._.AWE_Info(infoType="Doc",indicator='transitions',summaryType='total'),
-                    doc._.AWE_Info(infoType="Doc",indicator='transitions',transformations=['text'],summaryType='counts'),
-                    doc._.AWE_Info(infoType="Doc",indicator='transition_distances',summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='transition_distances',summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='transition_distances',summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='transition_distances',summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='transition_distances',summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='intersentence_cohesions',summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='intersentence_cohesions',summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='intersentence_cohesions',summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='intersentence_cohesions',summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='intersentence_cohesions',summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sliding_window_cohesions',summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sliding_window_cohesions',summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sliding_window_cohesions',summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sliding_window_cohesions',summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sliding_window_cohesions',summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='corefChainInfo',summaryType='counts'),
-                    doc._.AWE_Info(infoType="Doc",indicator='corefChainInfo',transformations=['len'],summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='corefChainInfo',transformations=['len'],summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='corefChainInfo',transformations=['len'],summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='corefChainInfo',transformations=['len'],summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='corefChainInfo',transformations=['len'],summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',summaryType='counts'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['len'],summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['len'],summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['len'],summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['len'],summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['len'],summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sentenceThemes',transformations=['tokenlen'],summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sentenceThemes',transformations=['tokenlen'],summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sentenceThemes',transformations=['tokenlen'],summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sentenceThemes',transformations=['tokenlen'],summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='sentenceThemes',transformations=['tokenlen'],summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfRhemes',summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfRhemes',summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfRhemes',summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfRhemes',summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfRhemes',summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfThemes',summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfThemes',summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfThemes',summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfThemes',summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='syntacticDepthsOfThemes',summaryType='stdev'),
-                    doc._.AWE_Info(indicator='weightedSyntacticDepth',summaryType='mean'),
-                    doc._.AWE_Info(indicator='weightedSyntacticDepth',summaryType='median'),
-                    doc._.AWE_Info(indicator='weightedSyntacticDepth',summaryType='max'),
-                    doc._.AWE_Info(indicator='weightedSyntacticDepth',summaryType='min'),
-                    doc._.AWE_Info(indicator='weightedSyntacticDepth',summaryType='stdev'),
-                    doc._.AWE_Info(indicator='weightedSyntacticBreadth',summaryType='mean'),
-                    doc._.AWE_Info(indicator='weightedSyntacticBreadth',summaryType='median'),
-                    doc._.AWE_Info(indicator='weightedSyntacticBreadth',summaryType='max'),
-                    doc._.AWE_Info(indicator='weightedSyntacticBreadth',summaryType='min'),
-                    doc._.AWE_Info(indicator='weightedSyntacticBreadth',summaryType='stdev'),
-                    doc._.syntacticVariety,
-                    doc._.AWE_Info(indicator='in_past_tense_scope',summaryType='proportion'),
-                    doc._.AWE_Info(indicator='vwp_argumentation',summaryType='proportion'),
-                    doc._.AWE_Info(infoType="Doc",indicator='vwp_direct_speech',summaryType='proportion'),
-                    doc._.AWE_Info(indicator='vwp_egocentric',summaryType='proportion'),
-                    doc._.AWE_Info(indicator='vwp_allocentric',summaryType='proportion'),
-                    doc._.AWE_Info(indicator='subjectivity',summaryType='mean'),
-                    doc._.AWE_Info(indicator='subjectivity',summaryType='median'),
-                    doc._.AWE_Info(indicator='subjectivity',summaryType='min'),
-                    doc._.AWE_Info(indicator='subjectivity',summaryType='max'),
-                    doc._.AWE_Info(indicator='subjectivity',summaryType='stdev'),
-                    doc._.AWE_Info(indicator='polarity',summaryType='mean'),
-                    doc._.AWE_Info(indicator='polarity',summaryType='median'),
-                    doc._.AWE_Info(indicator='polarity',summaryType='min'),
-                    doc._.AWE_Info(indicator='polarity',summaryType='max'),
-                    doc._.AWE_Info(indicator='polarity',summaryType='stdev'),
-                    doc._.AWE_Info(indicator='vwp_sentiment',summaryType='mean'),
-                    doc._.AWE_Info(indicator='vwp_sentiment',summaryType='median'),
-                    doc._.AWE_Info(indicator='vwp_sentiment',summaryType='min'),
-                    doc._.AWE_Info(indicator='vwp_sentiment',summaryType='max'),
-                    doc._.AWE_Info(indicator='vwp_sentiment',summaryType='stdev'),
-                    doc._.AWE_Info(infoType="Doc",indicator='main_cluster_spans',transformations=['len'],summaryType='mean'),
-                    doc._.AWE_Info(infoType="Doc",indicator='main_cluster_spans',transformations=['len'],summaryType='median'),
-                    doc._.AWE_Info(infoType="Doc",indicator='main_cluster_spans',transformations=['len'],summaryType='min'),
-                    doc._.AWE_Info(infoType="Doc",indicator='main_cluster_spans',transformations=['len'],summaryType='max'),
-                    doc._.AWE_Info(infoType="Doc",indicator='main_cluster_spans',transformations=['len'],summaryType='stdev'),
-                    doc._.AWE_Info(indicator='devword', summaryType='proportion'),
-                    doc._.AWE_Info(indicator='nSyll', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='mean'),
-                    doc._.AWE_Info(indicator='nSyll', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='median'),
-                    doc._.AWE_Info(indicator='nSyll', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='min'),
-                    doc._.AWE_Info(indicator='nSyll', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='max'),
-                    doc._.AWE_Info(indicator='nSyll', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='mean'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='median'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='min'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='max'),
-                    doc._.AWE_Info(indicator='nMorph', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='mean'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='median'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='min'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='max'),
-                    doc._.AWE_Info(indicator='nSenses', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='token_freq', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='mean'),
-                    doc._.AWE_Info(indicator='token_freq', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='median'),
-                    doc._.AWE_Info(indicator='token_freq', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='min'),
-                    doc._.AWE_Info(indicator='token_freq', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='max'),
-                    doc._.AWE_Info(indicator='token_freq', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='stdev'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='mean'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='median'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='min'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='max'),
-                    doc._.AWE_Info(indicator='concreteness', filters=[('is_alpha', ['True']),('devword', ['True'])], summaryType='stdev')
-                ]
-                await websocket.send(json.dumps(summaryFeats))
+                        await asyncio.sleep(0)
+                positions.update(await loop.run_in_executor(
+                    None, writer.write_all, batch))
+            finally:
+                await loop.run_in_executor(None, writer.close)
+
+            # The shards written by earlier snapshots into this
+            # directory, as listed in its index. Only these are ever
+            # removed: other shards kept there (imports, exports,
+            # corpus_parse.py output) are left alone. Those that
+            # documents restored from them still point to, and that
+            # have not been loaded yet, are kept until a later
+            # snapshot finds them unused.
+            try:
+                previous = await loop.run_in_executor(None, read_index,
+                                                      directory)
+                earlier = [shard for shard
+                           in [previous['shard']]
+                           + previous.get('retained', [])
+                           if os.path.basename(shard) == shard]
+            except (OSError, ValueError, KeyError):
+                earlier = []
+            in_use = set(path for (path, size, offset)
+                         in self.registry.spilled.values()
+                         if offset is not None)
+            retained = [shard for shard in earlier
+                        if shard != name
+                        and os.path.abspath(os.path.join(directory, shard))
+                        in in_use]
+
+            index = {'created': time.time(),
+                     'pipeline': metadata,
+                     'shard': name,
+                     'retained': retained,
+                     'documents': {label: {'offset': offset,
+                                           'bytes': size,
+                                           'text_key':
+                                               self.text_keys.get(label),
+                                           'pending':
+                                               self.pending_components.get(
+                                                   label, []),
+                                           'profile':
+                                               self.profiles.get(
+                                                   label,
+                                                   default_profile)}
+                                   for label, (offset, size)
+                                   in positions.items()},
+                     'search_phrases': list(self.search_phrases)}
+            await loop.run_in_executor(None, write_index, directory, index)
+
+            for shard in earlier:
+                if shard != name and shard not in retained:
+                    try:
+                        os.remove(os.path.join(directory, shard))
+                    except FileNotFoundError:
+                        pass
+            return {'documents': len(positions),
+                    'search_phrases': len(self.search_phrases),
+                    'bytes': writer.position}
+
+    async def restore(self, directory, lazy=True):
+        # Register the documents and search phrases saved by snapshot,
+        # replacing any documents with the same labels. With lazy
+        # (the default), nothing is read but the index: each document
+        # is registered with Holmes from the snapshot the first time
+        # it is used (see documentRegistry). Otherwise they are all
+        # registered now, which Holmes spreads across its workers.
+        loop = asyncio.get_running_loop()
+        index = await loop.run_in_executor(None, read_index, directory)
+        problems = compatible(index['pipeline'], self.document_metadata())
+        if len(problems) > 0:
+            raise ValueError('Snapshot was made with a different '
+                             'pipeline: ' + '; '.join(problems))
+        path = os.path.abspath(os.path.join(directory, index['shard']))
+        documents = index['documents']
+        keys = {label: entry['text_key']
+                for label, entry in documents.items()}
+        # Components that were deferred when the snapshot was made
+        # are run when they are needed, whether or not we defer them
+        # ourselves (see complete)
+        pipe_names = self.parser.nlp.pipe_names
+        pending = {label: [name for name in entry.get('pending', [])
+                           if name in pipe_names]
+                   for label, entry in documents.items()}
+        profiles = {label: entry.get('profile', default_profile)
+                    for label, entry in documents.items()}
+        if lazy:
+            self.replace_documents(documents, keys, pending, profiles)
+            self.registry.restore({label: (path,
+                                           entry['bytes'],
+                                           entry['offset'])
+                                   for label, entry in documents.items()})
+        else:
+            data = await loop.run_in_executor(None, read_bytes, path)
+            metadata, offset = decode_header(data)
+            batch = {}
+            for label, document in decode_records(data, offset):
+                batch[label] = bytes(document)
+                if len(batch) >= 100:
+                    self.register_documents(batch, keys, pending,
+                                            profiles)
+                    batch = {}
+                    await asyncio.sleep(0)
+            self.register_documents(batch, keys, pending, profiles)
+
+        for text in index['search_phrases']:
+            if text not in self.search_phrases:
+                self.parser.register_search_phrase(text)
+                self.search_phrases.append(text)
+        return {'restored': len(documents),
+                'search_phrases': len(index['search_phrases'])}
+
+    async def respond_to_request(self,
+                                 websocket,
+                                 request,
+                                 session,
+                                 in_flight,
+                                 protocol=None):
+        # Answer one request sent in an envelope. On a JSON connection
+        # the response field holds exactly what the server would have
+        # sent back for the plain message (so it is usually JSON
+        # text); with msgpack it holds the value itself. If the
+        # command fails, the reply has an error field instead.
+        try:
+            reply = {'id': request.get('id')}
+            try:
+                messagelist = request['message']
+                if messagelist[0] == 'KILL':
+                    reply['response'] = True if protocol == MSGPACK \
+                        else json.dumps(True)
+                    await websocket.send(encode_value(reply, protocol))
+                    await self.kill(websocket)
+                if messagelist[0] == 'EXPORT':
+                    raise ValueError('EXPORT cannot be sent in an envelope')
+                response = await self.respond(messagelist, session)
+                if protocol != MSGPACK:
+                    response = to_json(response)
+                    if isinstance(response, bytes):
+                        # Binary replies (SERIALIZED) go into the JSON
+                        # envelope as base64 text
+                        response = \
+                            base64.b64encode(response).decode('ascii')
+                        reply['encoding'] = 'base64'
+                reply['response'] = response
+            except Exception as e:
+                reply['error'] = repr(e)
+            await websocket.send(encode_value(reply, protocol))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            in_flight.release()
+
+    # Commands that only read the document named in messagelist[1],
+    # whose replies can be cached until that document changes
+    cachedCommands = [
+        'AWE_INFO',
+        'DOCTOKENS',
+        'DOCTOKENS_WITH_WS',
+        'DOCHEADS',
+        'POS',
+        'DOCDEPENDENCIES',
+        'DOCENTITIES',
+        'TOKVECS',
+        'LEMMAS',
+        'STOPWORDS',
+        'WORDTYPES',
+        'ROOTS',
+        'SYLLABLES',
+        'WORDLENGTH',
+        'LATINATES',
+        'ACADEMICS',
+        'SENSENUMS',
+        'LOGSENSENUMS',
+        'MORPHOLOGY',
+        'MORPHNUMS',
+        'HALROOTFREQS',
+        'HALLOGROOTFREQS',
+        'ROOTFAMSIZES',
+        'ROOTPFMFS',
+        'FAMILYSIZES',
+        'TOKFREQS',
+        'LEMMAFREQS',
+        'ROOTFREQS',
+        'MAXFREQS',
+        'CONCRETES',
+        'ABSTRACTTRAITS',
+        'ANIMATES',
+        'LOCATIONS',
+        'DEICTICS',
+        'PARAGRAPHS',
+        'SENTENCES',
+        'PARAGRAPHLENS',
+        'TRANSITIONPROFILE',
+        'TRANSITIONS',
+        'TRANSITIONDISTANCES',
+        'SENTENCECOHESIONS',
+        'SLIDERCOHESIONS',
+        'COREFCHAINS',
+        'RHEMEDEPTHS',
+        'THEMEDEPTHS',
+        'WEIGHTEDDEPTHS',
+        'WEIGHTEDBREADTHS',
+        'SENTENCETYPES',
+        'SYNTACTICPROFILE',
+        'NORMEDSYNTACTICPROFILE',
+        'QUOTEDTEXT',
+        'DIRECTSPEECHSPANS',
+        'IN_DIRECT_SPEECH',
+        'TENSECHANGES',
+        'PERSPECTIVES',
+        'ATTRIBUTIONS',
+        'SOURCES',
+        'CITES',
+        'STATEMENTSOFFACT',
+        'STATEMENTSOFOPINION',
+        'PERSPECTIVESPANS',
+        'STANCEMARKERS',
+        'CLAIMTEXTS',
+        'DISCUSSIONTEXTS',
+        'EMOTIONWORDS',
+        'CHARACTERWORDS',
+        'EMOTIONALSTATES',
+        'CHARACTERTRAITS',
+        'PROPOSITIONALATTITUDES',
+        'SOCIAL_AWARENESS',
+        'CONCRETEDETAILS',
+        'INTERACTIVELANGUAGE',
+        'ARGUMENTWORDS',
+        'ARGUMENTLANGUAGE',
+        'EXPLICITARGUMENTWORDS',
+        'SUBJECTIVITYRATINGS',
+        'SENTIMENTRATINGS',
+        'TONERATINGS',
+        'POLARITYRATINGS',
+        'ASSESSMENTS',
+        'PASTTENSESCOPE',
+        'GOVERNINGSUBJECTS',
+        'CLUSTERS',
+        'PROMPTLANGUAGE',
+        'PROMPTRELATED',
+        'MAINIDEAS',
+        'SUPPORTINGIDEAS',
+        'SUPPORTINGDETAILS',
+        'CLUSTERINFO',
+        'DEVWORDS',
+        'NOMINALREFERENCES',
+        'DOCSUMMARYFEATS'
+    ]
+
+    # Commands that need deferred components (see complete), and
+    # which ones. SERIALIZED may need anything; what AWE_INFO needs
+    # depends on the indicator (see needed_components).
+    deferredCommands = {
+        'CLUSTERS': ['lexicalclusters'],
+        'PROMPTLANGUAGE': ['lexicalclusters'],
+        'PROMPTRELATED': ['lexicalclusters'],
+        'CLUSTERINFO': ['lexicalclusters'],
+        'DEVWORDS': ['lexicalclusters'],
+        'NOMINALREFERENCES': ['lexicalclusters', 'contentsegmentation'],
+        'MAINIDEAS': ['lexicalclusters', 'contentsegmentation'],
+        'SUPPORTINGIDEAS': ['lexicalclusters', 'contentsegmentation'],
+        'SUPPORTINGDETAILS': ['lexicalclusters', 'contentsegmentation'],
+        'DOCSUMMARYFEATS': ['lexicalclusters', 'contentsegmentation'],
+        'SERIALIZED': ['lexicalclusters', 'contentsegmentation']
+    }
+
+    def needed_components(self, messagelist):
+        # The deferred components a command needs. For AWE_INFO,
+        # those that add its indicator or any it filters on, e.g.
+        # ['AWE_INFO', label, 'nSyll', 'Token', 'mean',
+        # '[["devword", ["True"]]]'] needs the word clusters.
+        if messagelist[0] != 'AWE_INFO':
+            return self.deferredCommands.get(messagelist[0], [])
+        names = [name for name in messagelist[2:3] if isinstance(name, str)]
+        if len(messagelist) > 5 and isinstance(messagelist[5], str):
+            try:
+                filters = json.loads(messagelist[5])
+                names += [name for name, values in filters]
+            except (ValueError, TypeError):
+                pass
+        needed = []
+        for name in names:
+            needed += indicator_components.get(name, [])
+        return needed
+
+    async def respond(self, messagelist, session):
+        # (counted so that STATUS can report how busy we are)
+        self.active_requests += 1
+        try:
+            # Run whatever the command needs that was deferred when
+            # the document was parsed. This registers a new version
+            # of the document, so it has to come before the cache
+            # lookup.
+            if len(messagelist) > 1 \
+               and isinstance(messagelist[1], str) \
+               and messagelist[1] in self.pending_components:
+                needed = self.needed_components(messagelist)
+                if len(needed) > 0:
+                    await self.complete(messagelist[1], needed)
+            return await self.cached_response(messagelist, session)
+        finally:
+            self.active_requests -= 1
+
+    async def cached_response(self, messagelist, session):
+        # Look up the reply to a read-only command in the cache
+        # before computing it
+        if messagelist[0] in self.cachedCommands \
+           and len(messagelist) > 1 \
+           and messagelist[1] in self.registry:
+            label = messagelist[1]
+            key = (label,
+                   self.versions[label],
+                   messagelist[0],
+                   json.dumps(messagelist[2:]))
+            response = self.response_cache.get(key)
+            if response is None:
+                response = await self.compute(messagelist, session)
+                self.response_cache.put(key, response)
+            return response
+        return await self.compute(messagelist, session)
+
+    async def compute(self, messagelist, session):
+        # Document commands can take a dictionary of output options
+        # after their other arguments, e.g. ['LATINATES', label,
+        # {'format': 'sparse'}] or ['AWE_INFO', label, 'nSyll',
+        # {'format': 'columns'}]; see infoFormats. A reformatted reply
+        # is the formatted value itself.
+        options = {}
+        if messagelist[0] in self.cachedCommands \
+           and len(messagelist) > 2 \
+           and isinstance(messagelist[-1], dict):
+            options = messagelist[-1]
+            messagelist = messagelist[:-1]
+        response = await self.handle_message(messagelist, session)
+        infoFormat = options.get('format')
+        if infoFormat in infoFormats:
+            response = format_info(to_object(response), infoFormat)
+        return response
+
+    async def run_multi(self, label, subcommands, session):
+        # Run a set of read-only commands against one document and
+        # return all of the replies at once. subcommands is either a
+        # dictionary from keys of the caller's choosing to commands,
+        # or a list of commands, keyed by the command itself if it is
+        # just a name and by its position otherwise. A command is a
+        # name ('DOCTOKENS') or a list of a name and the arguments
+        # that follow the label (['AWE_INFO', 'nSyll', 'Token', 'mean']).
+        if isinstance(subcommands, dict):
+            items = list(subcommands.items())
+        else:
+            items = [(subcommand if isinstance(subcommand, str)
+                      else str(i), subcommand)
+                     for i, subcommand in enumerate(subcommands)]
+        results = {}
+        errors = {}
+        for key, subcommand in items:
+            if isinstance(subcommand, str):
+                subcommand = [subcommand]
+            try:
+                if len(subcommand) == 0 \
+                   or subcommand[0] not in self.cachedCommands:
+                    raise ValueError(
+                        'Not a read-only document command: '
+                        + json.dumps(subcommand))
+                response = await self.respond(
+                    [subcommand[0], label] + list(subcommand[1:]), session)
+                results[key] = response
+            except Exception as e:
+                errors[key] = repr(e)
+        return {'results': results, 'errors': errors}
+
+    async def handle_message(self, messagelist, session):
+        # Carry out one command and return the message to send back
+        # (or None if the command has no reply)
+        command = ''
+        if messagelist[0] == 'CLEARPARSED':
+            command = 'CLEARPARSED'
+            self.remove_all_documents()
+            return True
+        elif messagelist[0] == 'REMOVE':
+            command = 'REMOVE'
+            label = messagelist[1]
+            self.remove_document(label)
+            return True
+        elif messagelist[0] == 'PARSEONE':
+            command = 'PARSEONE'
+            label = messagelist[1]
+            text = session['current_doc'] + messagelist[2]
+            session['upload_bytes'] -= \
+                len(session['current_doc'].encode('utf-8'))
+            session['current_doc'] = ''
+            # With {'details': True} as a fourth element, the reply
+            # says whether the parse cache was used, e.g.
+            # {"ok": true, "cache": "hit"}. {'profile': name} parses
+            # with one of the pipeline profiles in pipeline.py.
+            options = {}
+            if len(messagelist) > 3 and messagelist[3] is not None:
+                options = messagelist[3]
+            profile = options.get('profile', default_profile)
+            if profile not in pipeline_profiles:
+                return {'ok': False,
+                        'error': 'Unknown pipeline profile: '
+                                 + str(profile)}
+            status = await self.parse_one(label, text, profile)
+            if options.get('details', False):
+                return {'ok': True, 'cache': status}
+            return True
+        elif messagelist[0] == 'PARSEDELTA':
+            command = 'PARSEDELTA'
+            # ['PARSEDELTA', label, offset, deleted, inserted] replaces
+            # deleted characters from offset in the document's text
+            # with inserted, and parses again only the paragraphs that
+            # changed. A sixth element takes the same options as
+            # PARSEONE; with {'details': True} the reply gives the
+            # number of paragraphs and how many were parsed. Without a
+            # profile, the document keeps the one it was parsed with.
+            label = messagelist[1]
+            options = {}
+            if len(messagelist) > 5 and messagelist[5] is not None:
+                options = messagelist[5]
+            profile = options.get('profile')
+            if profile is not None and profile not in pipeline_profiles:
+                return {'ok': False,
+                        'error': 'Unknown pipeline profile: '
+                                 + str(profile)}
+            try:
+                counts = await self.parse_delta(label,
+                                                messagelist[2],
+                                                messagelist[3],
+                                                messagelist[4],
+                                                profile)
+            except (ValueError, RuntimeError) as e:
+                return {'ok': False, 'error': str(e)}
+            if options.get('details', False):
+                return dict(counts, ok=True)
+            return True
+        elif messagelist[0] == 'PARTIALTEXT':
+            command = 'PARTIALTEXT'
+            # ['PARTIALTEXT', label, chunk] holds chunk for the next
+            # PARSEONE on this connection, which parses everything
+            # sent this way followed by its own text
+            try:
+                self.buffer_upload(session,
+                                   len(messagelist[2].encode('utf-8')))
+            except ValueError as e:
+                return {'ok': False, 'error': str(e)}
+            session['current_doc'] += messagelist[2]
+            return True
+        elif messagelist[0] == 'BEGINTEXT':
+            command = 'BEGINTEXT'
+            # A text too long for one message can be sent in chunks:
+            # ['BEGINTEXT', label], then ['APPENDTEXT', label, index,
+            # chunk] for each chunk, numbered from 0, then
+            # ['COMMITTEXT', label], which takes the same options and
+            # gives the same reply as PARSEONE. The chunks may arrive
+            # in any order, but COMMITTEXT has to come after the
+            # replies to all of them; {'chunks': count} in its options
+            # checks that they all came. ['ABORTTEXT', label] drops
+            # the upload. Uploads belong to the connection they were
+            # begun on. Paragraphs are parsed as soon as they are
+            # complete (see textUpload).
+            label = messagelist[1]
+            self.end_upload(session, label)
+            session['uploads'][label] = textUpload()
+            return True
+        elif messagelist[0] == 'APPENDTEXT':
+            command = 'APPENDTEXT'
+            try:
+                self.append_upload(session,
+                                   messagelist[1],
+                                   messagelist[2],
+                                   messagelist[3])
+            except ValueError as e:
+                return {'ok': False, 'error': str(e)}
+            return True
+        elif messagelist[0] == 'COMMITTEXT':
+            command = 'COMMITTEXT'
+            label = messagelist[1]
+            options = {}
+            if len(messagelist) > 2 and messagelist[2] is not None:
+                options = messagelist[2]
+            profile = options.get('profile', default_profile)
+            if profile not in pipeline_profiles:
+                self.end_upload(session, label)
+                return {'ok': False,
+                        'error': 'Unknown pipeline profile: '
+                                 + str(profile)}
+            try:
+                status = await self.commit_upload(session, label, profile,
+                                                  options.get('chunks'))
+            except ValueError as e:
+                return {'ok': False, 'error': str(e)}
+            if options.get('details', False):
+                return {'ok': True, 'cache': status}
+            return True
+        elif messagelist[0] == 'ABORTTEXT':
+            command = 'ABORTTEXT'
+            self.end_upload(session, messagelist[1])
+            return True
+        elif messagelist[0] == 'PARSESET':
+            command = 'PARSESET'
+            # An optional third element sets how many batches
+            # to parse at once and how many documents go in
+            # each batch, e.g. {'workers': 4, 'batch_size': 32},
+            # and the pipeline profile, as for PARSEONE
+            [labels, texts] = messagelist[1]
+            options = {}
+            if len(messagelist) > 2 and messagelist[2] is not None:
+                options = messagelist[2]
+            profile = options.get('profile', default_profile)
+            if profile not in pipeline_profiles:
+                return {'ok': False,
+                        'error': 'Unknown pipeline profile: '
+                                 + str(profile)}
+            counts = await self.parse_set(
+                labels,
+                texts,
+                workers=options.get('workers'),
+                batch_size=options.get('batch_size', 16),
+                profile=profile)
+            # {'details': True} asks for the number of documents that
+            # were unchanged, found in the parse cache, or parsed
+            if options.get('details', False):
+                return {'ok': True, 'cache': counts}
+            return True
+        elif messagelist[0] == 'CACHESTATS':
+            command = 'CACHESTATS'
+            # Hit and miss counts and memory use of the reply cache
+            return self.response_cache.stats()
+        elif messagelist[0] == 'PARSECACHESTATS':
+            command = 'PARSECACHESTATS'
+            # Hit and miss counts and memory use of the parse cache
+            return self.parse_cache.stats()
+        elif messagelist[0] == 'MEMORY':
+            command = 'MEMORY'
+            # How much memory each registered document takes up,
+            # whether it is held in memory or has been spilled to
+            # disk, and whether it has a column store
+            self.registry.expire()
+            memory = self.registry.memory()
+            for label in memory['documents']:
+                memory['documents'][label]['columns'] = \
+                    label in self.column_stores
+            return memory
+        elif messagelist[0] == 'MULTI':
+            command = 'MULTI'
+            # ['MULTI', label, subcommands] runs many commands on one
+            # document in a single round trip (see run_multi)
+            label = messagelist[1]
+            if label not in self.registry:
+                error = 'No document with label ' + str(label)
+                return {'results': {},
+                        'errors': {'MULTI': error}}
+            return await self.run_multi(label, messagelist[2], session)
+        elif messagelist[0] == 'PING':
+            command = 'PING'
+            return True
+        elif messagelist[0] == 'STATUS':
+            command = 'STATUS'
+            return self.status()
+        elif messagelist[0] == 'LABELS':
+            command = 'LABELS'
+            labels = self.registry.labels()
+            return labels
+        elif messagelist[0] == 'IMPORT':
+            command = 'IMPORT'
+            # A shard file or directory of shard files on the server
+            path = messagelist[1]
+            return await self.import_path(path)
+        elif messagelist[0] == 'SNAPSHOT':
+            command = 'SNAPSHOT'
+            # A directory on the server
+            directory = messagelist[1]
+            return await self.snapshot(directory)
+        elif messagelist[0] == 'RESTORE':
+            command = 'RESTORE'
+            directory = messagelist[1]
+            options = messagelist[2] if len(messagelist) > 2 else {}
+            try:
+                result = await self.restore(directory,
+                                            options.get('lazy', True))
+            except (OSError, ValueError, KeyError) as e:
+                result = {'restored': 0, 'error': str(e)}
+            return result
+        elif messagelist[0] == 'SERIALIZED':
+            command = 'SERIALIZED'
+            label = messagelist[1]
+            options = messagelist[2] if len(messagelist) > 2 else {}
+
+            # The serialized document is sent as it is, in a binary
+            # frame; {'encoding': 'base64'} asks for the base64 text
+            # older clients expect. A spilled document is read from
+            # its spill file rather than registered again.
+            serialized = self.registry.serialized(label)
+            if serialized is None:
+                return None
+            if options.get('encoding') == 'base64':
+                return base64.b64encode(serialized)
+            return serialized
+        elif messagelist[0] == 'NEWSEARCHPHRASE':
+            command = 'NEWSEARCHPHRASE'
+            search_phrase_text = messagelist[1]
+            label = messagelist[2]
+            ok = self.parser.register_search_phrase(search_phrase_text)
+            self.search_phrases.append(search_phrase_text)
+            return ok
+        elif messagelist[0] == 'REMOVELABELEDSEARCH':
+            command = 'REMOVELABELEDSEARCH'
+            label = messagelist[1]
+            self.parser.remove_all_search_phrases_with_label(label)
+            # (search phrases are registered without a label, so Holmes
+            # labels each with its own text)
+            self.search_phrases = [text for text in self.search_phrases
+                                   if text != label]
+            return True
+        elif messagelist[0] == 'CLEARSEARCHES':
+            command = 'CLEARSEARCHES'
+            self.parser.remove_all_search_phrases()
+            self.search_phrases = []
+            return True
+        elif messagelist[0] == 'SHOWSEARCHLABELS':
+            command = 'SHOWSEARCHLABELS'
+            labels = self.parser.list_search_phrase_labels()
+            return labels
+        elif messagelist[0] == 'MATCH_DOCUMENTS':
+            command = 'MATCH_DOCUMENTS'
+            matches = self.parser.match()
+            unmatchable = self.unmatchable()
+            return [match for match in matches
+                    if match['document'] not in unmatchable]
+        elif messagelist[0] == 'FREQUENCIES':
+            command = 'FREQUENCIES'
+            freqinfo = self.parser.get_corpus_frequency_information()
+            return freqinfo
+        elif messagelist[0] == 'TOPIC_MATCHES':
+            command = 'TOPIC_MATCHES'
+            text_to_match = messagelist[1]
+            # This search takes a long list of keyword parameters,
+            # all of them with preset default thresholds. TBD:
+            # expose all of these parameters in more complex topic
+            # match functionality. Holmes extractor documentation
+            # describes what each of these parameters involves.
+            matches = self.parser.topic_match_documents_against(
+                text_to_match,
+                word_embedding_match_threshold=.42,
+                relation_score=20,
+                reverse_only_relation_score=15,
+                single_word_score=10,
+                single_word_any_tag_score=5,
+                different_match_cutoff_score=10,
+                relation_matching_frequency_threshold=0.0,
+                embedding_matching_frequency_threshold=0.0,
+                use_frequency_factor=True)
+            unmatchable = self.unmatchable()
+            return [match for match in matches
+                    if match['document_label'] not in unmatchable]
+        # Holmes Extractor also has supervised topic model
+        # building facilities using the functions
+        # get_supervised_topic_training_basis(),
+        # and deserialize_supervised_topic_classifier().
+        # TBD: Add support for Holmes supervised topic model
+        #      building.
+        elif messagelist[0] == 'AWE_INFO':
+            label = messagelist[1]
+            indic = None
+            itype = None
+            summ = None
+            filt = None
+            if len(messagelist) == 3:
+                indic = messagelist[2]
+                return text_reply(
+                    self.awe_info(label,indicator=indic))
+            elif len(messagelist) == 4:
+                indic = messagelist[2]
+                itype = messagelist[3]
+                return text_reply(
+                    self.awe_info(label,indicator=indic,infoType=itype))
+            elif len(messagelist) == 5:
+                indic = messagelist[2]
+                itype = messagelist[3]
+                summ = messagelist[4]
+                return text_reply(
+                    self.awe_info(label,indicator=indic,infoType=itype,summaryType=summ))
+                                  
+            elif len(messagelist) == 6:
+                indic = messagelist[2]
+                itype = messagelist[3]
+                summ = messagelist[4]
+                filt = json.loads(messagelist[5])
+                return text_reply(
+                    self.awe_info(label,indicator=indic,infoType=itype,summaryType=summ,filters=filt))
+            elif len(messagelist) == 7:
+                indic = messagelist[2]
+                itype = messagelist[3]
+                summ = messagelist[4]
+                filt = json.loads(messagelist[5])
+                trans = json.loads(messagelist[6])
+                return text_reply(
+                    self.awe_info(label,indicator=indic,infoType=itype,summaryType=summ,filters=filt,transformations=trans))
+                                  
+            else:
+                return []
+        elif messagelist[0] == 'DOCTOKENS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            if doc is not None:
+                return text_reply(
+                    doc._.AWE_Info(indicator='text'))
+            else:
+                return []
+        elif messagelist[0] == 'DOCTOKENS_WITH_WS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            if doc is not None:
+                return text_reply(
+                    doc._.AWE_Info(indicator='text_with_ws'))
             else:
-                await websocket.send(False)
+                return []
+        elif messagelist[0] == 'DOCHEADS':
+            command = 'DOCHEADS'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            heads = [token.head.i for token in doc]
+            return heads
+        elif messagelist[0] == 'POS':
+            command = 'POS'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            heads = [token.pos_ for token in doc]
+            return heads
+        elif messagelist[0] == 'DOCDEPENDENCIES':
+            command = 'DOCDEPENDENCIES'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            deps = [token.dep_ for token in doc]
+            return deps
+        elif messagelist[0] == 'DOCENTITIES':
+            command = 'DOCENTITIES'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            ents = [[ent.text,
+                     ent.start_char,
+                     ent.end_char,
+                     ent.label_] for ent in doc.ents]
+            return ents
+        elif messagelist[0] == 'TOKVECS':
+            command = 'TOKVECS'
+            # List returned contains lists pairing token
+            # offset with token vectors cast as strings
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.token_vectors
+        elif messagelist[0] == 'LEMMAS':
+            command = 'LEMMAS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return text_reply(
+                doc._.AWE_Info(indicator='lemma_')
+            )
+        elif messagelist[0] == 'STOPWORDS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return text_reply(
+                doc._.AWE_Info(indicator='is_stop')
+            )
+        elif messagelist[0] == 'WORDTYPES':
+            command = 'WORDTYPES'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='lower_',filters=[('is_alpha', ['True']),('is_stop', ['False'])],summaryType = 'uniq')
+            )
+        elif messagelist[0] == 'ROOTS':
+            command = 'ROOTS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='root')
+            )
+        elif messagelist[0] == 'SYLLABLES':
+            command = 'SYLLABLES'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='nSyll'))
+        elif messagelist[0] == 'WORDLENGTH':
+            command = 'WORDLENGTH'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='text', filters=[('is_alpha', ['True'])], transformations=['len', 'sqrt'])
+            )
+        elif messagelist[0] == 'LATINATES':
+            command = 'LATINATES'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='is_latinate',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'ACADEMICS':
+            command = 'ACADEMICS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='is_academic',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'SENSENUMS':
+            command = 'SENSENUMS'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='nSenses',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'LOGSENSENUMS':
+            command = 'LOGSENSENUMS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='nSenses',filters=[('is_alpha', ['True'])],transformations=['log'])
+            )
+        elif messagelist[0] == 'MORPHOLOGY':
+            command = 'MORPHOLOGY'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='morphology')
+            )
+        elif messagelist[0] == 'MORPHNUMS':
+            command = 'MORPHNUMS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='nMorph',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'HALROOTFREQS':
+            command = 'HALROOTFREQS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'HALLOGROOTFREQS':
+            command = 'HALLOGROOTFREQS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='min_root_freq',filters=[('is_alpha', ['True'])],transformations=['log'])
+            )
+        elif messagelist[0] == 'ROOTFAMSIZES':
+            command = 'ROOTFAMSIZES'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='root_famSize',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'ROOTPFMFS':
+            command = 'ROOTPFMFS'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='root_pfmf',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'FAMILYSIZES':
+            command = 'FAMILYSIZES'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='family_size',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'TOKFREQS':
+            command = 'TOKFREQS'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='token_freq',filters=[('is_alpha', ['True'])])
+            )
+        elif messagelist[0] == 'LEMMAFREQS':
+            command = 'LEMMAfREQS'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='lemma_freq'))
+        elif messagelist[0] == 'ROOTFREQS':
+            command = 'ROOTFREQS'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='root_Freq'))
+        elif messagelist[0] == 'MAXFREQS':
+            command = 'MAXFREQS'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='max_freq'))
+        elif messagelist[0] == 'CONCRETES':
+            command = 'CONCRETES'
+            # Position in the list returned equals position
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='concreteness'))
+        elif messagelist[0] == 'ABSTRACTTRAITS':
+            command = 'ABSTRACTTRAITS'
+            # Position in the list returned equals position
+            # in the document. Flag 1 if the word names an
+            # abstract trait, 0 otherwise
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='abstract_trait'))
+        elif messagelist[0] == 'ANIMATES':
+            command = 'ANIMATES'
+            # Position in the list returned equals position
+            # in the document. Flag 1 if the word names an animate
+            # entity, 0 otherwise
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='animate'))
+        elif messagelist[0] == 'LOCATIONS':
+            command = 'LOCATIONS'
+            # Position in the list returned equals position
+            # in the document. Flag 1 if the word names an
+            # animate entity, 0 otherwise
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='location'))
+        elif messagelist[0] == 'DEICTICS':
+            command = 'DEICTICS'
+            # Position in the list returned equals position in
+            # the document. Flag 1 if the word names a deictic
+            # element, 0 otherwise
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='deictic'))
+        elif messagelist[0] == 'PARAGRAPHS':
+            command = 'PARAGRAPHS'
+            # Items in the list indicate word offsets in the document
+            # at which paragraph breaks appear
+            label = messagelist[1]
+            doc = self.get_document(label)
+                                
+            return quoted_text(
+                doc._.AWE_Info(infoType="Doc",indicator='delimiter_n')
+            )
+                # doc._.paragraph_breaks))
+        elif messagelist[0] == 'SENTENCES':
+            command = 'SENTENCES'
+            # Items in the list indicate word offsets in the document
+            # at which paragraph breaks appear
+            label = messagelist[1]
+            doc = self.get_document(label)
+            
+            return quoted_text(
+                doc._.AWE_Info(infoType="Doc",indicator='sents')
+            )
+            #return json.dumps(
+            #    [(sent.start, sent.end) for sent in doc.sents])
+        elif messagelist[0] == 'PARAGRAPHLENS':
+            command = 'PARAGRAPHLENS'
+            # Items in the list indicate lengths of paragraphs listed
+            # by offset in GETPARAGRAPHS
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType="Doc",indicator='sents',transformations=['tokenlen'])
+            )
+        elif messagelist[0] == 'TRANSITIONPROFILE':
+            command = 'TRANSITIONPROFILE'
+            # Returns a rich data structure in a list containing
+            # (1) total number of transition words in the document
+            # (2) a dictionary that lists the frequency of a predefined
+            #     set of transition word categories.
+            # (3) a dictionary that lists the frequency of individual
+            #     transition words
+            # (4) a list of lists that provides for each transition
+            #     word the word string, its start and stop offsets,
+            #     and its transition word category.
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.transition_word_profile
+        elif messagelist[0] == 'TRANSITIONS':
+            command = 'TRANSITIONS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType='Doc',indicator='transitions')
+            )
+        elif messagelist[0] == 'TRANSITIONDISTANCES':
+            command = 'TRANSITIONDISTANCES'
+            # List of cosine distances between ten-word windows
+            # before and after a transition
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType='Doc',indicator='transition_distances')
+            )
+        elif messagelist[0] == 'SENTENCECOHESIONS':
+            command = 'SENTENCECOHESIONS'
+            # List of cosine distances between ten-word windows
+            # before and after a sentence boundary
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType='Doc',indicator='intersentence_cohesions')
+            )
+        elif messagelist[0] == 'SLIDERCOHESIONS':
+            command = 'SLIDERCOHESIONS'
+            # List of cosine distances between ten-word windows
+            # before and after a sliding window through the text
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType='Doc',indicator='sliding_window_cohesions')
+            )
+        elif messagelist[0] == 'COREFCHAINS':
+            command = 'COREFCHAINS'
+            # List of coreference chains found in document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.coref_chains
+        elif messagelist[0] == 'RHEMEDEPTHS':
+            command = 'RHEMEDEPTHS'
+            # Syntactic depth of the sentence rheme -- part of
+            # sentence after the main verb where new information
+            # is usually placed
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType='Doc',indicator='syntacticDepthsOfRhemes')
+            )
+        elif messagelist[0] == 'THEMEDEPTHS':
+            command = 'THEMEDEPTHS'
+            # Syntactic depth of the sentence theme -- part
+            # of sentence before the main verb where given
+            # information is usually placed
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='syntacticDepthsOfThemes')
+            )
+        elif messagelist[0] == 'WEIGHTEDDEPTHS':
+            command = 'WEIGHTEDDEPTHS'
+            # Syntactic depth weighted to penalize
+            # left-embedded structures
+            # that tend to be harder to process
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='weightedSyntacticDepths')
+            )
+        elif messagelist[0] == 'WEIGHTEDBREADTHS':
+            command = 'WEIGHTEDBREADTHS'
+            # Syntactic breadth -- measure of extent to which sentence
+            # structure is additive, consisting of coordinated
+            # structures and loosely appended modifiers typical of
+            # spoken, often unplanned sentence production
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='weightedSyntacticBreadths')
+            )
+        elif messagelist[0] == 'SENTENCETYPES':
+            # tuple giving number and location of sentence types
+            # format:
+            # (1,1,1,1,[1,2,3,4]) would be the record for a text that
+            # had four sentences -- simple sentence, compound sentence,
+            # complex sentence, and compound/complex sentence, in
+            # that order.
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType='Doc',indicator='sentence_types')
+            )
+        elif messagelist[0] == 'SYNTACTICPROFILE':
+            command = 'SYNTACTICPROFILE'
+            # Returns a dictionary containing frequency information
+            # about the syntactic relations and categories in the text.
+            # This includes information about the frequency of parts
+            # of speech, morphological categories, and syntactic
+            # dependencies between specific parts of speech.
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.syntacticProfile
+        elif messagelist[0] == 'NORMEDSYNTACTICPROFILE':
+            command = 'NORMEDSYNTACTICPROFILE'
+            # Returns a dictionary containing normalized
+            # frequency information (proportionas) for the
+            # syntactic relations and categories in the text.
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.syntacticProfileNormed
+        elif messagelist[0] == 'QUOTEDTEXT':
+            command = 'QUOTEDTEXT'
+            # 1 for tokens within quotation marks, 0 for other text
+            # Position in the list corresponds to offset of token
+            # in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_quoted')
+            )
+        elif messagelist[0] == 'DIRECTSPEECHSPANS':
+            command = 'DIRECTSPEECHSPANS'
+            # Data about subset of quoted text -- specifically,
+            # quoted text that is attributed to a specific
+            # speaker.
+            #
+            # Returns a list of lists with three top level
+            # elements:
+            #
+            # 1. Speaker: a list of offsets to tokens
+            #    referring to the speaker(s)
+            # 2. Addressee: a list of offsets to tokens
+            #    referring to the person(s) spoken to.
+            # 3. Span start offset
+            # 4. Span end offset.
+            #
+            # Note that first and second person pronouns
+            # inside direct speech may reference a person
+            # explicitly identified in the direct speech
+            # framing text. Coreferee reference resolution
+            # may apply, so that the speaker and addressee
+            # references may be to a proper noun at the head
+            # of a pronominal reference chain that includes
+            # the direct speech frame.
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType="Doc",indicator='vwp_direct_speech')
+            )
+        elif messagelist[0] == 'IN_DIRECT_SPEECH':
+            # 1 for tokens within quoted stretches of direct speech,
+            # 0 for other text. Position in the list corresponds to
+            # offset of token in the document
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_in_direct_speech')
+            )
+        elif messagelist[0] == 'TENSECHANGES':
+            # list of positions where tense changed in the main
+            # document flow (not in direct speech/quotations,
+            # with flag to indicate whether shift was to past
+            # tense or to present tense.
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.vwp_tense_changes
+        elif messagelist[0] == 'PERSPECTIVES':
+            # list of positions where perspective is indicated
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_perspective')
+            )
+        elif messagelist[0] == 'ATTRIBUTIONS':
+            # list of positions where attribution is indicated
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_attribution')
+            )
+        elif messagelist[0] == 'SOURCES':
+            # list of positions where source is indicated
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_source')
+            )
+        elif messagelist[0] == 'CITES':
+            # list of positions where source is indicated
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_cite')
+            )
+        elif messagelist[0] == 'STATEMENTSOFFACT':
+            # list of positions where source is indicated
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType="Doc",indicator='vwp_statements_of_fact')
+            )
+        elif messagelist[0] == 'STATEMENTSOFOPINION':
+            # list of positions where source is indicated
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType="Doc",indicator='vwp_statements_of_opinion')
+            )
+        elif messagelist[0] == 'PERSPECTIVESPANS':
+            command = 'PERSPECTIVESPANS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.vwp_perspective_spans
+        elif messagelist[0] == 'STANCEMARKERS':
+            command = 'STANCEMARKERS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.vwp_stance_markers
+
+        elif messagelist[0] == 'CLAIMTEXTS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_claim')
+            )
+
+        elif messagelist[0] == 'DISCUSSIONTEXTS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_discussion')
+            )
+
+        elif messagelist[0] == 'EMOTIONWORDS':
+            command = 'EMOTIONWORDS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_emotionword')
+            )
+
+        elif messagelist[0] == 'CHARACTERWORDS':
+            command = 'CHARACTERWORDS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_character_traits')
+            )
+
+        elif messagelist[0] == 'EMOTIONALSTATES':
+            command = 'EMOTIONALSTATES'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return text_reply(
+                doc._.AWE_Info(infoType="Doc",indicator='vwp_emotion_states')
+            )
+        elif messagelist[0] == 'CHARACTERTRAITS':
+            command = 'CHARACTERTRAITS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.vwp_character_traits
+        elif messagelist[0] == 'PROPOSITIONALATTITUDES':
+            command = 'PROPOSITIONALATTITUDES'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType="Doc",indicator='vwp_propositional_attitudes')
+            )
+        elif messagelist[0] == 'SOCIAL_AWARENESS':
+            command = 'SOCIAL_AWARENESS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(infoType="Doc",indicator='vwp_social_awareness')
+            )
+        elif messagelist[0] == 'CONCRETEDETAILS':
+            command = 'CONCRETEDETAILS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return text_reply(
+                doc._.AWE_Info(indicator='concrete_detail')
+            )
+        elif messagelist[0] == 'INTERACTIVELANGUAGE':
+            command = 'INTERACTIVELANGUAGE'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_interactive')
+            )
+        elif messagelist[0] == 'ARGUMENTWORDS':
+            command = 'ARGUMENTWORDS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_argumentword')
+            )
+        elif messagelist[0] == 'ARGUMENTLANGUAGE':
+            command = 'ARGUMENTLANGUAGE'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_argumentation')
+            )
+        elif messagelist[0] == 'EXPLICITARGUMENTWORDS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='vwp_explicit_argument')
+            )
+        elif messagelist[0] == 'SUBJECTIVITYRATINGS':
+            command = 'SUBJECTIVITYRATINGS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(                    
+                doc._.AWE_Info(indicator='subjectivity')
+            )
+        elif messagelist[0] == 'SENTIMENTRATINGS':
+            command = 'SENTIMENTRATINGS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(                    
+                doc._.AWE_Info(indicator='vwp_sentiment')
+            )
+        elif messagelist[0] == 'TONERATINGS':
+            command = 'TONERATINGS2'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(                    
+                doc._.AWE_Info(indicator='vwp_tone')
+            )
+        elif messagelist[0] == 'POLARITYRATINGS':
+            command = 'POLARITYRATINGS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(                    
+                doc._.AWE_Info(indicator='polarity')
+            )
+        elif messagelist[0] == 'ASSESSMENTS':
+            command = 'ASSESSMENTS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.assessments
+        elif messagelist[0] == 'PASTTENSESCOPE':
+            command = 'PASTTENSESCOPE'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='in_past_tense_scope')
+            )
+        elif messagelist[0] == 'GOVERNINGSUBJECTS':
+            command = 'GOVERNINGSUBJECTS'
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='governing_subject')
+            )
+        elif messagelist[0] == 'CLUSTERS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='clusterID')
+            )
+        elif messagelist[0] == 'PROMPTLANGUAGE':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.prompt_language
+        elif messagelist[0] == 'PROMPTRELATED':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.prompt_related
+        elif messagelist[0] == 'MAINIDEAS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return text_reply(
+                doc._.AWE_Info(infoType="Doc",indicator='main_ideas')
+            )
+        elif messagelist[0] == 'SUPPORTINGIDEAS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return text_reply(
+                doc._.AWE_Info(infoType="Doc",indicator='supporting_ideas')
+            )
+        elif messagelist[0] == 'SUPPORTINGDETAILS':
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return text_reply(
+                doc._.AWE_Info(infoType="Doc",indicator='supporting_details')
+            )
+        elif messagelist[0] == 'CLUSTERINFO':
+            command = 'CLUSTERINFO'
+            # Get the local word clusters our algorithm has
+            # clustered the words of the student document into
+            #
+            # The data is a list of records in this format:
+            # 1.  The clusterID.
+            # 2.  The cluster rating, which is roughly a measure
+            #     of how important the cluster seems to be in the
+            #     docyument as measured by the number of words in it
+            #     and their relative infrequency
+            # 3.  A list of the actual word strings in each cluster
+            # 4.  The offsets of the words assigned to each cluster
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.clusterInfo
+        elif messagelist[0] == 'DEVWORDS':
+            command = 'DEVWORDS'
+            # offset of the logical subject that governs
+            # the domain this token belongs to
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return quoted_text(
+                doc._.AWE_Info(indicator='devword')
+            )
+        elif messagelist[0] == 'NOMINALREFERENCES':
+            command = 'NOMINALREFERENCES'
+            # offset of the logical subject that governs
+            # the domain this token belongs to
+            label = messagelist[1]
+            doc = self.get_document(label)
+            return doc._.nominalReferences
+        elif messagelist[0] == 'DOCSUMMARYLABELS':
+            command = 'DOCSUMMARYLABELS'
+            return self.summaryLabels
+        elif messagelist[0] == 'DOCSUMMARYFEATS':
+            command = 'DOCSUMMARYFEATS'
+            label = messagelist[1]
+            # Computes the features listed in summaryLabels
+            # in a single pass over the document
+            summaryFeats = summaryEngine(
+                self.token_columns(label)).summarize_all()
+            return summaryFeats
+        else:
+            return False
 
 if __name__ == '__main__':
     print('parser server loading')
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+from collections import OrderedDict
+from awe_workbench.web.wireCodec import textReply
+
+# Cache of the replies the parser server has sent for read-only
+# commands. A front end typically asks for a dozen or more indicator
+# lists for the same essay, and often asks for them again when the
+# page is redrawn, so there is no reason to recompute them as long as
+# the document has not changed.
+#
+# Entries are keyed on (label, document version, command, arguments).
+# The server bumps the version of a label every time a document is
+# registered under it, so a reply computed for an earlier version can
+# never be returned for a later one. Entries are also dropped as soon
+# as their document is replaced or removed, and the least recently
+# used entries are evicted once the cached replies add up to more than
+# max_bytes.
+
+
+def response_size(response):
+    # Replies are mostly JSON text (see wireCodec.textReply) or small
+    # values, so the length of their text is a good enough estimate
+    # of the memory they take up
+    if isinstance(response, textReply):
+        return len(response.text)
+    if isinstance(response, (str, bytes)):
+        return len(response)
+    return len(str(response))
+
+
+class responseCache:
+
+    entries = None
+    by_label = None
+
+    def __init__(self, max_bytes=64 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.by_label = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        # The cached reply for key, or None
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
+        self.misses += 1
+        return None
+
+    def put(self, key, response):
+        if response is None:
+            return
+        size = response_size(response)
+        if size > self.max_bytes:
+            return
+        self.discard(key)
+        self.entries[key] = (response, size)
+        self.by_label.setdefault(key[0], set()).add(key)
+        self.size += size
+        while self.size > self.max_bytes:
+            oldest = next(iter(self.entries))
+            self.discard(oldest)
+            self.evictions += 1
+
+    def discard(self, key):
+        if key not in self.entries:
+            return
+        (response, size) = self.entries.pop(key)
+        self.size -= size
+        keys = self.by_label.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if len(keys) == 0:
+                del self.by_label[key[0]]
+
+    def invalidate(self, label):
+        # Drop every reply computed for the document with this label
+        for key in list(self.by_label.get(label, [])):
+            self.discard(key)
+
+    def clear(self):
+        self.entries.clear()
+        self.by_label.clear()
+        self.size = 0
+
+    def stats(self):
+        return {'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self.entries),
+                'bytes': self.size,
+                'max_bytes': self.max_bytes}
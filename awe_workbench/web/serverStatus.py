@@ -0,0 +1,105 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import json
+import os
+import resource
+import socket
+import time
+
+# How to tell when the servers have finished starting up.
+#
+# Loading the spacy model, coreferee and the AWE components takes the
+# parser server a minute or more, and it does not listen on its port
+# until it is done. If it is given a ready file, it writes its status
+# there as it loads (which components are loaded, and how long each
+# stage took), with state 'ready' once it is serving. The
+# LanguageTool and spelling correction servers are ready when they
+# accept connections on their ports. wait_for_services blocks until
+# all of them are ready, instead of sleeping for a fixed time.
+
+# The ports the servers listen on
+defaultPorts = {'languagetool': 8081,
+                'spellcorrect': 8765,
+                'parser': 8766}
+
+
+def port_open(port, host='localhost', timeout=1.0):
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def process_memory():
+    # Resident memory of this process now (where /proc tells us) and
+    # at its peak, in bytes
+    memory = {'max_rss':
+              resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    try:
+        with open('/proc/self/statm') as fp:
+            pages = int(fp.read().split()[1])
+        memory['rss'] = pages * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        memory['rss'] = None
+    return memory
+
+
+def write_status(path, status):
+    # Written to a temporary file and renamed into place, so that a
+    # reader never sees half of it
+    with open(path + '.tmp', 'w') as fp:
+        json.dump(status, fp)
+    os.replace(path + '.tmp', path)
+
+
+def read_status(path):
+    try:
+        with open(path) as fp:
+            return json.load(fp)
+    except (OSError, ValueError):
+        return None
+
+
+def service_ready(name, port, ready_file=None, process=None):
+    if name == 'parser' and ready_file is not None:
+        status = read_status(ready_file)
+        # (the file may be left over from an earlier run)
+        return status is not None \
+            and status.get('state') == 'ready' \
+            and (process is None or status.get('pid') == process.pid)
+    return port_open(port)
+
+
+def wait_for_services(ports=defaultPorts,
+                      ready_file=None,
+                      processes={},
+                      timeout=600,
+                      interval=0.5):
+    # Wait until every service in ports (name -> port) is ready, and
+    # return how many seconds each one took. processes, if given,
+    # maps names to the processes running the services, so that we
+    # can stop waiting for a service that has died. Raises
+    # RuntimeError if one dies, and TimeoutError if they are not all
+    # ready within timeout seconds.
+    start = time.time()
+    waiting = dict(ports)
+    ready = {}
+    while len(waiting) > 0:
+        for name, port in list(waiting.items()):
+            process = processes.get(name)
+            if service_ready(name, port, ready_file, process):
+                ready[name] = time.time() - start
+                del waiting[name]
+            elif process is not None and process.exitcode is not None:
+                raise RuntimeError(name + ' server exited with code '
+                                   + str(process.exitcode))
+        if len(waiting) == 0:
+            break
+        if time.time() - start > timeout:
+            raise TimeoutError('Servers not ready after '
+                               + str(timeout) + ' seconds: '
+                               + ', '.join(waiting))
+        time.sleep(interval)
+    return ready
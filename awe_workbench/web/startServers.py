@@ -1,16 +1,41 @@
 #!/usr/bin/env python3.10
 # Copyright 2022, Educational Testing Service
 
-from multiprocessing import Process, Queue
-
+import multiprocessing
 import os
-import time
+import tempfile
 
-import awe_languagetool.languagetoolServer
-import awe_spellcorrect.spellcorrectServer
-import awe_workbench.web.parserServer
 import argparse
-from awe_workbench.pipeline import pipeline_def
+from awe_workbench.web.serverStatus import wait_for_services, defaultPorts
+
+# This process only starts the servers and keeps an eye on them. Each
+# server imports its own (heavy) modules inside its own process: the
+# parser server alone pulls in spacy, Holmes, coreferee and the AWE
+# components, and the spelling corrector pulls in torch, so importing
+# them here as well would only slow down startup and take up memory
+# in a process that never uses them.
+#
+# With the spawn start method (the default) each server starts from a
+# fresh interpreter. fork starts them sooner, and is safe here since
+# this process has nothing loaded but the standard library, but some
+# platforms do not support it.
+
+
+def run_languagetool():
+    import awe_languagetool.languagetoolServer
+    awe_languagetool.languagetoolServer.runServer()
+
+
+def run_spellcorrect():
+    import awe_spellcorrect.spellcorrectServer
+    awe_spellcorrect.spellcorrectServer.spellcorrectServer()
+
+
+def run_parser(**kwargs):
+    import awe_workbench.web.parserServer
+    from awe_workbench.pipeline import pipeline_def
+    awe_workbench.web.parserServer.parserServer(pipeline_def=pipeline_def,
+                                                **kwargs)
 
 
 class startServers:
@@ -21,30 +46,171 @@ class startServers:
     p3 = None
     queue = None
 
-    def __init__(self):
-        queue = Queue()
+    def __init__(self,
+                 parse_workers=2,
+                 max_documents=None,
+                 max_document_bytes=None,
+                 document_ttl=None,
+                 spill_dir=None,
+                 import_from=None,
+                 restore_from=None,
+                 ready_file=None,
+                 wait=False,
+                 timeout=600,
+                 start_method='spawn',
+                 defer_components=False,
+                 max_upload_bytes=2 ** 26):
+        context = multiprocessing.get_context(start_method)
+        self.queue = context.Queue()
 
-        p1 = \
-            Process(target=awe_languagetool.languagetoolServer.runServer,
-                    args=())
-        p1.start()
+        # The parser server writes its load status to ready_file (see
+        # serverStatus); we need one to be able to wait for it
+        if ready_file is None and wait:
+            ready_file = os.path.join(tempfile.mkdtemp(), 'parser.ready')
+        self.ready_file = ready_file
 
-        p2 = \
-            Process(target=awe_spellcorrect.spellcorrectServer.spellcorrectServer,
-                    args=())
-        p2.start()
+        self.p1 = context.Process(target=run_languagetool, args=())
+        self.p1.start()
 
-        p3 = Process(target=awe_workbench.web.parserServer.parserServer,
-                     args=(),
-                     kwargs={'pipeline_def': pipeline_def})
-        p3.start()
+        self.p2 = context.Process(target=run_spellcorrect, args=())
+        self.p2.start()
+
+        self.p3 = context.Process(
+            target=run_parser,
+            args=(),
+            kwargs={'parse_workers': parse_workers,
+                    'max_documents': max_documents,
+                    'max_document_bytes': max_document_bytes,
+                    'document_ttl': document_ttl,
+                    'spill_dir': spill_dir,
+                    'import_from': import_from,
+                    'restore_from': restore_from,
+                    'ready_file': ready_file,
+                    'defer_components': defer_components,
+                    'max_upload_bytes': max_upload_bytes})
+        self.p3.start()
+
+        if wait:
+            print('ready after', self.wait_until_ready(timeout), 'seconds')
+
+    def processes(self):
+        return {'languagetool': self.p1,
+                'spellcorrect': self.p2,
+                'parser': self.p3}
+
+    def wait_until_ready(self, timeout=600):
+        # Block until all three servers are ready, and return how long
+        # each one took
+        return wait_for_services(defaultPorts,
+                                 ready_file=self.ready_file,
+                                 processes=self.processes(),
+                                 timeout=timeout)
+
+    def join(self):
+        for process in self.processes().values():
+            process.join()
+
+    def stop(self):
+        for process in self.processes().values():
+            if process.is_alive():
+                process.terminate()
+        self.join()
 
 
 if __name__ == '__main__':
 
     parser = \
        argparse.ArgumentParser(description='Run AWE Workbench server scripts')
+    parser.add_argument(
+        '--parse-workers',
+        type=int,
+        default=2,
+        help='Number of worker processes the parser server uses for parsing'
+    )
+
+    parser.add_argument(
+        '--max-documents',
+        type=int,
+        default=None,
+        help='Number of parsed documents the parser server keeps in '
+             'memory before spilling the least recently used to disk'
+    )
+    parser.add_argument(
+        '--max-document-bytes',
+        type=int,
+        default=None,
+        help='Total serialized size of the parsed documents the parser '
+             'server keeps in memory before spilling to disk'
+    )
+    parser.add_argument(
+        '--max-upload-bytes',
+        type=int,
+        default=2 ** 26,
+        help='Most text a connection to the parser server can have '
+             'buffered in chunked uploads at once'
+    )
+    parser.add_argument(
+        '--document-ttl',
+        type=float,
+        default=None,
+        help='Seconds a parsed document may go unused before it is '
+             'spilled to disk'
+    )
+    parser.add_argument(
+        '--spill-dir',
+        default=None,
+        help='Directory for spilled documents (default: a temporary '
+             'directory)'
+    )
+    parser.add_argument(
+        '--import-from',
+        default=None,
+        help='Shard file, or directory of shard files, of parsed '
+             'documents for the parser server to load at startup'
+    )
+    parser.add_argument(
+        '--ready-file',
+        default=None,
+        help='File the parser server writes its load status to, with '
+             'state "ready" once it is serving'
+    )
+    parser.add_argument(
+        '--wait',
+        action='store_true',
+        help='Wait until all the servers are ready before returning'
+    )
+    parser.add_argument(
+        '--start-method',
+        default='spawn',
+        choices=multiprocessing.get_all_start_methods(),
+        help='How to start the server processes (spawn starts each from '
+             'a fresh interpreter; fork is faster where it is available)'
+    )
+    parser.add_argument(
+        '--restore-from',
+        default=None,
+        help='Directory of a parser server snapshot (see the SNAPSHOT '
+             'command) to restore at startup'
+    )
+    parser.add_argument(
+        '--defer-components',
+        action='store_true',
+        help='Parse without the word cluster and content segmentation '
+             'components, and run them on a document only when a '
+             'command needs them'
+    )
 
     args = parser.parse_args()
 
-    startServers()
+    startServers(parse_workers=args.parse_workers,
+                 max_documents=args.max_documents,
+                 max_document_bytes=args.max_document_bytes,
+                 document_ttl=args.document_ttl,
+                 spill_dir=args.spill_dir,
+                 import_from=args.import_from,
+                 restore_from=args.restore_from,
+                 ready_file=args.ready_file,
+                 wait=args.wait,
+                 start_method=args.start_method,
+                 defer_components=args.defer_components,
+                 max_upload_bytes=args.max_upload_bytes)
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+from awe_components.components.utility_functions import content_pos
+
+# The DOCSUMMARYFEATS command used to make one doc._.AWE_Info call
+# per summary feature, and each of those calls walked every token in
+# the document, reapplied the same filters and recomputed the same
+# statistics. Here the token-level summaries are computed from the
+# document's tokenColumns store instead: each token indicator is
+# extracted once into an array, each distinct filter is evaluated once
+# as a boolean mask, and the mean/median/max/min/stdev/proportion
+# summaries are computed with numpy from those arrays. Features that
+# are not token-level summaries (document-level indicators, type
+# counts, and so on) are still passed on to AWE_Info.
+
+alpha = [('is_alpha', ['True'])]
+alpha_devword = [('is_alpha', ['True']), ('devword', ['True'])]
+alpha_content = [('is_alpha', ['True']),
+                 ('is_stop', ['False']),
+                 ('pos_', content_pos)]
+
+# The order in which most of the features report their statistics
+stats = ['mean', 'median', 'max', 'min', 'stdev']
+
+# ... and the order used by the later features in the list
+stats_min_first = ['mean', 'median', 'min', 'max', 'stdev']
+
+
+def specs(summaryTypes=stats, **kwargs):
+    return [dict(kwargs, summaryType=summaryType)
+            for summaryType in summaryTypes]
+
+
+# AWE_Info arguments for each feature, in the same order as
+# parserServer.summaryLabels. An entry with an 'attribute' key is
+# read directly from the document extension of that name.
+summarySpecs = \
+    specs(indicator='nSyll') \
+    + specs(indicator='text', filters=alpha,
+            transformations=['len', 'sqrt']) \
+    + [dict(indicator='is_latinate', filters=alpha,
+            summaryType='proportion'),
+       dict(indicator='is_academic', filters=alpha,
+            summaryType='proportion')] \
+    + specs(indicator='family_size', filters=alpha) \
+    + specs(indicator='concreteness', filters=alpha) \
+    + specs(indicator='nSenses', filters=alpha, transformations=['log']) \
+    + specs(indicator='nMorph', filters=alpha) \
+    + specs(indicator='min_root_freq', filters=alpha,
+            transformations=['log']) \
+    + specs(indicator='root_famSize', filters=alpha) \
+    + specs(indicator='root_pfmf', filters=alpha) \
+    + specs(indicator='token_freq', filters=alpha) \
+    + specs(indicator='lemma_freq', filters=alpha) \
+    + specs(indicator='max_freq') \
+    + [dict(indicator='abstract_trait', filters=alpha,
+            summaryType='proportion'),
+       dict(indicator='animate', filters=alpha,
+            summaryType='proportion'),
+       dict(indicator='deictic', filters=alpha,
+            summaryType='proportion'),
+       dict(indicator='root', filters=alpha_content,
+            summaryType='total'),
+       dict(indicator='lemma_', filters=alpha_content,
+            summaryType='total'),
+       dict(indicator='lower_', filters=alpha_content,
+            summaryType='total'),
+       dict(indicator='text', filters=alpha_content,
+            summaryType='total'),
+       dict(infoType='Doc', indicator='delimiter_n',
+            summaryType='total')] \
+    + specs(infoType='Doc', indicator='sents',
+            transformations=['tokenlen']) \
+    + [dict(infoType='Doc', indicator='transitions',
+            summaryType='proportion'),
+       dict(infoType='Doc', indicator='transitions',
+            summaryType='total'),
+       dict(infoType='Doc', indicator='transitions',
+            transformations=['text'], summaryType='counts')] \
+    + specs(infoType='Doc', indicator='transition_distances') \
+    + specs(infoType='Doc', indicator='intersentence_cohesions') \
+    + specs(infoType='Doc', indicator='sliding_window_cohesions') \
+    + [dict(infoType='Doc', indicator='corefChainInfo',
+            summaryType='counts')] \
+    + specs(infoType='Doc', indicator='corefChainInfo',
+            transformations=['len']) \
+    + [dict(infoType='Doc', indicator='sents', summaryType='counts')] \
+    + specs(infoType='Doc', indicator='sents', transformations=['len']) \
+    + specs(infoType='Doc', indicator='sentenceThemes',
+            transformations=['tokenlen']) \
+    + specs(infoType='Doc', indicator='syntacticDepthsOfRhemes') \
+    + specs(infoType='Doc', indicator='syntacticDepthsOfThemes') \
+    + specs(indicator='weightedSyntacticDepth') \
+    + specs(indicator='weightedSyntacticBreadth') \
+    + [dict(attribute='syntacticVariety'),
+       dict(indicator='in_past_tense_scope', summaryType='proportion'),
+       dict(indicator='vwp_argumentation', summaryType='proportion'),
+       dict(infoType='Doc', indicator='vwp_direct_speech',
+            summaryType='proportion'),
+       dict(indicator='vwp_egocentric', summaryType='proportion'),
+       dict(indicator='vwp_allocentric', summaryType='proportion')] \
+    + specs(stats_min_first, indicator='subjectivity') \
+    + specs(stats_min_first, indicator='polarity') \
+    + specs(stats_min_first, indicator='vwp_sentiment') \
+    + specs(stats_min_first, infoType='Doc',
+            indicator='main_cluster_spans', transformations=['len']) \
+    + [dict(indicator='devword', summaryType='proportion')] \
+    + specs(stats_min_first, indicator='nSyll', filters=alpha_devword) \
+    + specs(stats_min_first, indicator='nMorph', filters=alpha_devword) \
+    + specs(stats_min_first, indicator='nSenses', filters=alpha_devword) \
+    + specs(stats_min_first, indicator='token_freq',
+            filters=alpha_devword) \
+    + specs(stats_min_first, indicator='concreteness',
+            filters=alpha_devword)
+
+
+class summaryEngine:
+
+    columns = None
+
+    def __init__(self, columns):
+        # columns is the tokenColumns store of the document
+        self.columns = columns
+
+    def summarize(self, spec):
+        doc = self.columns.doc
+        if 'attribute' in spec:
+            return doc._.get(spec['attribute'])
+        if self.columns.can_summarize(**spec):
+            return self.columns.summarize(**spec)
+        return doc._.AWE_Info(**spec)
+
+    def summarize_all(self, summary_specs=summarySpecs):
+        return [self.summarize(spec) for spec in summary_specs]
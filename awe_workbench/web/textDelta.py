@@ -0,0 +1,77 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import re
+
+# Edits to a document that is already registered (see the PARSEDELTA
+# command). A writing app sends the whole essay again after every
+# change, but most edits touch one paragraph. The spacy model's own
+# components (the tagger, parser, named entities and so on; see
+# pipeline.paragraph_components) work sentence by sentence, so for
+# the paragraphs an edit leaves alone we take their analyses from
+# the previous version of the document, and only parse the
+# paragraphs that changed. The rest of the pipeline (coreference,
+# the AWE components) works across paragraphs, and is run again on
+# the whole document.
+#
+# This is an approximation: tok2vec looks a few tokens either side
+# of each one, so the analyses near the edges of a paragraph parsed
+# on its own can differ a little from those in the whole text.
+# Documents built this way are registered under their own key (see
+# parseCache.paragraph_key), and are not put in the parse cache, so
+# parsing the same text with PARSEONE still gives the full parse.
+#
+# A paragraph here is a run of text up to and including the line
+# breaks (and any whitespace after them) that end it, so joining the
+# paragraphs gives back exactly the text, and offsets into the
+# document are the same as offsets into the text.
+
+paragraphBreak = re.compile(r'\n\s*')
+
+
+def split_paragraphs(text):
+    # The paragraphs of text, as a list of (start offset, paragraph)
+    paragraphs = []
+    start = 0
+    for match in paragraphBreak.finditer(text):
+        if match.end() < len(text):
+            paragraphs.append((start, text[start:match.end()]))
+            start = match.end()
+    if start < len(text):
+        paragraphs.append((start, text[start:]))
+    return paragraphs
+
+
+def apply_edit(text, offset, deleted, inserted):
+    # Replace the deleted characters from offset with inserted
+    if not isinstance(offset, int) or not isinstance(deleted, int) \
+       or offset < 0 or deleted < 0 or offset + deleted > len(text):
+        raise ValueError('Edit outside the document: offset '
+                         + str(offset) + ', deleted ' + str(deleted)
+                         + ', length ' + str(len(text)))
+    if not isinstance(inserted, str):
+        raise ValueError('Inserted text must be a string')
+    return text[:offset] + inserted + text[offset + deleted:]
+
+
+def edited_paragraphs(text, offset, deleted, inserted):
+    # Apply an edit to text and split the result into paragraphs.
+    # Returns the new text and a list of (paragraph, start), where
+    # start is the offset of the same paragraph in the old text if
+    # the edit did not touch it, and None if it has to be parsed
+    # again. (A paragraph next to the edit may not have been a
+    # paragraph of its own in the old text, e.g. if the edit removed
+    # a line break; the parse pool checks that the old document has
+    # tokens that start and end where it does.)
+    edited = apply_edit(text, offset, deleted, inserted)
+    shift = len(inserted) - deleted
+    paragraphs = []
+    for start, paragraph in split_paragraphs(edited):
+        end = start + len(paragraph)
+        old_start = None
+        if end <= offset:
+            old_start = start
+        elif start >= offset + len(inserted):
+            old_start = start - shift
+        paragraphs.append((paragraph, old_start))
+    return edited, paragraphs
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+from awe_workbench.web.textDelta import split_paragraphs
+
+# A text sent to the parser server in chunks (BEGINTEXT, APPENDTEXT,
+# COMMITTEXT), so that a long document does not have to go in one
+# frame. We do not wait for the whole text before starting on it:
+# as soon as a paragraph is complete (that is, the next one has
+# started), it can be parsed by the spacy model's components on its
+# own (see textDelta), and at commit only the last paragraph is left
+# to parse before the document-level components are run.
+#
+# Each chunk carries its index. Chunks sent in envelopes are handled
+# concurrently (see parserServer.serve_messages), so they need not
+# arrive in order; a chunk that comes early waits until the ones
+# before it are in.
+
+
+class textUpload:
+
+    # The chunks received so far, their size in bytes, and the text
+    # after the last complete paragraph
+    chunks = None
+    size = None
+    remainder = None
+
+    # Chunks that arrived before the ones before them, by index
+    waiting = None
+
+    # The parses of the complete paragraphs that have been started,
+    # in order (each one gives a list of serialized paragraphs)
+    parsed = None
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.remainder = ''
+        self.parsed = []
+        self.waiting = {}
+
+    def append(self, index, chunk):
+        # Add the chunk with this index, and return the paragraphs it
+        # (and any chunks waiting for it) completed
+        if not isinstance(index, int) or isinstance(index, bool) \
+           or index < 0:
+            raise ValueError('Chunk index must be a non-negative integer')
+        if index < len(self.chunks) or index in self.waiting:
+            raise ValueError('Chunk ' + str(index) + ' was already sent')
+        self.size += len(chunk.encode('utf-8'))
+        self.waiting[index] = chunk
+        while len(self.chunks) in self.waiting:
+            chunk = self.waiting.pop(len(self.chunks))
+            self.chunks.append(chunk)
+            self.remainder += chunk
+        paragraphs = split_paragraphs(self.remainder)
+        if len(paragraphs) < 2:
+            return []
+        self.remainder = paragraphs[-1][1]
+        return [paragraph for start, paragraph in paragraphs[:-1]]
+
+    def text(self, count=None):
+        # The whole text, checking that every chunk is in (and, if
+        # count is given, that there were count of them)
+        if len(self.waiting) > 0:
+            raise ValueError('Chunks missing before chunk '
+                             + str(min(self.waiting)))
+        if count is not None and count != len(self.chunks):
+            raise ValueError('Expected ' + str(count) + ' chunks, got '
+                             + str(len(self.chunks)))
+        return ''.join(self.chunks)
+
+    def cancel(self):
+        for future in self.parsed:
+            future.cancel()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import numpy as np
+from spacy.tokens import Token
+
+# A columnar view of the token attributes of one parsed document.
+# Reading token._ extension attributes one token at a time from Python
+# is what makes AWE_Info expensive, so the first time an indicator is
+# needed we read it for every token into a typed numpy array and keep
+# it. Filters, the len/sqrt/log transformations, and the summary
+# statistics are then array operations on those columns.
+#
+# Numeric and boolean indicators are stored as float arrays with NaN
+# for missing values (plus a flag recording whether every value was an
+# integer). Other indicators are only kept as the raw list of values,
+# which is what the len transformation works on. Filters compare the
+# string form of each value against the allowed values, as AWE_Info
+# does, so we also keep the string form of a column once it has been
+# used in a filter.
+
+# Summary types that can be computed from the columns
+columnSummaries = ['mean', 'median', 'max', 'min', 'stdev', 'proportion']
+
+# Transformations that can be applied to the columns
+columnTransformations = ['len', 'sqrt', 'log']
+
+
+def token_value(token, name):
+    if Token.has_extension(name):
+        return token._.get(name)
+    return getattr(token, name)
+
+
+def filter_key(filters):
+    return tuple((name, tuple(values)) for (name, values) in filters)
+
+
+class tokenColumns:
+
+    doc = None
+
+    def __init__(self, doc):
+        self.doc = doc
+        self.raw = {}
+        self.columns = {}
+        self.strings = {}
+        self.masks = {}
+        self.arrays = {}
+
+    def raw_column(self, name):
+        # The untyped values of one indicator for every token
+        if name not in self.raw:
+            self.raw[name] = [token_value(token, name)
+                              for token in self.doc]
+        return self.raw[name]
+
+    def column(self, name):
+        # Typed array for one indicator, and whether all its values
+        # are integers (or booleans). The array is None if the
+        # indicator is not numeric.
+        if name not in self.columns:
+            values = self.raw_column(name)
+            present = [value for value in values if value is not None]
+            if all(isinstance(value, (int, float, bool))
+                   for value in present):
+                integral = all(isinstance(value, (int, bool))
+                               for value in present)
+                array = np.array([np.nan if value is None else float(value)
+                                  for value in values],
+                                 dtype=float)
+            else:
+                integral = False
+                array = None
+            self.columns[name] = (array, integral)
+        return self.columns[name]
+
+    def string_column(self, name):
+        if name not in self.strings:
+            self.strings[name] = np.array(
+                [str(value) for value in self.raw_column(name)],
+                dtype=object)
+        return self.strings[name]
+
+    def mask(self, filters):
+        # Boolean mask of the tokens that pass all of the filters.
+        # Masks for single filters are cached separately, so that
+        # e.g. the is_alpha test is shared by every filter list
+        # that starts with it.
+        key = filter_key(filters)
+        if key not in self.masks:
+            mask = np.ones(len(self.doc), dtype=bool)
+            for (name, values) in filters:
+                single = filter_key([(name, values)])
+                if single not in self.masks:
+                    self.masks[single] = np.isin(
+                        self.string_column(name),
+                        np.array(list(values), dtype=object))
+                mask = mask & self.masks[single]
+            self.masks[key] = mask
+        return self.masks[key]
+
+    def values(self, indicator, filters=[], transformations=[]):
+        # Float array of the (transformed) indicator values of the
+        # tokens that pass the filters, with missing values as NaN,
+        # and whether the values are all integers
+        key = (indicator,
+               filter_key(filters),
+               tuple(transformations))
+        if key not in self.arrays:
+            mask = self.mask(filters)
+            if 'len' in transformations:
+                strings = [self.raw_column(indicator)[i]
+                           for i in np.flatnonzero(mask)]
+                array = np.array([np.nan if value is None
+                                  else float(len(value))
+                                  for value in strings],
+                                 dtype=float)
+                integral = True
+            else:
+                array, integral = self.column(indicator)
+                array = array[mask].astype(float)
+            for transformation in transformations:
+                if transformation == 'sqrt':
+                    array = np.sqrt(array)
+                    integral = False
+                elif transformation == 'log':
+                    array = array.copy()
+                    array[array <= 0] = np.nan
+                    array = np.log(array)
+                    integral = False
+            self.arrays[key] = (array, integral)
+        return self.arrays[key]
+
+    def nbytes(self):
+        # Roughly how much memory the columns take up: the arrays,
+        # and a pointer for each value in the raw and string columns
+        # (the values themselves, and the document, are not counted)
+        size = 0
+        for values in self.raw.values():
+            size += 8 * len(values)
+        for array, integral in list(self.columns.values()) \
+                + list(self.arrays.values()):
+            if array is not None:
+                size += array.nbytes
+        for array in list(self.strings.values()) \
+                + list(self.masks.values()):
+            size += array.nbytes
+        return size
+
+    def can_summarize(self,
+                      indicator,
+                      infoType='Token',
+                      filters=[],
+                      transformations=[],
+                      summaryType=None):
+        # Whether this request can be answered from the columns
+        # rather than by calling AWE_Info
+        if infoType != 'Token' or summaryType not in columnSummaries:
+            return False
+        if any(transformation not in columnTransformations
+               for transformation in transformations):
+            return False
+        try:
+            for name in [indicator] + [name for (name, values) in filters]:
+                self.raw_column(name)
+        except AttributeError:
+            return False
+        if 'len' not in transformations:
+            array, integral = self.column(indicator)
+            if array is None:
+                return False
+        return True
+
+    def summarize(self,
+                  indicator,
+                  infoType='Token',
+                  filters=[],
+                  transformations=[],
+                  summaryType=None):
+        array, integral = self.values(indicator, filters, transformations)
+        return summarize_array(array, summaryType, integral)
+
+
+def summarize_array(array, summaryType, integral=False):
+    # Missing values are skipped; an empty selection (or a single
+    # value, for stdev) gives NaN
+    values = array[~np.isnan(array)]
+    if summaryType == 'stdev':
+        if len(values) < 2:
+            return float('nan')
+        return float(np.std(values, ddof=1))
+    if len(values) == 0:
+        return float('nan')
+    if summaryType == 'mean' or summaryType == 'proportion':
+        return float(np.mean(values))
+    elif summaryType == 'median':
+        return float(np.median(values))
+    elif summaryType == 'max':
+        result = np.max(values)
+    elif summaryType == 'min':
+        result = np.min(values)
+    return int(result) if integral else float(result)
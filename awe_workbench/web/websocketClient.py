@@ -1,32 +1,143 @@
 #!/usr/bin/env python3.10
 # Copyright 2022, Educational Testing Service
 
-import asyncio
-import websocket
+import base64
+import queue
+import select
+import threading
 import json
-from websocket import create_connection
+from websocket import create_connection, WebSocketException, \
+    WebSocketConnectionClosedException
+from awe_workbench.web.wireCodec import subprotocols, pack, \
+    decode_message, JSON, MSGPACK
+
+from awe_workbench.web.documentShards import encode_header, \
+    encode_record, decode_header, decode_records, read_shard, shard_files
 
 
 class websocketClient:
 
+    # Connections are kept open and reused rather than opened for
+    # every message, since the handshake is a large part of the time
+    # a small command takes. Idle connections wait in a pool, so
+    # several threads can share one client, each using its own
+    # connection, with at most max_connections open at once. A
+    # connection in the pool may have been closed by the server in
+    # the meantime: one that has anything to read is dropped before
+    # we use it, and if sending on a pooled connection fails we try
+    # once more on a new one. Once a message has been sent we never
+    # send it again, since commands such as NEWSEARCHPHRASE or
+    # APPENDTEXT are not safe to repeat. With persistent=False every
+    # message gets a fresh connection, as it used to.
+    #
+    # With codec='msgpack' the client asks the server for msgpack
+    # messages (see wireCodec) when it connects. send then returns
+    # the decoded values without any double JSON encoding, and
+    # sendraw returns the msgpack bytes. If the server does not offer
+    # msgpack, we fall back to JSON.
+
     uri = None
+    idle = None
+    slots = None
 
-    def __init__(self):
+    def __init__(self, persistent=True, max_connections=4, codec='json'):
         self.uri = "ws://localhost:8765"
+        self.persistent = persistent
+        self.max_connections = max_connections
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(max_connections)
+        if codec == 'msgpack' and MSGPACK not in subprotocols():
+            raise ImportError('The msgpack codec needs msgpack-numpy')
+        self.negotiate = codec == 'msgpack'
 
     def set_uri(self, uri):
         self.uri = uri
+        self.close()
+
+    def connect(self):
+        if self.negotiate:
+            try:
+                return create_connection(self.uri,
+                                         subprotocols=[MSGPACK, JSON])
+            except WebSocketException:
+                # The server does not offer our subprotocols
+                self.negotiate = False
+        return create_connection(self.uri)
+
+    def close(self):
+        # Close the idle connections
+        while True:
+            try:
+                ws = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            close_quietly(ws)
+
+    def acquire(self, fresh=False):
+        # A connection, and whether it came from the pool
+        self.slots.acquire()
+        while not fresh:
+            try:
+                ws = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if not is_stale(ws):
+                ws.sent = False
+                return ws, True
+            close_quietly(ws)
+        try:
+            ws = self.connect()
+        except BaseException:
+            self.slots.release()
+            raise
+        ws.sent = False
+        return ws, False
+
+    def release(self, ws, reuse=True):
+        if reuse and self.persistent and ws.connected:
+            self.idle.put(ws)
+        else:
+            close_quietly(ws)
+        self.slots.release()
+
+    def call(self, exchange):
+        # Run exchange (a function that sends and receives on a
+        # connection) on a pooled connection, retrying once on a new
+        # connection if the pooled one turns out to be broken before
+        # anything was sent on it
+        for attempt in range(2):
+            ws, reused = self.acquire(fresh=attempt > 0)
+            try:
+                result = exchange(ws)
+            except (WebSocketException, OSError):
+                self.release(ws, reuse=False)
+                if not reused or ws.sent:
+                    raise
+                continue
+            except BaseException:
+                self.release(ws, reuse=False)
+                raise
+            self.release(ws)
+            return result
+
+    def request(self, texts):
+        # Send one message and return the raw reply, and the encoding
+        # used on the connection
+
+        def exchange(ws):
+            protocol = ws.getsubprotocol()
+            send_message(ws, texts, protocol)
+            return receive(ws), protocol
+
+        return self.call(exchange)
 
     def send(self, texts: list):
         if texts is None:
             print('no texts!')
             return None
         try:
-            ws = create_connection(self.uri)
-            ws.send(json.dumps(texts))
-            result = ws.recv()
-            ws.close()
-            return json.loads(result)
+            result, protocol = self.request(texts)
+            return decode_message(result, protocol)
         except Exception as e:
             print(e)
             return None
@@ -35,15 +146,242 @@ class websocketClient:
         if texts is None:
             return None
         try:
-            ws = create_connection(self.uri)
-            ws.send(json.dumps(texts))
-            result = ws.recv()
-            ws.close()
+            result, protocol = self.request(texts)
             return result
         except Exception as e:
             print(e)
             return None
 
+    def serialized(self, label):
+        # The serialized form of a registered document, as bytes
+        try:
+            result, protocol = self.request(['SERIALIZED', label])
+        except Exception as e:
+            print(e)
+            return None
+        if protocol == MSGPACK:
+            result = decode_message(result, protocol)
+        if not isinstance(result, bytes):
+            # (null for an unknown label)
+            return None
+        return result
+
+    def export(self, labels: list = None, path=None):
+        # Fetch the serialized documents for labels (or for every
+        # registered document) with the EXPORT command. If path is
+        # given, the stream is written there as a shard file and the
+        # number of documents is returned; otherwise returns a
+        # dictionary of the documents by label.
+
+        def exchange(ws):
+            protocol = ws.getsubprotocol()
+            message = ['EXPORT'] if labels is None else ['EXPORT', labels]
+            send_message(ws, message, protocol)
+            fp = open(path, 'wb') if path is not None else None
+            documents = {}
+            offset = None
+            try:
+                while True:
+                    frame = receive(ws)
+                    if isinstance(frame, str):
+                        count = json.loads(frame)['exported']
+                        return count if fp is not None else documents
+                    if fp is not None:
+                        fp.write(frame)
+                        continue
+                    if offset is None:
+                        metadata, offset = decode_header(frame)
+                    for label, document \
+                            in decode_records(frame, offset):
+                        documents[label] = bytes(document)
+                    offset = 0
+            finally:
+                if fp is not None:
+                    fp.close()
+
+        try:
+            return self.call(exchange)
+        except Exception as e:
+            print(e)
+            return None
+
+    def import_documents(self, documents: dict, metadata: dict,
+                         chunk_bytes=2 ** 23):
+        # Register serialized documents (a dictionary by label) with
+        # the server. metadata describes the pipeline they were parsed
+        # with (and, optionally, the pipeline profile), as in the header
+        # of a shard file or EXPORT stream; the server refuses
+        # documents from a different pipeline or with a profile it
+        # does not know. The documents go in binary frames of about
+        # chunk_bytes (the server takes frames of up to 16MB), each a
+        # complete shard. Returns the number of documents imported.
+
+        def frames():
+            header = encode_header(metadata)
+            frame = bytearray(header)
+            for label, serialized in documents.items():
+                record = encode_record(label, serialized)
+                if len(frame) > len(header) \
+                   and len(frame) + len(record) > chunk_bytes:
+                    yield bytes(frame)
+                    frame = bytearray(header)
+                frame += record
+            if len(frame) > len(header):
+                yield bytes(frame)
+
+        def exchange(ws):
+            protocol = ws.getsubprotocol()
+            imported = 0
+            for frame in frames():
+                send_frame(ws, frame)
+                reply = decode_message(receive(ws), protocol)
+                if 'error' in reply:
+                    raise ValueError(reply['error'])
+                imported += reply['imported']
+            return imported
+
+        try:
+            return self.call(exchange)
+        except Exception as e:
+            print(e)
+            return None
+
+    def import_shards(self, path):
+        # Import a local shard file, or every shard file in a local
+        # directory. (['IMPORT', path] imports files on the server.)
+        imported = 0
+        for shard in shard_files(path):
+            metadata, documents = read_shard(shard)
+            count = self.import_documents(documents, metadata)
+            if count is None:
+                return None
+            imported += count
+        return imported
+
+    def upload(self, label, text, options: dict = None,
+               chunk_size=2**20):
+        # Send a long text to the parser server to be parsed under
+        # label, in chunks of chunk_size characters, on one connection.
+        # BEGINTEXT goes first; the numbered APPENDTEXT chunks are
+        # sent without waiting for each reply; COMMITTEXT goes once
+        # they have all been answered. options are as for PARSEONE.
+        # Returns the reply to COMMITTEXT, or the first reply that
+        # was not True.
+        chunks = [text[i:i + chunk_size]
+                  for i in range(0, len(text), chunk_size)]
+        options = dict(options or {}, chunks=len(chunks))
+
+        def exchange(ws):
+            results = send_enveloped(ws, [['BEGINTEXT', label]])
+            results += send_enveloped(ws,
+                                      [['APPENDTEXT', label, i, chunk]
+                                       for i, chunk in enumerate(chunks)])
+            for result in results:
+                if result is not True:
+                    send_enveloped(ws, [['ABORTTEXT', label]])
+                    return result
+            return send_enveloped(ws, [['COMMITTEXT', label, options]])[0]
+
+        try:
+            return self.call(exchange)
+        except Exception as e:
+            print(e)
+            return None
+
+    def send_many(self, messages: list):
+        # Send a list of messages to the parser server over a single
+        # connection without waiting for each reply in turn. Each
+        # message goes in an envelope with a request id; the server
+        # works on them concurrently and the replies can come back in
+        # any order. Returns the replies in the order of the messages
+        # (None for any request that failed).
+        if messages is None:
+            return None
+
+        def exchange(ws):
+            return send_enveloped(ws, messages)
+
+        try:
+            return self.call(exchange)
+        except Exception as e:
+            print(e)
+            return None
+
+
+def send_enveloped(ws, messages):
+    # Send messages in envelopes on one connection, and return the
+    # replies in the order of the messages
+    protocol = ws.getsubprotocol()
+    for i, message in enumerate(messages):
+        send_message(ws, {'id': i, 'message': message}, protocol)
+    results = [None] * len(messages)
+    for i in range(len(messages)):
+        reply = decode_message(receive(ws), protocol)
+        results[reply['id']] = decode_reply(reply, protocol)
+    return results
+
+
+def send_message(ws, value, protocol):
+    if protocol == MSGPACK:
+        send_frame(ws, pack(value))
+    else:
+        ws.send(json.dumps(value))
+        ws.sent = True
+
+
+def send_frame(ws, frame):
+    # (sent records that the server may have the message now, so
+    # that call does not send it again)
+    ws.send_binary(frame)
+    ws.sent = True
+
+
+def is_stale(ws):
+    # An idle connection has nothing to read, unless the server has
+    # closed it (or started to) while it waited in the pool
+    if not ws.connected:
+        return True
+    try:
+        readable, _, _ = select.select([ws.sock], [], [], 0)
+    except (OSError, ValueError):
+        return True
+    return len(readable) > 0
+
+
+def receive(ws):
+    # recv returns an empty message rather than raising if what it
+    # reads is the server closing the connection
+    result = ws.recv()
+    if not ws.connected:
+        raise WebSocketConnectionClosedException(
+            'Connection closed by the server')
+    return result
+
+
+def close_quietly(ws):
+    try:
+        ws.close()
+    except Exception:
+        pass
+
+
+def decode_reply(reply, protocol=None):
+    # The response field of an enveloped reply holds what the server
+    # would have sent for the plain message, which is JSON text for
+    # almost every command (or, with msgpack, the value itself)
+    if 'error' in reply:
+        print(reply['error'])
+        return None
+    response = reply.get('response')
+    if response is None or protocol == MSGPACK:
+        return response
+    if reply.get('encoding') == 'base64':
+        return base64.b64decode(response)
+    try:
+        return json.loads(response)
+    except ValueError:
+        return response
+
 
 if __name__ == '__main__':
     wsc = websocketClient()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import json
+
+# msgpack is optional: without it the server only speaks JSON
+try:
+    import msgpack
+    import msgpack_numpy
+except ImportError:
+    msgpack = None
+
+# How messages to and from the parser server are encoded. JSON text
+# is the default. A client that asks for the awe.msgpack websocket
+# subprotocol when it connects gets msgpack binary frames instead, in
+# both directions, with numpy arrays packed natively.
+#
+# The server's commands return the values they compute, and each
+# reply is encoded once, for the protocol of the connection. Many
+# indicators come from AWE_Info, which gives its results as JSON
+# text; those are returned as a textReply, which JSON clients get
+# exactly as the server has always sent it (for most commands, as a
+# JSON string holding the text, so that they have to decode it
+# twice), and msgpack clients get as the value the text stands for.
+
+JSON = 'awe.json'
+MSGPACK = 'awe.msgpack'
+
+
+def subprotocols():
+    # The subprotocols the server offers, in order of preference
+    if msgpack is None:
+        return [JSON]
+    return [MSGPACK, JSON]
+
+
+class textReply:
+
+    # JSON text (or, for a number, its str()), whether JSON clients
+    # get it inside a JSON string, and the value, if we already have it
+    text = None
+    quoted = None
+    native = None
+
+    def __init__(self, text, quoted=False, value=None):
+        self.text = text
+        self.quoted = quoted
+        self.native = value
+
+    def json_text(self):
+        # The reply a JSON client gets
+        if self.quoted:
+            return json.dumps(self.text)
+        return self.text
+
+    def json_value(self):
+        # The reply a JSON client gets, once decoded (which is what
+        # goes into a larger reply such as MULTI's)
+        if self.quoted:
+            return self.text
+        return self.value()
+
+    def value(self):
+        # The value the text stands for
+        if self.native is not None:
+            return self.native
+        try:
+            return json.loads(self.text)
+        except ValueError:
+            # (e.g. str(float('nan')))
+            return self.text
+
+
+def text_reply(result):
+    # The reply for a result from AWE_Info: JSON text, or a number,
+    # which JSON clients get as its str()
+    if isinstance(result, (bool, int, float)):
+        return textReply(str(result), value=result)
+    return textReply(result)
+
+
+def quoted_text(text):
+    # The reply for JSON text that JSON clients get inside a string
+    return textReply(text, quoted=True)
+
+
+def json_default(value):
+    if isinstance(value, textReply):
+        return value.json_value()
+    raise TypeError('Cannot encode ' + type(value).__name__ + ' as JSON')
+
+
+def msgpack_default(value):
+    if isinstance(value, textReply):
+        return value.value()
+    return msgpack_numpy.encode(value)
+
+
+def to_json(response):
+    # The JSON text of a reply (binary replies are sent as they are)
+    if isinstance(response, textReply):
+        return response.json_text()
+    if isinstance(response, bytes):
+        return response
+    return json.dumps(response, default=json_default)
+
+
+def to_object(response):
+    # The value a reply stands for
+    if isinstance(response, textReply):
+        return response.value()
+    return response
+
+
+def pack(value):
+    return msgpack.packb(value,
+                         default=msgpack_default,
+                         use_bin_type=True)
+
+
+def unpack(data):
+    return msgpack.unpackb(data,
+                           object_hook=msgpack_numpy.decode,
+                           raw=False,
+                           strict_map_key=False)
+
+
+def decode_message(message, protocol=None):
+    # Binary frames on a msgpack connection are msgpack; anything
+    # else is JSON text
+    if protocol == MSGPACK and isinstance(message, bytes):
+        return unpack(message)
+    return json.loads(message)
+
+
+def encode_response(response, protocol=None):
+    # Encode a reply returned by one of the server's commands
+    if protocol == MSGPACK:
+        return pack(response)
+    return to_json(response)
+
+
+def encode_value(value, protocol=None):
+    # Encode a value (rather than a reply that is already JSON text)
+    if protocol == MSGPACK:
+        return pack(value)
+    return json.dumps(value)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import argparse
+import csv
+import glob
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from awe_workbench.pipeline import pipeline_def, pipeline_profiles, \
+    default_profile
+from awe_workbench.web.parsePool import init_worker, parse_documents, \
+    worker_metadata
+from awe_workbench.web.documentShards import shardWriter, shardSuffix
+
+# Parse a corpus of essays offline, without the parser server, and
+# write the parsed documents as shard files (see documentShards) that
+# a parser server can load with --import-from or the IMPORT command.
+#
+# The corpus is split into shards of --shard-size essays, and the
+# shards are parsed in --workers processes, each with its own Holmes
+# manager built from pipeline_def (the same setup as the parser
+# server's parse pool). Each worker writes its shards straight to the
+# output directory. When all the shards are done we write
+# manifest.json, listing the shards, the labels in each, the pipeline
+# they were parsed with, and the documents per second of each worker.
+#
+# The corpus can be:
+#     a directory of .txt files (labelled by file name)
+#     a .jsonl file with one object per essay
+#     a .csv file with one row per essay
+# For the last two, --text-field and --id-field name the fields that
+# hold the text and the label (essays without an id are labelled by
+# their position in the file).
+
+
+def read_corpus(path, text_field='text', id_field='id'):
+    # The essays in path, as a list of (label, text)
+    essays = []
+    if os.path.isdir(path):
+        for filename in sorted(glob.glob(os.path.join(path, '*.txt'))):
+            with open(filename, encoding='utf-8') as fp:
+                label = os.path.splitext(os.path.basename(filename))[0]
+                essays.append((label, fp.read()))
+    elif path.endswith('.jsonl'):
+        with open(path, encoding='utf-8') as fp:
+            for i, line in enumerate(fp):
+                if len(line.strip()) == 0:
+                    continue
+                record = json.loads(line)
+                essays.append((str(record.get(id_field, i)),
+                               record[text_field]))
+    elif path.endswith('.csv'):
+        with open(path, encoding='utf-8', newline='') as fp:
+            for i, row in enumerate(csv.DictReader(fp)):
+                essays.append((str(row.get(id_field) or i),
+                               row[text_field]))
+    else:
+        raise ValueError('Expected a directory, .jsonl or .csv file: '
+                         + path)
+    return essays
+
+
+def parse_shard(path, labels, texts, batch_size, profile):
+    # Parse one shard in a worker process and write it to path
+    start = time.time()
+    with shardWriter(path, dict(worker_metadata(), profile=profile)) \
+            as writer:
+        for i in range(0, len(texts), batch_size):
+            for label, serialized in \
+                    zip(labels[i:i + batch_size],
+                        parse_documents(texts[i:i + batch_size],
+                                        profile)):
+                writer.write(label, serialized)
+    return {'file': os.path.basename(path),
+            'labels': labels,
+            'documents': len(labels),
+            'bytes': os.path.getsize(path),
+            'seconds': time.time() - start,
+            'worker': os.getpid()}
+
+
+def parse_corpus(essays,
+                 output,
+                 workers=2,
+                 shard_size=500,
+                 batch_size=16,
+                 profile=default_profile):
+    os.makedirs(output, exist_ok=True)
+    start = time.time()
+
+    # Use spawn, as the parse pool does, so that every worker loads
+    # its own pipeline
+    executor = ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=init_worker,
+        initargs=(pipeline_def,))
+
+    with executor:
+        futures = []
+        for n, i in enumerate(range(0, len(essays), shard_size)):
+            shard = essays[i:i + shard_size]
+            path = os.path.join(output,
+                                'shard-{:05d}'.format(n) + shardSuffix)
+            futures.append(executor.submit(parse_shard,
+                                           path,
+                                           [label for label, text in shard],
+                                           [text for label, text in shard],
+                                           batch_size,
+                                           profile))
+        shards = []
+        for future in as_completed(futures):
+            shard = future.result()
+            print(shard['file'], shard['documents'], 'documents in',
+                  round(shard['seconds'], 1), 'seconds')
+            shards.append(shard)
+        metadata = executor.submit(worker_metadata).result()
+    shards.sort(key=lambda shard: shard['file'])
+
+    # Throughput of each worker over the time it spent parsing
+    worker_stats = {}
+    for shard in shards:
+        stats = worker_stats.setdefault(str(shard['worker']),
+                                        {'documents': 0, 'seconds': 0.0})
+        stats['documents'] += shard['documents']
+        stats['seconds'] += shard['seconds']
+    for stats in worker_stats.values():
+        stats['docs_per_sec'] = stats['documents'] / stats['seconds'] \
+            if stats['seconds'] > 0 else None
+    for shard in shards:
+        del shard['worker']
+
+    seconds = time.time() - start
+    manifest = {'metadata': dict(metadata, profile=profile),
+                'documents': sum(shard['documents'] for shard in shards),
+                'seconds': seconds,
+                'workers': worker_stats,
+                'shards': shards}
+    with open(os.path.join(output, 'manifest.json'), 'w') as fp:
+        json.dump(manifest, fp, indent=1)
+    return manifest
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser(
+        description='Parse a corpus of essays into document shards')
+    parser.add_argument(
+        '--input',
+        required=True,
+        help='Directory of .txt files, or a .jsonl or .csv file'
+    )
+    parser.add_argument(
+        '--output',
+        required=True,
+        help='Directory to write the shards and manifest.json to'
+    )
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=os.cpu_count(),
+        help='Number of parsing processes (each loads its own pipeline)'
+    )
+    parser.add_argument(
+        '--shard-size',
+        type=int,
+        default=500,
+        help='Number of essays per shard file'
+    )
+    parser.add_argument(
+        '--batch-size',
+        type=int,
+        default=16,
+        help='Number of essays a worker sends through nlp.pipe at once'
+    )
+    parser.add_argument(
+        '--profile',
+        default=default_profile,
+        choices=list(pipeline_profiles),
+        help='Pipeline profile to parse with (see awe_workbench/pipeline.py)'
+    )
+    parser.add_argument(
+        '--text-field',
+        default='text',
+        help='Field holding the essay text in a .jsonl or .csv file'
+    )
+    parser.add_argument(
+        '--id-field',
+        default='id',
+        help='Field holding the essay label in a .jsonl or .csv file'
+    )
+
+    args = parser.parse_args()
+
+    essays = read_corpus(args.input, args.text_field, args.id_field)
+    print('parsing', len(essays), 'essays with', args.workers, 'workers')
+    manifest = parse_corpus(essays,
+                            args.output,
+                            workers=args.workers,
+                            shard_size=args.shard_size,
+                            batch_size=args.batch_size,
+                            profile=args.profile)
+    print(manifest['documents'], 'documents in',
+          round(manifest['seconds'], 1), 'seconds')
+    for worker, stats in manifest['workers'].items():
+        print('worker', worker, stats['documents'], 'documents,',
+              stats['docs_per_sec'], 'docs/sec')
@@ -291,11 +291,21 @@ FEATURE_LIST = {
 def extract_features(parser, text, label):
     processed = {}
     ok = parser.send(['PARSEONE', label, text])
+    # Ask for all of the features in one round trip. MULTI only runs
+    # commands that read a single document, so any it refuses (such
+    # as FREQUENCIES, which covers all the registered documents), or
+    # all of them if the request fails, are asked for one at a time.
+    features = parser.send(['MULTI', label, list(FEATURE_LIST)])
+    if features is None:
+        features = {'results': {}, 'errors': dict.fromkeys(FEATURE_LIST)}
     for feature in FEATURE_LIST:
-        processed[feature.lower()] = \
-            parser.send([feature, label])
+        if feature in features['errors']:
+            processed[feature.lower()] = parser.send([feature, label])
+        else:
+            processed[feature.lower()] = features['results'].get(feature)
         if FEATURE_LIST[feature].get("type",
-                                     None) == "binary_map":
+                                     None) == "binary_map" \
+           and processed[feature.lower()] is not None:
             processed[feature.lower()] = \
                 binary_map_to_indexes(processed[feature.lower()])
     ok = parser.send(['REMOVE', label])
@@ -44,9 +44,11 @@ def flattenViewpointList(vlist, tokens):
             for subkey in vlist[key]:
                 for item in vlist[key][subkey]:
                     outlist.append(item)
+    # A set, so that we do not search the whole list for every token
+    outset = set(outlist)
     flagged = []
     for i, token in enumerate(tokens):
-        if i in outlist:
+        if i in outset:
             flagged.append(True)
         else:
             flagged.append(False)
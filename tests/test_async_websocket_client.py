@@ -0,0 +1,140 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import asyncio
+import json
+import unittest
+
+import websockets
+from awe_workbench.web.asyncWebsocketClient import asyncWebsocketClient
+
+# A small server that sends every message back after a short delay,
+# and records the connections made to it, the messages it got and
+# the most messages it was working on at once
+connections = []
+received = []
+in_progress = [0, 0]
+
+
+async def echo(websocket, path=None):
+    connections.append(websocket)
+    try:
+        async for message in websocket:
+            in_progress[0] += 1
+            in_progress[1] = max(in_progress[0], in_progress[1])
+            await asyncio.sleep(0.05)
+            in_progress[0] -= 1
+            messagelist = json.loads(message)
+            received.append(messagelist)
+            if messagelist[0] == 'DROP':
+                # Fails while handling the message
+                await websocket.close()
+                continue
+            await websocket.send(json.dumps(messagelist))
+            if messagelist[0] == 'HANGUP':
+                await websocket.close()
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+class AsyncWebsocketClientTest(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        connections.clear()
+        received.clear()
+        in_progress[1] = 0
+        self.server = await websockets.serve(echo, 'localhost', 8798)
+        self.client = asyncWebsocketClient('ws://localhost:8798',
+                                           max_connections=3)
+
+    async def asyncTearDown(self):
+        await self.client.close()
+        self.server.close()
+        await self.server.wait_closed()
+
+    async def test_send(self):
+        self.assertEqual(await self.client.send(['LEMMAS', 'a']),
+                         ['LEMMAS', 'a'])
+        self.assertEqual(await self.client.sendraw(['LEMMAS', 'b']),
+                         '["LEMMAS", "b"]')
+        self.assertEqual(len(connections), 1)
+
+    async def test_gather(self):
+        messages = [['LEMMAS', str(i)] for i in range(12)]
+        results = await self.client.gather(messages)
+        self.assertEqual(results, messages)
+        # At most max_connections are used, and they are all busy
+        self.assertEqual(len(connections), 3)
+        self.assertEqual(in_progress[1], 3)
+
+    async def test_fan_out(self):
+        results = await self.client.fan_out(['DOCTOKENS', 'LEMMAS'],
+                                            ['essay1', 'essay2'])
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[('LEMMAS', 'essay2')],
+                         ['LEMMAS', 'essay2'])
+
+    async def test_reconnect(self):
+        self.assertEqual(await self.client.send(['HANGUP']), ['HANGUP'])
+        # (by now the server's close has reached the idle connection)
+        await connections[0].wait_closed()
+        await asyncio.sleep(0.05)
+        self.assertEqual(await self.client.send(['LEMMAS', 'a']),
+                         ['LEMMAS', 'a'])
+        self.assertEqual(len(connections), 2)
+
+    async def test_no_retry_after_send(self):
+        # A message the server got is not sent again when the
+        # connection fails before the reply
+        self.assertEqual(await self.client.send(['LEMMAS', 'a']),
+                         ['LEMMAS', 'a'])
+        self.assertEqual(await self.client.send(['DROP']), None)
+        self.assertEqual(received.count(['DROP']), 1)
+        self.assertEqual(len(connections), 1)
+
+    async def test_closed_connections_are_not_reused(self):
+        self.assertEqual(await self.client.send(['HANGUP']), ['HANGUP'])
+        closed = self.client.idle[-1] if len(self.client.idle) > 0 \
+            else None
+        await connections[0].wait_closed()
+        await asyncio.sleep(0.05)
+        ws, reused = await self.client.acquire()
+        self.assertIsNot(ws, closed)
+        await self.client.release(ws)
+        self.assertEqual(len(connections), 2)
+
+    async def test_set_uri(self):
+        other = await websockets.serve(echo, 'localhost', 8799)
+        try:
+            self.assertEqual(await self.client.send(['LEMMAS', 'a']),
+                             ['LEMMAS', 'a'])
+            # The connection to the old server is closed, not reused
+            self.client.set_uri('ws://localhost:8799')
+            await asyncio.wait_for(connections[0].wait_closed(), 1)
+            self.assertEqual(await self.client.send(['LEMMAS', 'b']),
+                             ['LEMMAS', 'b'])
+            self.assertEqual(len(connections), 2)
+            self.assertEqual(len(self.client.idle), 1)
+        finally:
+            await self.client.close()
+            other.close()
+            await other.wait_closed()
+
+
+class AsyncWebsocketClientLoopTest(unittest.TestCase):
+
+    def test_new_event_loop(self):
+        # A client made outside any event loop can be used in one,
+        # and then in another
+        client = asyncWebsocketClient('ws://localhost:8798')
+
+        async def run():
+            server = await websockets.serve(echo, 'localhost', 8798)
+            try:
+                return await client.send(['LEMMAS', 'a'])
+            finally:
+                server.close()
+                await server.wait_closed()
+
+        self.assertEqual(asyncio.run(run()), ['LEMMAS', 'a'])
+        self.assertEqual(asyncio.run(run()), ['LEMMAS', 'a'])
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import os
+import tempfile
+import time
+import holmes_extractor.manager as holmes
+import unittest
+from awe_workbench.web.documentRegistry import documentRegistry
+from awe_workbench.web.documentShards import shardWriter
+
+holmes_manager = holmes.Manager(
+    'en_core_web_lg', perform_coreference_resolution=False, number_of_workers=2)
+
+texts = {'lion': 'A lion lay asleep in the forest.',
+         'mouse': 'A timid little mouse came upon him unexpectedly.',
+         'net': 'The lion was caught in the toils of a hunter\'s net.'}
+serialized = {label: holmes_manager.nlp(text).to_bytes()
+              for label, text in texts.items()}
+
+
+class DocumentRegistryTest(unittest.TestCase):
+
+    def tearDown(self):
+        holmes_manager.remove_all_documents()
+
+    def test_spill_and_rehydrate(self):
+        spilled = []
+        spill_dir = tempfile.mkdtemp()
+        registry = documentRegistry(holmes_manager,
+                                    max_documents=2,
+                                    spill_dir=spill_dir,
+                                    on_spill=spilled.append)
+        registry.register({'lion': serialized['lion']})
+        registry.register({'mouse': serialized['mouse']})
+        registry.register({'net': serialized['net']})
+        # The least recently used document went to disk
+        self.assertEqual(spilled, ['lion'])
+        self.assertEqual(registry.labels(), ['lion', 'mouse', 'net'])
+        self.assertEqual(sorted(holmes_manager.list_document_labels()),
+                         ['mouse', 'net'])
+        self.assertEqual(len(os.listdir(spill_dir)), 1)
+        # and comes back when it is used
+        self.assertTrue(registry.touch('lion'))
+        self.assertEqual(holmes_manager.get_document('lion').text,
+                         texts['lion'])
+        self.assertEqual(spilled, ['lion', 'mouse'])
+        self.assertFalse(registry.touch('unknown'))
+        registry.clear()
+        self.assertEqual(len(registry), 0)
+        self.assertEqual(os.listdir(spill_dir), [])
+
+    def test_byte_limit(self):
+        registry = documentRegistry(
+            holmes_manager,
+            max_bytes=len(serialized['lion']) + len(serialized['mouse']))
+        registry.register({'lion': serialized['lion'],
+                           'mouse': serialized['mouse']})
+        registry.register({'net': serialized['net']})
+        memory = registry.memory()
+        self.assertTrue(memory['resident_bytes'] <= memory['max_bytes'])
+        self.assertEqual(memory['documents']['lion']['state'], 'spilled')
+        self.assertEqual(memory['documents']['net']['state'], 'resident')
+        self.assertEqual(memory['documents']['net']['bytes'],
+                         len(serialized['net']))
+        registry.clear()
+        registry.close()
+
+    def test_attached_bytes(self):
+        # Memory the server holds for a document counts towards the
+        # byte limit, and goes when the document is spilled
+        spilled = []
+        registry = documentRegistry(
+            holmes_manager,
+            max_bytes=len(serialized['lion']) + len(serialized['mouse']),
+            on_spill=spilled.append)
+        registry.register({'lion': serialized['lion'],
+                           'mouse': serialized['mouse']})
+        registry.attach('mouse', len(serialized['mouse']))
+        self.assertEqual(spilled, ['lion'])
+        memory = registry.memory()
+        self.assertEqual(memory['attached_bytes'], len(serialized['mouse']))
+        self.assertEqual(memory['documents']['mouse']['attached_bytes'],
+                         len(serialized['mouse']))
+        registry.register({'net': serialized['net']})
+        self.assertEqual(spilled, ['lion', 'mouse'])
+        self.assertEqual(registry.memory()['attached_bytes'], 0)
+        registry.clear()
+        registry.close()
+
+    def test_ttl(self):
+        registry = documentRegistry(holmes_manager, ttl=0.5)
+        registry.register({'lion': serialized['lion']})
+        time.sleep(1)
+        registry.register({'mouse': serialized['mouse']})
+        self.assertEqual(holmes_manager.list_document_labels(), ['mouse'])
+        self.assertEqual(registry.memory()['spilled_documents'], 1)
+        registry.remove('lion')
+        self.assertEqual(registry.labels(), ['mouse'])
+        # Without any use or registration, expire lets go of them
+        time.sleep(1)
+        self.assertEqual(registry.expire(), 1)
+        self.assertEqual(holmes_manager.list_document_labels(), [])
+        self.assertEqual(registry.labels(), ['mouse'])
+        registry.clear()
+        registry.close()
+
+    def test_restore_from_shard(self):
+        path = os.path.join(tempfile.mkdtemp(), 'test.shard')
+        with shardWriter(path) as writer:
+            positions = writer.write_all(serialized.items())
+        registry = documentRegistry(holmes_manager)
+        registry.restore({label: (path, size, offset)
+                          for label, (offset, size) in positions.items()})
+        # Nothing is loaded until it is used
+        self.assertEqual(registry.labels(), ['lion', 'mouse', 'net'])
+        self.assertEqual(holmes_manager.list_document_labels(), [])
+        self.assertEqual(registry.serialized('net'), serialized['net'])
+        self.assertTrue(registry.touch('mouse'))
+        self.assertEqual(holmes_manager.get_document('mouse').text,
+                         texts['mouse'])
+        # and the shard is left alone
+        registry.clear()
+        self.assertTrue(os.path.exists(path))
+        os.remove(path)
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import os
+import tempfile
+import unittest
+
+from awe_workbench.web.documentShards import encode_header, \
+    encode_record, decode_header, decode_records, decode_shard, \
+    shardWriter, read_shard, shard_files, compatible
+
+metadata = {'spacy': '3.4.1',
+            'model': 'en_core_web_lg',
+            'model_version': '3.4.0',
+            'pipeline': ['tok2vec', 'tagger', 'parser']}
+
+
+class DocumentShardsTest(unittest.TestCase):
+
+    def test_round_trip(self):
+        data = encode_header(metadata) \
+            + encode_record('essay1', b'\x00\x01binary') \
+            + encode_record('essay é', b'')
+        decoded, documents = decode_shard(data)
+        self.assertEqual(decoded, metadata)
+        self.assertEqual(documents, {'essay1': b'\x00\x01binary',
+                                     'essay é': b''})
+
+    def test_records_without_header(self):
+        # EXPORT frames after the first hold records only
+        data = encode_record('a', b'1') + encode_record('b', b'22')
+        self.assertEqual([(label, bytes(document))
+                          for label, document in decode_records(data)],
+                         [('a', b'1'), ('b', b'22')])
+
+    def test_bad_data(self):
+        with self.assertRaises(ValueError):
+            decode_header(b'not a shard')
+        data = encode_record('a', b'12345')[:-1]
+        with self.assertRaises(ValueError):
+            list(decode_records(data))
+
+    def test_shard_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'test.shard')
+        with shardWriter(path, metadata) as writer:
+            writer.write('a', b'1')
+            writer.write('b', b'22')
+        self.assertEqual(writer.count, 2)
+        self.assertEqual(read_shard(path),
+                         (metadata, {'a': b'1', 'b': b'22'}))
+        os.remove(path)
+
+    def test_shard_files(self):
+        directory = tempfile.mkdtemp()
+        for name in ['b.shard', 'a.shard', 'manifest.json']:
+            open(os.path.join(directory, name), 'wb').close()
+        self.assertEqual(shard_files(directory),
+                         [os.path.join(directory, 'a.shard'),
+                          os.path.join(directory, 'b.shard')])
+        path = os.path.join(directory, 'a.shard')
+        self.assertEqual(shard_files(path), [path])
+
+    def test_compatible(self):
+        self.assertEqual(compatible(metadata, metadata), [])
+        patched = dict(metadata, spacy='3.4.4', model_version='3.4.1')
+        self.assertEqual(compatible(patched, metadata), [])
+        other = dict(metadata, model='en_core_web_sm',
+                     pipeline=['tok2vec'])
+        self.assertEqual(len(compatible(other, metadata)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import unittest
+
+from awe_workbench.web.infoFormats import format_info, from_columns, \
+    to_columns, expand_intervals, interval_positions, expand_runs
+
+info = {'0': {'value': True, 'offset': 0, 'length': 1, 'text': 'A'},
+        '1': {'value': False, 'offset': 2, 'length': 4, 'text': 'lion'},
+        '10': {'value': None, 'offset': 30, 'length': 1, 'text': '.'},
+        '2': {'value': True, 'offset': 7, 'length': 3, 'text': 'lay'}}
+
+
+class InfoFormatsTest(unittest.TestCase):
+
+    def test_columns(self):
+        columns = to_columns(info)
+        self.assertEqual(columns['index'], [0, 1, 2, 10])
+        self.assertEqual(columns['value'], [True, False, True, None])
+        self.assertEqual(columns['offset'], [0, 2, 7, 30])
+        self.assertEqual(columns['length'], [1, 4, 3, 1])
+        self.assertEqual(columns['text'], ['A', 'lion', 'lay', '.'])
+        self.assertEqual(from_columns(columns), info)
+
+    def test_sparse(self):
+        columns = format_info(info, 'sparse')
+        self.assertEqual(columns['index'], [0, 2])
+        self.assertEqual(columns['offset'], [0, 7])
+        self.assertEqual(from_columns(columns),
+                         {'0': info['0'], '2': info['2']})
+
+    def test_other_results_unchanged(self):
+        self.assertEqual(to_columns([1, 2, 3]), [1, 2, 3])
+        self.assertEqual(to_columns(2.5), 2.5)
+        self.assertEqual(to_columns({'a': 1}), {'a': 1})
+        self.assertEqual(format_info(info, None), info)
+
+    def test_intervals(self):
+        flags = {str(i): {'value': 1 if 3 <= i < 6 or i == 8 else 0,
+                          'offset': i * 5,
+                          'length': 4,
+                          'text': 'word'}
+                 for i in range(10)}
+        result = format_info(flags, 'intervals')
+        self.assertEqual(result['intervals'], [[3, 6], [8, 9]])
+        self.assertEqual(result['offsets'], [[15, 29], [40, 44]])
+        self.assertEqual(expand_intervals(result, 10),
+                         [bool(flags[str(i)]['value']) for i in range(10)])
+        self.assertEqual(interval_positions(result), [3, 4, 5, 8])
+        # Lists of token indices, inside other structures
+        spans = {'explicit_1': [4, 5, 6, 10],
+                 'implicit': {'lion': [1, 2, 2, 3]}}
+        self.assertEqual(format_info(spans, 'intervals'),
+                         {'explicit_1': [[4, 7], [10, 11]],
+                          'implicit': {'lion': [[1, 4]]}})
+        self.assertEqual(format_info([False, True, True], 'intervals'),
+                         [[1, 3]])
+
+    def test_rle(self):
+        result = format_info(info, 'rle')
+        self.assertEqual(result['runs'],
+                         [[True, 1], [False, 1], [True, 1], [None, 8]])
+        self.assertEqual(expand_runs(result)[:3], [True, False, True])
+        self.assertEqual(format_info([0, 0, 1, True, 1], 'rle'),
+                         {'runs': [[0, 2], [1, 1], [True, 1], [1, 1]]})
+        self.assertEqual(expand_runs(format_info([0, 0, 1], 'rle')),
+                         [0, 0, 1])
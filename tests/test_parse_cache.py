@@ -0,0 +1,58 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import unittest
+
+from awe_workbench.web.parseCache import parseCache, text_key, \
+    paragraph_key
+
+
+class ParseCacheTest(unittest.TestCase):
+
+    def test_text_key(self):
+        self.assertEqual(text_key('A lion lay asleep.'),
+                         text_key('A lion lay asleep.'))
+        self.assertNotEqual(text_key('A lion lay asleep.'),
+                            text_key('A lion lay asleep. '))
+
+    def test_profile_key(self):
+        self.assertEqual(text_key('A lion lay asleep.', 'full'),
+                         text_key('A lion lay asleep.'))
+        self.assertNotEqual(text_key('A lion lay asleep.', 'lexical-only'),
+                            text_key('A lion lay asleep.'))
+        # A text that starts with a profile name is not taken for a
+        # text parsed with that profile
+        self.assertNotEqual(text_key('lexical-only\nA lion lay asleep.'),
+                            text_key('A lion lay asleep.', 'lexical-only'))
+        self.assertNotEqual(text_key('lexical-only:A lion lay asleep.'),
+                            text_key('A lion lay asleep.', 'lexical-only'))
+
+    def test_paragraph_key(self):
+        # A document put together from paragraphs does not stand for
+        # the full parse of the same text
+        self.assertNotEqual(paragraph_key('A lion lay asleep.'),
+                            text_key('A lion lay asleep.'))
+        self.assertEqual(paragraph_key('A lion lay asleep.', 'no-coref'),
+                         paragraph_key('A lion lay asleep.', 'no-coref'))
+
+    def test_get_and_put(self):
+        cache = parseCache()
+        key = text_key('A lion lay asleep.')
+        self.assertEqual(cache.get(key), None)
+        cache.put(key, b'serialized')
+        self.assertEqual(cache.get(key), b'serialized')
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['bytes'], len(b'serialized'))
+
+    def test_lru_eviction(self):
+        cache = parseCache(max_bytes=10)
+        cache.put('a', b'1234')
+        cache.put('b', b'1234')
+        cache.get('a')
+        cache.put('c', b'1234')
+        self.assertEqual(cache.get('b'), None)
+        self.assertEqual(cache.get('a'), b'1234')
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['bytes'], 8)
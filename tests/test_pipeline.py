@@ -0,0 +1,46 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import unittest
+from awe_workbench.pipeline import pipeline_profiles, disabled_components, \
+    deferred_components, indicator_components
+
+pipe_names = ['tok2vec', 'tagger', 'parser', 'attribute_ruler',
+              'lemmatizer', 'ner', 'coreferee', 'holmes', 'spacytextblob',
+              'lexicalfeatures', 'syntaxdiscoursefeatures',
+              'viewpointfeatures', 'lexicalclusters', 'contentsegmentation']
+
+
+class PipelineProfileTest(unittest.TestCase):
+
+    def test_profiles(self):
+        self.assertEqual(disabled_components('full', pipe_names), [])
+        for profile in pipeline_profiles:
+            disabled = disabled_components(profile, pipe_names)
+            # holmes reads coreferee's chains, so it goes with it
+            self.assertEqual('coreferee' in disabled, 'holmes' in disabled)
+            for name in pipeline_profiles[profile]:
+                self.assertIn(name, disabled)
+
+    def test_missing_components(self):
+        # Components the pipeline does not have are not disabled
+        self.assertEqual(disabled_components('no-coref', ['tagger']), [])
+        self.assertEqual(disabled_components('no-coref',
+                                             ['coreferee', 'holmes']),
+                         ['coreferee', 'holmes'])
+
+    def test_indicator_components(self):
+        # Only deferred components are ever waited for, and they are
+        # run in pipeline order
+        for indicator, components in indicator_components.items():
+            self.assertEqual(components,
+                             [name for name in deferred_components
+                              if name in components])
+
+    def test_unknown_profile(self):
+        with self.assertRaises(ValueError):
+            disabled_components('no-such-profile', pipe_names)
+
+
+if __name__ == '__main__':
+    unittest.main()
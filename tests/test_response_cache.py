@@ -0,0 +1,56 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import unittest
+
+from awe_workbench.web.responseCache import responseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = responseCache()
+        key = ('essay', 1, 'DOCTOKENS', '[]')
+        self.assertEqual(cache.get(key), None)
+        cache.put(key, '["A", "lion"]')
+        self.assertEqual(cache.get(key), '["A", "lion"]')
+        stats = cache.stats()
+        self.assertEqual(stats['hits'], 1)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['entries'], 1)
+        self.assertEqual(stats['bytes'], len('["A", "lion"]'))
+
+    def test_versions_are_separate(self):
+        cache = responseCache()
+        cache.put(('essay', 1, 'DOCTOKENS', '[]'), '["old"]')
+        self.assertEqual(cache.get(('essay', 2, 'DOCTOKENS', '[]')), None)
+
+    def test_invalidate(self):
+        cache = responseCache()
+        cache.put(('essay', 1, 'DOCTOKENS', '[]'), '["A"]')
+        cache.put(('essay', 1, 'LEMMAS', '[]'), '["a"]')
+        cache.put(('other', 1, 'DOCTOKENS', '[]'), '["B"]')
+        cache.invalidate('essay')
+        self.assertEqual(cache.get(('essay', 1, 'DOCTOKENS', '[]')), None)
+        self.assertEqual(cache.get(('essay', 1, 'LEMMAS', '[]')), None)
+        self.assertEqual(cache.get(('other', 1, 'DOCTOKENS', '[]')), '["B"]')
+        self.assertEqual(cache.stats()['bytes'], len('["B"]'))
+        cache.clear()
+        self.assertEqual(cache.stats()['entries'], 0)
+        self.assertEqual(cache.stats()['bytes'], 0)
+
+    def test_lru_eviction(self):
+        cache = responseCache(max_bytes=10)
+        cache.put(('a', 1, 'X', '[]'), '1234')
+        cache.put(('b', 1, 'X', '[]'), '1234')
+        # Using a makes b the least recently used entry
+        cache.get(('a', 1, 'X', '[]'))
+        cache.put(('c', 1, 'X', '[]'), '1234')
+        self.assertEqual(cache.get(('b', 1, 'X', '[]')), None)
+        self.assertEqual(cache.get(('a', 1, 'X', '[]')), '1234')
+        self.assertEqual(cache.get(('c', 1, 'X', '[]')), '1234')
+        self.assertEqual(cache.stats()['evictions'], 1)
+        self.assertEqual(cache.stats()['bytes'], 8)
+        # Replies bigger than the whole cache are not kept
+        cache.put(('d', 1, 'X', '[]'), '12345678901')
+        self.assertEqual(cache.get(('d', 1, 'X', '[]')), None)
@@ -3,6 +3,7 @@
 
 import pickle
 import base64
+import json
 import math
 import time
 import os
@@ -10,6 +11,7 @@ import sys
 import pandas as pd
 import pandas.testing as pd_testing
 import random
+import tempfile
 import threading
 import unittest
 from multiprocessing import Process, Queue
@@ -17,7 +19,14 @@ from multiprocessing import Process, Queue
 import awe_languagetool.languagetoolServer
 import awe_spellcorrect.spellcorrectServer
 import awe_workbench.web.parserServer
-from awe_workbench.web.websocketClient import websocketClient
+from awe_workbench.web.websocketClient import websocketClient, \
+    send_enveloped, send_message, receive
+from awe_workbench.web.wireCodec import decode_message
+from awe_workbench.web.documentShards import read_shard, shardSuffix
+from awe_workbench.web.serverStatus import wait_for_services
+from awe_workbench.pipeline import pipeline_profiles
+from awe_workbench.web.infoFormats import from_columns, \
+    interval_positions, expand_runs
 from awe_languagetool.languagetoolClient import languagetoolClient
 
 
@@ -29,9 +38,16 @@ def startServers():
     p2 = Process(target=awe_spellcorrect.spellcorrectServer.spellcorrectServer, args=())
     p2.start()
 
-    p3 = Process(target=awe_workbench.web.parserServer.parserServer, args=())
+    ready_file = os.path.join(tempfile.mkdtemp(), 'parser.ready')
+    p3 = Process(target=awe_workbench.web.parserServer.parserServer,
+                 args=(),
+                 kwargs={'ready_file': ready_file,
+                         'max_upload_bytes': 2 ** 20})
     p3.start()
-    time.sleep(60)
+    wait_for_services(ready_file=ready_file,
+                      processes={'languagetool': p1,
+                                 'spellcorrect': p2,
+                                 'parser': p3})
     return p1, p2, p3
 
 
@@ -129,6 +145,21 @@ class ServerAPITest(unittest.TestCase):
         ok = self.parser.send(['CLEARPARSED'])
         self.assertEqual(ok, True)
 
+    def test_parseset_batched(self):
+        ok = self.parser.send(['PARSESET',
+                               [labels, texts],
+                               {'workers': 2, 'batch_size': 1}])
+        self.assertEqual(ok, True)
+        labels2 = self.parser.send(['LABELS'])
+        self.assertEqual(sorted(labels), sorted(labels2))
+        # Parsing the same labels again replaces the documents
+        ok = self.parser.send(['PARSESET', [labels, texts]])
+        self.assertEqual(ok, True)
+        labels2 = self.parser.send(['LABELS'])
+        self.assertEqual(sorted(labels), sorted(labels2))
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
     def test_parseone(self):
         ok = self.parser.send(['PARSEONE', labels[0], texts[0]])
         print('parsed', ok)
@@ -136,6 +167,518 @@ class ServerAPITest(unittest.TestCase):
         ok = self.parser.send(['REMOVE', labels[0]])
         self.assertEqual(ok, True)
 
+    def test_parse_does_not_block(self):
+        # A cheap command on another connection should come back
+        # while a long document is still being parsed
+        results = {}
+
+        def parse():
+            results['parsed'] = self.parser.send(
+                ['PARSEONE', labels[0], texts[0] * 4])
+            results['parse_done'] = time.time()
+
+        thread = threading.Thread(target=parse)
+        thread.start()
+        time.sleep(0.5)
+        data = self.parser.send(['DOCSUMMARYLABELS'])
+        labels_done = time.time()
+        thread.join()
+        self.assertEqual(results['parsed'], True)
+        self.assertTrue(len(data) > 0)
+        self.assertTrue(labels_done < results['parse_done'])
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_concurrent_parseone(self):
+        # Submissions that arrive together are parsed as one batch,
+        # but each one still gets registered under its own label
+        results = {}
+
+        def parse(i):
+            results[labels[i]] = self.parser.send(
+                ['PARSEONE', labels[i], texts[i]])
+
+        threads = [threading.Thread(target=parse, args=(i,))
+                   for i in range(len(labels))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for label in labels:
+            self.assertEqual(results[label], True)
+        self.assertEqual(sorted(self.parser.send(['LABELS'])),
+                         sorted(labels))
+        tokens = self.parser.send(['DOCTOKENS', labels[0]])
+        with open("pickles/doctokens.pkl", "rb") as fp:
+            comparison = pickle.load(fp)
+            fp.close()
+        self.assertEqual(tokens, comparison)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_response_cache(self):
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2]])
+        self.assertEqual(ok, True)
+        before = self.parser.send(['CACHESTATS'])
+        first = self.parser.send(['DOCTOKENS', labels[2]])
+        second = self.parser.send(['DOCTOKENS', labels[2]])
+        self.assertEqual(first, second)
+        stats = self.parser.send(['CACHESTATS'])
+        self.assertEqual(stats['misses'], before['misses'] + 1)
+        self.assertEqual(stats['hits'], before['hits'] + 1)
+        # Registering a new document under the label
+        # drops the old replies
+        ok = self.parser.send(['PARSEONE', labels[2], texts[1]])
+        self.assertEqual(ok, True)
+        tokens = self.parser.send(['DOCTOKENS', labels[2]])
+        self.assertNotEqual(tokens, first)
+        stats2 = self.parser.send(['CACHESTATS'])
+        self.assertEqual(stats2['misses'], stats['misses'] + 1)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+        self.assertEqual(self.parser.send(['CACHESTATS'])['entries'], 0)
+
+    def test_parse_cache(self):
+        result = self.parser.send(['PARSEONE', 'first', texts[2],
+                                   {'details': True}])
+        self.assertEqual(result['ok'], True)
+        # The same text under another label comes from the cache
+        result = self.parser.send(['PARSEONE', 'second', texts[2],
+                                   {'details': True}])
+        self.assertEqual(result, {'ok': True, 'cache': 'hit'})
+        self.assertEqual(self.parser.send(['DOCTOKENS', 'first']),
+                         self.parser.send(['DOCTOKENS', 'second']))
+        # and sending it again under the same label changes nothing
+        result = self.parser.send(['PARSEONE', 'second', texts[2],
+                                   {'details': True}])
+        self.assertEqual(result, {'ok': True, 'cache': 'unchanged'})
+        result = self.parser.send(['PARSESET',
+                                   [['first', 'third'], [texts[2], texts[2]]],
+                                   {'details': True}])
+        self.assertEqual(result['cache'],
+                         {'unchanged': 1, 'hit': 1, 'miss': 0})
+        stats = self.parser.send(['PARSECACHESTATS'])
+        self.assertTrue(stats['hits'] >= 2)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_memory(self):
+        ok = self.parser.send(['PARSESET', [labels, texts]])
+        self.assertEqual(ok, True)
+        memory = self.parser.send(['MEMORY'])
+        self.assertEqual(sorted(memory['documents']), sorted(labels))
+        self.assertEqual(memory['resident_documents'], len(labels))
+        self.assertEqual(memory['resident_bytes'],
+                         sum(memory['documents'][label]['bytes']
+                             for label in labels))
+        # A document that has been queried has a column store, which
+        # is counted as well
+        self.parser.send(['AWE_INFO', labels[0], 'nSyll'])
+        self.parser.send(['DOCTOKENS', labels[0]])
+        memory = self.parser.send(['MEMORY'])
+        document = memory['documents'][labels[0]]
+        self.assertEqual(document['columns'], True)
+        self.assertTrue(document['attached_bytes'] >= document['bytes'])
+        self.assertEqual(memory['attached_bytes'],
+                         sum(memory['documents'][label]['attached_bytes']
+                             for label in labels))
+        status = self.parser.send(['STATUS'])
+        self.assertEqual(status['memory']['column_stores'],
+                         memory['attached_bytes'])
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+        self.assertEqual(self.parser.send(['MEMORY'])['documents'], {})
+
+    def test_request_envelope(self):
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2]])
+        self.assertEqual(ok, True)
+        messages = [['DOCTOKENS', labels[2]],
+                    ['LEMMAS', labels[2]],
+                    ['DOCSUMMARYLABELS'],
+                    ['PARSEONE', labels[1], texts[1]],
+                    ['NOSUCHCOMMAND']]
+        results = self.parser.send_many(messages)
+        self.assertEqual(results[0],
+                         self.parser.send(['DOCTOKENS', labels[2]]))
+        self.assertEqual(results[1],
+                         self.parser.send(['LEMMAS', labels[2]]))
+        self.assertEqual(results[2],
+                         self.parser.send(['DOCSUMMARYLABELS']))
+        self.assertEqual(results[3], True)
+        # Unknown commands get False back, as they do without
+        # the envelope
+        self.assertEqual(results[4], False)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_multi(self):
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2]])
+        self.assertEqual(ok, True)
+        result = self.parser.send(
+            ['MULTI', labels[2],
+             {'tokens': 'DOCTOKENS',
+              'syllables': ['AWE_INFO', 'nSyll', 'Token', 'mean'],
+              'parse': ['PARSEONE', 'text']}])
+        self.assertEqual(result['results']['tokens'],
+                         self.parser.send(['DOCTOKENS', labels[2]]))
+        self.assertEqual(
+            result['results']['syllables'],
+            self.parser.send(['AWE_INFO', labels[2],
+                              'nSyll', 'Token', 'mean']))
+        # Only read-only commands can be run this way
+        self.assertEqual(list(result['errors']), ['parse'])
+        result = self.parser.send(['MULTI', labels[2],
+                                   ['LEMMAS', 'POS']])
+        self.assertEqual(sorted(result['results']), ['LEMMAS', 'POS'])
+        self.assertEqual(result['errors'], {})
+        result = self.parser.send(['MULTI', 'nothing', ['LEMMAS']])
+        self.assertEqual(list(result['errors']), ['MULTI'])
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_msgpack_codec(self):
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2]])
+        self.assertEqual(ok, True)
+        client = websocketClient(codec='msgpack')
+        client.set_uri("ws://localhost:8766")
+        self.assertEqual(client.send(['DOCTOKENS', labels[2]]),
+                         self.parser.send(['DOCTOKENS', labels[2]]))
+        # LATINATES is JSON text inside JSON; msgpack clients get the
+        # decoded value
+        self.assertEqual(
+            client.send(['LATINATES', labels[2]]),
+            json.loads(self.parser.send(['LATINATES', labels[2]])))
+        client.close()
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_columnar_formats(self):
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2]])
+        self.assertEqual(ok, True)
+        info = json.loads(self.parser.send(['LATINATES', labels[2]]))
+        columns = self.parser.send(['LATINATES', labels[2],
+                                    {'format': 'columns'}])
+        self.assertEqual(from_columns(columns), info)
+        sparse = self.parser.send(['LATINATES', labels[2],
+                                   {'format': 'sparse'}])
+        self.assertEqual(from_columns(sparse),
+                         {key: entry for key, entry in info.items()
+                          if entry['value'] not in [None, False]})
+        # AWE_INFO sends the AWE_Info JSON as it is
+        info = self.parser.send(['AWE_INFO', labels[2], 'nSyll'])
+        columns = self.parser.send(['AWE_INFO', labels[2], 'nSyll',
+                                    {'format': 'columns'}])
+        self.assertEqual(from_columns(columns), info)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_interval_formats(self):
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2]])
+        self.assertEqual(ok, True)
+        info = json.loads(self.parser.send(['QUOTEDTEXT', labels[2]]))
+        intervals = self.parser.send(['QUOTEDTEXT', labels[2],
+                                      {'format': 'intervals'}])
+        self.assertEqual(
+            interval_positions(intervals),
+            sorted(int(key) for key, entry in info.items()
+                   if entry['value']))
+        runs = self.parser.send(['QUOTEDTEXT', labels[2],
+                                 {'format': 'rle'}])
+        self.assertEqual(len(expand_runs(runs)),
+                         max(int(key) for key in info) + 1)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_pipeline_profiles(self):
+        result = self.parser.send(['PARSEONE', labels[2], texts[2],
+                                   {'profile': 'lexical-only',
+                                    'details': True}])
+        self.assertEqual(result, {'ok': True, 'cache': 'miss'})
+        syllables = self.parser.send(['SYLLABLES', labels[2]])
+        self.assertTrue(len(syllables) > 0)
+        # The same text with the full pipeline is a different document
+        result = self.parser.send(['PARSEONE', labels[2], texts[2],
+                                   {'details': True}])
+        self.assertEqual(result['cache'], 'miss')
+        self.assertEqual(self.parser.send(['SYLLABLES', labels[2]]),
+                         syllables)
+        result = self.parser.send(['PARSESET', [labels[:2], texts[:2]],
+                                   {'profile': 'no-coref',
+                                    'details': True}])
+        self.assertEqual(result['cache']['miss'], 2)
+        result = self.parser.send(['PARSEONE', labels[2], texts[2],
+                                   {'profile': 'no-such-profile'}])
+        self.assertEqual(result['ok'], False)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_every_profile(self):
+        # Every profile gives a document that can be registered and
+        # queried
+        for profile in pipeline_profiles:
+            label = 'profile-' + profile
+            result = self.parser.send(['PARSEONE', label, texts[2],
+                                       {'profile': profile,
+                                        'details': True}])
+            self.assertEqual(result['ok'], True, profile)
+            self.assertTrue(len(self.parser.send(['DOCTOKENS', label])) > 0,
+                            profile)
+            self.assertTrue(len(self.parser.send(['SYLLABLES', label])) > 0,
+                            profile)
+        self.assertEqual(sorted(self.parser.send(['LABELS'])),
+                         sorted('profile-' + profile
+                                for profile in pipeline_profiles))
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_status(self):
+        self.assertEqual(self.parser.send(['PING']), True)
+        status = self.parser.send(['STATUS'])
+        self.assertEqual(status['state'], 'ready')
+        self.assertEqual(status['components']['holmes'], 'loaded')
+        self.assertEqual(status['components']['parse_pool'], 'loaded')
+        self.assertTrue(status['load_seconds']['holmes'] > 0)
+        self.assertEqual(status['queue']['requests'], 1)
+        self.assertTrue(status['memory']['rss'] > 0)
+        # Nothing is deferred unless the server is asked to
+        self.assertEqual(status['deferred_components'], [])
+        self.assertEqual(status['pending_documents'], 0)
+        ok = self.parser.send(['PARSEONE', labels[0], texts[0]])
+        self.assertEqual(ok, True)
+        self.assertEqual(self.parser.send(['STATUS'])['documents'], 1)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_parse_delta(self):
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2]])
+        self.assertEqual(ok, True)
+        # Change 'timid' to 'brave' in the first paragraph
+        offset = texts[2].index('timid')
+        result = self.parser.send(['PARSEDELTA', labels[2], offset, 5,
+                                   'brave', {'details': True}])
+        self.assertEqual(result, {'ok': True,
+                                  'paragraphs': 5,
+                                  'reparsed': 1})
+        tokens = str(self.parser.send(['DOCTOKENS', labels[2]]))
+        self.assertIn('brave', tokens)
+        self.assertNotIn('timid', tokens)
+        edited = texts[2][:offset] + 'brave' + texts[2][offset + 5:]
+        # Sending the edited text whole parses it in full, since the
+        # spliced document is only an approximation of that parse
+        result = self.parser.send(['PARSEONE', labels[2], edited,
+                                   {'details': True}])
+        self.assertEqual(result['cache'], 'miss')
+        result = self.parser.send(['PARSEONE', labels[2], edited,
+                                   {'details': True}])
+        self.assertEqual(result['cache'], 'unchanged')
+        result = self.parser.send(['PARSEDELTA', labels[2],
+                                   len(edited) + 1, 0, 'x'])
+        self.assertEqual(result['ok'], False)
+        result = self.parser.send(['PARSEDELTA', 'unknown', 0, 0, 'x'])
+        self.assertEqual(result['ok'], False)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_parse_delta_profile(self):
+        # An edit keeps the profile the document was parsed with
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2],
+                               {'profile': 'lexical-only'}])
+        self.assertEqual(ok, True)
+        offset = texts[2].index('timid')
+        ok = self.parser.send(['PARSEDELTA', labels[2], offset, 5,
+                               'brave'])
+        self.assertEqual(ok, True)
+        metadata, documents = read_shard(self.export_shard([labels[2]]))
+        self.assertEqual(metadata['profiles'],
+                         {labels[2]: 'lexical-only'})
+        # A document removed while it is being edited stays removed
+        results = self.parser.send_many(
+            [['PARSEDELTA', labels[2], offset, 5, 'timid'],
+             ['REMOVE', labels[2]]])
+        self.assertEqual(results[1], True)
+        self.assertNotIn(labels[2], self.parser.send(['LABELS']))
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def export_shard(self, labels):
+        path = os.path.join(tempfile.mkdtemp(), 'export' + shardSuffix)
+        self.parser.export(labels, path=path)
+        return path
+
+    def test_upload(self):
+        # A text sent in chunks is the same document as one sent whole
+        ok = self.parser.send(['PARSEONE', labels[0], texts[0]])
+        self.assertEqual(ok, True)
+        whole = self.parser.send(['DOCTOKENS', labels[0]])
+        result = self.parser.upload(labels[1], texts[0],
+                                    {'details': True}, chunk_size=500)
+        self.assertEqual(result, {'ok': True, 'cache': 'hit'})
+        self.assertEqual(self.parser.send(['DOCTOKENS', labels[1]]), whole)
+        result = self.parser.upload(labels[2], texts[2], chunk_size=100)
+        self.assertEqual(result, True)
+        self.assertTrue(len(self.parser.send(['DOCTOKENS', labels[2]])) > 0)
+        # Chunks that arrive out of order are put back in order
+        whole = self.parser.send(['DOCTOKENS', labels[2]])
+
+        def reversed_chunks(ws):
+            chunks = [texts[2][:100], texts[2][100:]]
+            send_enveloped(ws, [['BEGINTEXT', 'reversed']])
+            send_enveloped(ws, [['APPENDTEXT', 'reversed', 1, chunks[1]],
+                                ['APPENDTEXT', 'reversed', 0, chunks[0]]])
+            return send_enveloped(ws, [['COMMITTEXT', 'reversed',
+                                        {'chunks': 2}]])[0]
+
+        self.assertEqual(self.parser.call(reversed_chunks), True)
+        self.assertEqual(self.parser.send(['DOCTOKENS', 'reversed']), whole)
+
+        # A commit with a chunk missing fails
+        def missing_chunk(ws):
+            send_enveloped(ws, [['BEGINTEXT', 'missing']])
+            send_enveloped(ws, [['APPENDTEXT', 'missing', 1, 'x']])
+            return send_enveloped(ws, [['COMMITTEXT', 'missing']])[0]
+
+        self.assertEqual(self.parser.call(missing_chunk)['ok'], False)
+        # Appending to an upload that was never begun fails
+        results = self.parser.send_many([['APPENDTEXT', 'unknown', 0, 'x'],
+                                         ['COMMITTEXT', 'unknown']])
+        self.assertEqual([result['ok'] for result in results],
+                         [False, False])
+        # as does one that is over the per-connection limit
+        result = self.parser.upload('big', 'x' * (2 ** 20 + 1))
+        self.assertEqual(result['ok'], False)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_partial_text(self):
+        # PARTIALTEXT and the PARSEONE that finishes the text are
+        # plain messages on one connection, so they are handled in
+        # the order they were sent
+        def partial_text(ws):
+            protocol = ws.getsubprotocol()
+            results = []
+            for message in [['PARTIALTEXT', labels[2], texts[2][:100]],
+                            ['PARSEONE', labels[2], texts[2][100:],
+                             {'details': True}]]:
+                send_message(ws, message, protocol)
+                results.append(decode_message(receive(ws), protocol))
+            return results
+
+        results = self.parser.call(partial_text)
+        self.assertEqual(results[0], True)
+        self.assertEqual(results[1], {'ok': True, 'cache': 'miss'})
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_export(self):
+        ok = self.parser.send(['PARSESET', [labels[:2], texts[:2]]])
+        self.assertEqual(ok, True)
+        serialized = self.parser.serialized(labels[0])
+        self.assertTrue(isinstance(serialized, bytes))
+        base64ed = self.parser.sendraw(['SERIALIZED', labels[0],
+                                        {'encoding': 'base64'}])
+        self.assertEqual(base64.b64decode(base64ed), serialized)
+        documents = self.parser.export()
+        self.assertEqual(sorted(documents), sorted(labels[:2]))
+        self.assertEqual(documents[labels[0]], serialized)
+        documents = self.parser.export([labels[1], 'no such label'])
+        self.assertEqual(list(documents), [labels[1]])
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+    def test_import(self):
+        ok = self.parser.send(['PARSESET', [labels[:2], texts[:2]]])
+        self.assertEqual(ok, True)
+        path = os.path.join(tempfile.mkdtemp(), 'test.shard')
+        self.assertEqual(self.parser.export(path=path), 2)
+        exported = self.parser.export()
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+        # From a shard file on the server
+        result = self.parser.send(['IMPORT', path])
+        self.assertEqual(result, {'imported': 2, 'errors': {}})
+        self.assertEqual(self.parser.send(['LABELS']), sorted(labels[:2]))
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+        # In binary frames
+        metadata, documents = read_shard(path)
+        self.assertEqual(documents, exported)
+        self.assertEqual(self.parser.import_documents(documents, metadata),
+                         2)
+        self.assertEqual(self.parser.send(['LABELS']), sorted(labels[:2]))
+
+        # Documents from another pipeline are refused
+        other = dict(metadata, pipeline=[])
+        self.assertEqual(self.parser.import_documents(documents, other),
+                         None)
+        # as are documents parsed with a profile we do not know
+        other = dict(metadata, profile='unknown')
+        self.assertEqual(self.parser.import_documents(documents, other),
+                         None)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
+        # The profile in the header (as corpus_parse.py writes it) is
+        # kept, and given again when the documents are exported
+        lexical = dict(metadata, profile='lexical-only')
+        self.assertEqual(self.parser.import_documents(documents, lexical),
+                         2)
+        self.parser.export(path=path)
+        metadata, documents = read_shard(path)
+        self.assertEqual(metadata['profiles'],
+                         {label: 'lexical-only' for label in labels[:2]})
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+        os.remove(path)
+
+    def test_snapshot(self):
+        ok = self.parser.send(['PARSESET', [labels[:2], texts[:2]]])
+        self.assertEqual(ok, True)
+        ok = self.parser.send(['NEWSEARCHPHRASE', 'A lion lies', 'lion'])
+        exported = self.parser.export()
+        directory = tempfile.mkdtemp()
+        # A shard kept in the same directory that is not a snapshot
+        other = os.path.join(directory, 'imported' + shardSuffix)
+        self.parser.export(path=other)
+        result = self.parser.send(['SNAPSHOT', directory])
+        self.assertEqual(result['documents'], 2)
+        self.assertEqual(result['search_phrases'], 1)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+        ok = self.parser.send(['CLEARSEARCHES'])
+        self.assertEqual(ok, True)
+
+        for lazy in [True, False]:
+            result = self.parser.send(['RESTORE', directory,
+                                       {'lazy': lazy}])
+            self.assertEqual(result, {'restored': 2, 'search_phrases': 1})
+            self.assertEqual(self.parser.send(['LABELS']),
+                             sorted(labels[:2]))
+            self.assertEqual(self.parser.export(), exported)
+            self.assertEqual(self.parser.send(['SHOWSEARCHLABELS']),
+                             ['A lion lies'])
+            # The same text is known not to need parsing again
+            ok = self.parser.send(['PARSEONE', labels[0], texts[0],
+                                   {'details': True}])
+            self.assertEqual(ok['cache'], 'unchanged')
+            ok = self.parser.send(['CLEARPARSED'])
+            self.assertEqual(ok, True)
+
+        # A new snapshot replaces the old one's shard, and nothing else
+        ok = self.parser.send(['PARSEONE', labels[2], texts[2]])
+        self.assertEqual(ok, True)
+        result = self.parser.send(['SNAPSHOT', directory])
+        self.assertEqual(result['documents'], 1)
+        shards = sorted(os.listdir(directory))
+        self.assertEqual(len(shards), 3)
+        self.assertIn('imported' + shardSuffix, shards)
+        self.assertIn('snapshot.json', shards)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+        ok = self.parser.send(['CLEARSEARCHES'])
+        self.assertEqual(ok, True)
+
     def testDocTokens(self):
         ok = self.parser.send(['PARSEONE', labels[0], texts[0]])
         self.assertEqual(ok, True)
@@ -259,6 +802,27 @@ class ServerAPITest(unittest.TestCase):
         ok = self.parser.send(['CLEARPARSED'])
         self.assertEqual(ok, True)
 
+    def test_profile_matching(self):
+        # Documents parsed without holmes are left out of Holmes
+        # matching
+        ok = self.parser.send(['PARSEONE', 'full', texts[2]])
+        self.assertEqual(ok, True)
+        ok = self.parser.send(['PARSEONE', 'lexical', texts[2],
+                               {'profile': 'lexical-only'}])
+        self.assertEqual(ok, True)
+        matches = self.parser.send(['TOPIC_MATCHES',
+                                    'A mouse helps a lion.'])
+        documents = set(match['document_label'] for match in matches)
+        self.assertEqual(documents, {'full'})
+        self.parser.send(['NEWSEARCHPHRASE', 'A lion sleeps', 'lion'])
+        matches = self.parser.send(['MATCH_DOCUMENTS'])
+        self.assertNotIn('lexical',
+                         [match['document'] for match in matches])
+        ok = self.parser.send(['CLEARSEARCHES'])
+        self.assertEqual(ok, True)
+        ok = self.parser.send(['CLEARPARSED'])
+        self.assertEqual(ok, True)
+
     def testLemmas(self):
         ok = self.parser.send(['PARSEONE', labels[0], texts[0]])
         self.assertEqual(ok, True)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import os
+import socket
+import tempfile
+import unittest
+from multiprocessing import Process
+
+from awe_workbench.web.serverStatus import port_open, process_memory, \
+    write_status, read_status, wait_for_services
+
+
+def exit_at_once():
+    pass
+
+
+class ServerStatusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.listener = socket.socket()
+        self.listener.bind(('localhost', 0))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+
+    def tearDown(self):
+        self.listener.close()
+
+    def test_port_open(self):
+        self.assertTrue(port_open(self.port))
+        self.listener.close()
+        self.assertFalse(port_open(self.port))
+
+    def test_status_file(self):
+        path = os.path.join(tempfile.mkdtemp(), 'parser.ready')
+        self.assertEqual(read_status(path), None)
+        write_status(path, {'state': 'loading'})
+        self.assertEqual(read_status(path), {'state': 'loading'})
+        self.assertEqual(os.listdir(os.path.dirname(path)),
+                         ['parser.ready'])
+
+    def test_process_memory(self):
+        memory = process_memory()
+        self.assertTrue(memory['max_rss'] > 0)
+
+    def test_wait_for_services(self):
+        path = os.path.join(tempfile.mkdtemp(), 'parser.ready')
+        write_status(path, {'state': 'ready', 'pid': os.getpid()})
+        ready = wait_for_services({'spellcorrect': self.port,
+                                   'parser': None},
+                                  ready_file=path)
+        self.assertEqual(sorted(ready), ['parser', 'spellcorrect'])
+
+    def test_wait_for_loading_parser(self):
+        path = os.path.join(tempfile.mkdtemp(), 'parser.ready')
+        write_status(path, {'state': 'loading', 'pid': os.getpid()})
+        with self.assertRaises(TimeoutError):
+            wait_for_services({'parser': None},
+                              ready_file=path,
+                              timeout=0.2,
+                              interval=0.1)
+
+    def test_wait_for_dead_service(self):
+        process = Process(target=exit_at_once)
+        process.start()
+        process.join()
+        self.listener.close()
+        with self.assertRaises(RuntimeError):
+            wait_for_services({'spellcorrect': self.port},
+                              processes={'spellcorrect': process},
+                              timeout=5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import subprocess
+import sys
+import unittest
+
+
+class StartServersTest(unittest.TestCase):
+
+    def test_launcher_imports_no_servers(self):
+        # The servers' modules are only imported in their own
+        # processes, so the launcher stays small
+        script = 'import sys, awe_workbench.web.startServers\n' \
+                 'print(" ".join(sorted(sys.modules)))'
+        modules = subprocess.run([sys.executable, '-c', script],
+                                 capture_output=True,
+                                 text=True,
+                                 check=True).stdout.split()
+        for heavy in ['spacy',
+                      'holmes_extractor',
+                      'awe_languagetool',
+                      'awe_spellcorrect',
+                      'awe_components',
+                      'awe_workbench.web.parserServer',
+                      'torch']:
+            self.assertNotIn(heavy, modules)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import math
+import holmes_extractor.manager as holmes
+import unittest
+from awe_workbench.pipeline import pipeline_def
+from awe_workbench.web.summaryEngine import summaryEngine, summarySpecs
+from awe_workbench.web.tokenColumns import tokenColumns
+
+holmes_manager = holmes.Manager(
+    'en_core_web_lg', perform_coreference_resolution=False, number_of_workers=2, extra_components=pipeline_def)
+
+# Aesop's fable is a public domain document available
+# at http://read.gov/aesop/007.html
+holmes_manager.parse_and_register_document(
+            document_text="A lion lay asleep in the forest, his great head resting on his paws. A timid little mouse came upon him unexpectedly, and in her fright and haste to get away, ran across the lion's nose. Roused from his nap, the lion laid his huge paw angrily on the tiny creature to kill her.\n\n\"Spare me!\" begged the poor mouse. \"Please let me go and some day I will surely repay you.\"\n\nThe lion was much amused to think that a mouse could ever help him. But he was generous and finally let the mouse go.\n\nSome days later, while stalking his prey in the forest, the lion was caught in the toils of a hunter's net. Unable to free himself, he filled the forest with his angry roaring. The mouse knew the voice and quickly found the lion struggling in the net. Running to one of the great ropes that bound him, she gnawed it until it parted, and soon the lion was free.\n\n\"You laughed when I said I would repay you,\" said the Mouse. \"Now you see that even a Mouse can help a Lion.\"", label='Aesop')
+
+
+class SummaryEngineTest(unittest.TestCase):
+
+    def assertSameValue(self, value, comparison):
+        if isinstance(comparison, float) and math.isnan(comparison):
+            self.assertTrue(math.isnan(value))
+        else:
+            self.assertEqual(value, comparison)
+
+    def test_matches_awe_info(self):
+        doc = holmes_manager.get_document('Aesop')
+        engine = summaryEngine(tokenColumns(doc))
+        for spec in summarySpecs:
+            if 'attribute' in spec:
+                comparison = doc._.get(spec['attribute'])
+            else:
+                comparison = doc._.AWE_Info(**spec)
+            with self.subTest(spec=spec):
+                self.assertSameValue(engine.summarize(spec), comparison)
+
+    def test_masks_are_shared(self):
+        doc = holmes_manager.get_document('Aesop')
+        columns = tokenColumns(doc)
+        summaryEngine(columns).summarize_all()
+        # is_alpha, devword, is_stop, pos_ and the three filter lists
+        self.assertEqual(len(columns.masks), 7)
+
+    def test_column_queries(self):
+        doc = holmes_manager.get_document('Aesop')
+        columns = tokenColumns(doc)
+        queries = [
+            dict(indicator='nSyll', summaryType='max'),
+            dict(indicator='concreteness',
+                 filters=[('pos_', ['NOUN', 'VERB'])],
+                 summaryType='median'),
+            dict(indicator='text',
+                 filters=[('is_alpha', ['True']), ('is_stop', ['True'])],
+                 transformations=['len'],
+                 summaryType='mean'),
+            dict(indicator='token_freq',
+                 transformations=['log'],
+                 summaryType='stdev')]
+        for query in queries:
+            with self.subTest(query=query):
+                self.assertTrue(columns.can_summarize(**query))
+                self.assertSameValue(columns.summarize(**query),
+                                     doc._.AWE_Info(**query))
+
+    def test_column_fallback(self):
+        doc = holmes_manager.get_document('Aesop')
+        columns = tokenColumns(doc)
+        self.assertFalse(columns.can_summarize(indicator='nSyll'))
+        self.assertFalse(columns.can_summarize(indicator='lemma_',
+                                               summaryType='mean'))
+        self.assertFalse(columns.can_summarize(infoType='Doc',
+                                               indicator='sents',
+                                               summaryType='mean'))
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import unittest
+from awe_workbench.web.textDelta import split_paragraphs, apply_edit, \
+    edited_paragraphs
+
+text = 'A lion lay asleep.\n\n"Spare me!" begged the mouse.\nThe end.'
+
+
+class TextDeltaTest(unittest.TestCase):
+
+    def test_split_paragraphs(self):
+        paragraphs = split_paragraphs(text)
+        self.assertEqual([start for start, paragraph in paragraphs],
+                         [0, 20, 50])
+        self.assertEqual(''.join(paragraph for start, paragraph
+                                 in paragraphs), text)
+        self.assertEqual(split_paragraphs(''), [])
+        self.assertEqual(split_paragraphs('One.\n'), [(0, 'One.\n')])
+
+    def test_apply_edit(self):
+        self.assertEqual(apply_edit('A lion.', 2, 4, 'mouse'), 'A mouse.')
+        with self.assertRaises(ValueError):
+            apply_edit('A lion.', 5, 4, 'mouse')
+        with self.assertRaises(ValueError):
+            apply_edit('A lion.', -1, 0, 'x')
+
+    def test_edit_in_one_paragraph(self):
+        offset = text.index('mouse')
+        edited, paragraphs = edited_paragraphs(text, offset, 5, 'poor mouse')
+        self.assertEqual(''.join(p for p, start in paragraphs), edited)
+        # Only the middle paragraph has to be parsed again, and the
+        # last one has moved
+        self.assertEqual([start for p, start in paragraphs],
+                         [0, None, 50])
+
+    def test_edit_across_paragraphs(self):
+        # Removing a paragraph break joins two paragraphs
+        offset = text.index('\n\n')
+        edited, paragraphs = edited_paragraphs(text, offset, 2, ' ')
+        self.assertEqual([start for p, start in paragraphs], [None, 50])
+        edited, paragraphs = edited_paragraphs(text, 0, len(text), '')
+        self.assertEqual((edited, paragraphs), ('', []))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,45 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import unittest
+from awe_workbench.web.textUpload import textUpload
+
+
+class TextUploadTest(unittest.TestCase):
+
+    def test_paragraphs_as_they_arrive(self):
+        upload = textUpload()
+        self.assertEqual(upload.append(0, 'A lion lay '), [])
+        self.assertEqual(upload.append(1, 'asleep.\n'), [])
+        # A paragraph is complete once the next one starts
+        self.assertEqual(upload.append(2, '\nThe mouse ran.\nThe'),
+                         ['A lion lay asleep.\n\n', 'The mouse ran.\n'])
+        self.assertEqual(upload.append(3, ' end.'), [])
+        self.assertEqual(upload.remainder, 'The end.')
+        self.assertEqual(upload.text(),
+                         'A lion lay asleep.\n\nThe mouse ran.\nThe end.')
+        self.assertEqual(upload.size, len(upload.text()))
+
+    def test_size_in_bytes(self):
+        upload = textUpload()
+        upload.append(0, 'café')
+        self.assertEqual(upload.size, 5)
+
+    def test_chunks_out_of_order(self):
+        upload = textUpload()
+        # A chunk that comes early waits for the ones before it
+        self.assertEqual(upload.append(1, 'The mouse ran.'), [])
+        self.assertEqual(upload.remainder, '')
+        self.assertRaises(ValueError, upload.text)
+        self.assertEqual(upload.append(0, 'A lion lay asleep.\n'),
+                         ['A lion lay asleep.\n'])
+        self.assertEqual(upload.text(2),
+                         'A lion lay asleep.\nThe mouse ran.')
+        self.assertRaises(ValueError, upload.text, 3)
+        # Each chunk can only be sent once
+        self.assertRaises(ValueError, upload.append, 1, 'x')
+        self.assertRaises(ValueError, upload.append, -1, 'x')
+
+
+if __name__ == '__main__':
+    unittest.main()
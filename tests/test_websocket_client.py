@@ -0,0 +1,128 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import asyncio
+import json
+import threading
+import time
+import unittest
+
+import websockets
+from awe_workbench.web.websocketClient import websocketClient
+
+# A small server that sends every message back, and counts the
+# connections that are made to it and the messages it gets
+connections = []
+received = []
+server_loop = asyncio.new_event_loop()
+
+
+async def echo(websocket, path=None):
+    connections.append(websocket)
+    try:
+        async for message in websocket:
+            messagelist = json.loads(message)
+            received.append(messagelist)
+            if isinstance(messagelist, dict):
+                await websocket.send(json.dumps(
+                    {'id': messagelist['id'],
+                     'response': json.dumps(messagelist['message'])}))
+            elif messagelist[0] == 'HANGUP':
+                await websocket.send(json.dumps(messagelist))
+                await websocket.close()
+            elif messagelist[0] == 'DROP':
+                # Fails while handling the message
+                await websocket.close()
+            else:
+                await websocket.send(json.dumps(messagelist))
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+def run_server(started):
+    asyncio.set_event_loop(server_loop)
+
+    async def start():
+        return await websockets.serve(echo, 'localhost', 8799)
+
+    server_loop.run_until_complete(start())
+    started.set()
+    server_loop.run_forever()
+
+
+class WebsocketClientTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        started = threading.Event()
+        threading.Thread(target=run_server,
+                         args=(started,),
+                         daemon=True).start()
+        started.wait()
+
+    def setUp(self):
+        connections.clear()
+        received.clear()
+        self.client = websocketClient()
+        self.client.set_uri('ws://localhost:8799')
+
+    def tearDown(self):
+        self.client.close()
+
+    def test_connection_is_reused(self):
+        for i in range(10):
+            self.assertEqual(self.client.send(['LEMMAS', str(i)]),
+                             ['LEMMAS', str(i)])
+        self.assertEqual(self.client.sendraw(['DOCTOKENS', 'a']),
+                         '["DOCTOKENS", "a"]')
+        self.assertEqual(len(connections), 1)
+
+    def test_not_persistent(self):
+        client = websocketClient(persistent=False)
+        client.set_uri('ws://localhost:8799')
+        for i in range(3):
+            self.assertEqual(client.send(['LEMMAS', str(i)]),
+                             ['LEMMAS', str(i)])
+        self.assertEqual(len(connections), 3)
+
+    def test_reconnect(self):
+        # The server closes the connection after this reply, so the
+        # next message has to go over a new one
+        self.assertEqual(self.client.send(['HANGUP']), ['HANGUP'])
+        # (by now the server's close has reached the idle connection)
+        time.sleep(0.1)
+        self.assertEqual(self.client.send(['LEMMAS', 'a']),
+                         ['LEMMAS', 'a'])
+        self.assertEqual(len(connections), 2)
+
+    def test_no_retry_after_send(self):
+        # A message the server got is not sent again when the
+        # connection fails before the reply
+        self.assertEqual(self.client.send(['LEMMAS', 'a']),
+                         ['LEMMAS', 'a'])
+        self.assertEqual(self.client.send(['DROP']), None)
+        self.assertEqual(received.count(['DROP']), 1)
+        self.assertEqual(len(connections), 1)
+
+    def test_threads_share_pool(self):
+        results = {}
+
+        def worker(n):
+            for i in range(20):
+                results[(n, i)] = self.client.send(['LEMMAS', n, i])
+
+        threads = [threading.Thread(target=worker, args=(n,))
+                   for n in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for (n, i), result in results.items():
+            self.assertEqual(result, ['LEMMAS', n, i])
+        self.assertEqual(len(results), 160)
+        self.assertTrue(len(connections) <= self.client.max_connections)
+
+    def test_send_many(self):
+        messages = [['LEMMAS', str(i)] for i in range(5)]
+        self.assertEqual(self.client.send_many(messages), messages)
+        self.assertEqual(len(connections), 1)
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3.10
+# Copyright 2022, Educational Testing Service
+
+import asyncio
+import json
+import threading
+import unittest
+
+import numpy as np
+import websockets
+from awe_workbench.web.websocketClient import websocketClient
+from awe_workbench.web.wireCodec import decode_message, encode_response, \
+    encode_value, pack, subprotocols, to_object, unpack, text_reply, \
+    quoted_text, MSGPACK
+
+server_loop = asyncio.new_event_loop()
+
+
+async def echo(websocket, path=None):
+    # Sends every message back in the encoding of the connection
+    protocol = websocket.subprotocol
+    try:
+        async for message in websocket:
+            await websocket.send(
+                encode_value(decode_message(message, protocol), protocol))
+    except websockets.exceptions.ConnectionClosed:
+        pass
+
+
+def run_servers(started):
+    asyncio.set_event_loop(server_loop)
+
+    async def start():
+        await websockets.serve(echo, 'localhost', 8796,
+                               subprotocols=subprotocols())
+        await websockets.serve(echo, 'localhost', 8795)
+
+    server_loop.run_until_complete(start())
+    started.set()
+    server_loop.run_forever()
+
+
+class WireCodecTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(self):
+        started = threading.Event()
+        threading.Thread(target=run_servers,
+                         args=(started,),
+                         daemon=True).start()
+        started.wait()
+
+    def test_json_replies_unchanged(self):
+        text = json.dumps({'0': {'value': 1}})
+        self.assertEqual(encode_response(quoted_text(text)),
+                         json.dumps(text))
+        self.assertEqual(encode_response(text_reply(text)), text)
+        self.assertEqual(encode_response(text_reply(float('nan'))), 'nan')
+        self.assertEqual(encode_response(True), 'true')
+        self.assertEqual(encode_response(None), 'null')
+        multi = {'results': {'a': quoted_text(text)}}
+        self.assertEqual(encode_response(multi),
+                         json.dumps({'results': {'a': text}}))
+
+    def test_double_encoding_removed(self):
+        value = {'0': {'value': 1, 'text': '['}}
+        reply = quoted_text(json.dumps(value))
+        self.assertEqual(unpack(encode_response(reply, MSGPACK)), value)
+        self.assertEqual(to_object(reply), value)
+        self.assertEqual(unpack(encode_response(text_reply(2), MSGPACK)), 2)
+        # Text values are never taken for JSON
+        self.assertEqual(unpack(encode_response('[not json', MSGPACK)),
+                         '[not json')
+        self.assertEqual(unpack(encode_response(['[1, 2]'], MSGPACK)),
+                         ['[1, 2]'])
+        multi = {'results': {'a': text_reply(json.dumps([1, 2]))},
+                 'errors': {}}
+        self.assertEqual(unpack(encode_response(multi, MSGPACK)),
+                         {'results': {'a': [1, 2]}, 'errors': {}})
+
+    def test_numpy_arrays(self):
+        array = np.array([1.5, 2.5, np.nan])
+        result = unpack(pack({'values': array}))
+        self.assertTrue(isinstance(result['values'], np.ndarray))
+        self.assertEqual(result['values'][1], 2.5)
+        self.assertTrue(np.isnan(result['values'][2]))
+
+    def test_client_msgpack(self):
+        client = websocketClient(codec='msgpack')
+        client.set_uri('ws://localhost:8796')
+        self.assertEqual(client.send(['LEMMAS', 'a']), ['LEMMAS', 'a'])
+        raw = client.sendraw(['LEMMAS', 'a'])
+        self.assertTrue(isinstance(raw, bytes))
+        self.assertEqual(unpack(raw), ['LEMMAS', 'a'])
+        client.close()
+
+    def test_client_falls_back_to_json(self):
+        # A server that does not offer msgpack
+        client = websocketClient(codec='msgpack')
+        client.set_uri('ws://localhost:8795')
+        self.assertEqual(client.send(['LEMMAS', 'a']), ['LEMMAS', 'a'])
+        self.assertEqual(client.sendraw(['LEMMAS', 'a']),
+                         '["LEMMAS", "a"]')
+        client.close()